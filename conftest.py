@@ -17,43 +17,712 @@
 # under the License.
 #
 
+import os
+from typing import Callable
+from urllib.parse import urlsplit, urlunsplit
+
 import pytest
 from _pytest.fixtures import FixtureRequest
 from selenium import webdriver
-from runner import initialize_local_chrome, deinitialize_selenium
+from runner import SHARED_DRIVER_CAPABILITIES
 
-from webdriver.page_objects import HawtioPageObjectContainer, StandalonePageObjectContainer
+from webdriver.benchmark import BenchmarkRecorder
+from webdriver.caching_proxy import CachingProxy
+from webdriver.driver_pool import DriverPool
+from webdriver.drivers import LocalBrowserFactory
+from webdriver.fake_router import FakeRouter, load_data
+from webdriver.impact import UsageMap, diff_change
+from webdriver.instrumentation import Instrumentation
+from webdriver.latency import LatencyRecorder
+from webdriver.load import LoadGenerator
+from webdriver.mesh import DEFAULT_IMAGE, DockerLauncher, Mesh, ProcessLauncher, port_conflicts
+from webdriver.profiling import DEFAULT_ACTIONS, Profiler
+from webdriver.screenshots import POLICIES, ScreenshotWriter
+from webdriver.soak import SoakMonitor
+from webdriver.tabs import TabGroup
+from webdriver.timeouts import TimeoutManager
+from webdriver import traffic
+from webdriver.traffic import TrafficRecorder, merge_capabilities
+from webdriver.topology import Topology, synthesize
+from webdriver.page_objects import (ERROR_COLLECTOR, HawtioPageObjectContainer, PageObject, PageObjectContainer,
+                                    StandalonePageObjectContainer)
 
 
 def pytest_addoption(parser):
     parser.addoption("--local-chrome", action="store_true", default=False,
-                     help='use local chrome browser, shortcut for test dev')
+                     help='use local chrome browser, shortcut for test dev; same as --local-browser chrome')
+    parser.addoption("--local-browser", action="store", default=None, choices=['chrome', 'firefox'],
+                     help="start a local browser directly, instead of through pytest-selenium's --driver")
+    parser.addoption("--headed", action="store_true", default=False,
+                     help="show the local browser window; local browsers run headless otherwise")
+    parser.addoption("--profile-dir", action="store", default=None,
+                     help="browser profile for local browsers; it is warmed up with the console's static "
+                          "assets on first use, and every browser starts from a copy of it")
+    parser.addoption("--browser-binary", action="store", default=None,
+                     help="path to the local browser executable, if it is not the default one")
     parser.addoption("--console-ip", action="store", default="127.0.0.1",
                      help="IP for connecting to the console")
     parser.addoption("--console", action="store", default="hawtio",
                      help="type of console, either hawtio or stand-alone")
+    parser.addoption("--driver-pool-size", action="store", type=int, default=0,
+                     help="reuse browser sessions between tests, keeping up to this many idle sessions "
+                          "per set of capabilities (0 disables the pool)")
+    parser.addoption("--console-port", action="store", type=int, default=5673,
+                     help="port the console connects to, where the router accepts WebSocket connections")
+    parser.addoption("--artifacts-dir", action="store", default=".",
+                     help="directory for screenshots and other test outputs; "
+                          "every pytest-xdist worker writes into its own subdirectory")
+    parser.addoption("--per-worker-ports", action="store_true", default=False,
+                     help="with pytest-xdist, add the worker number to the router port and to the console port "
+                          "in --base-url, so that every worker can have its own containers")
+    parser.addoption("--console-proxy", action="store_true", default=False,
+                     help="put a local proxy in front of --base-url, which keeps the console's static assets "
+                          "in memory and passes everything else through")
+    parser.addoption("--fake-router", action="store_true", default=False,
+                     help="answer the console's management requests from an in-process fake router "
+                          "listening on --console-ip and --console-port, instead of a real one")
+    parser.addoption("--fake-router-data", action="store", default=None,
+                     help="JSON file with entities for the fake router, see webdriver/fake_router.py")
+    parser.addoption("--topology-routers", action="store", type=int, default=None,
+                     help="make the fake router part of a synthesized mesh with this many routers, or start a real "
+                          "mesh of this many with --mesh; tree node counts are then discovered instead of checked "
+                          "against fixed values")
+    parser.addoption("--mesh", action="store", default=None, choices=['process', 'docker'],
+                     help="start a mesh of --topology-routers real routers, configured like "
+                          "docker/run/router/console.conf, as local qdrouterd processes or as docker containers")
+    parser.addoption("--mesh-image", action="store", default=DEFAULT_IMAGE,
+                     help="router image for --mesh docker")
+    parser.addoption("--mesh-port", action="store", type=int, default=6672,
+                     help="AMQP port of the first router in the mesh; the others listen on the following ports, "
+                          "which must not include --console-port")
+    parser.addoption("--mesh-inter-router-port", action="store", type=int, default=55672,
+                     help="inter-router port of the first router in the mesh; the others listen on the following ports")
+    parser.addoption("--mesh-timeout", action="store", type=float, default=60.0,
+                     help="how long to wait for all routers in the mesh to learn routes to each other")
+    parser.addoption("--load-rate", action="store", type=float, default=0,
+                     help="send this many messages per second through the router during the whole run, to the "
+                          "address prefixes configured in docker/run/router/console.conf")
+    parser.addoption("--load-size", action="store", type=int, default=100,
+                     help="body size of the --load-rate messages in bytes")
+    parser.addoption("--load-port", action="store", type=int, default=5672,
+                     help="AMQP port of the router for --load-rate and latency tests; with --mesh, the mesh's own "
+                          "ports are used")
+    parser.addoption("--latency-samples", action="store", type=int, default=0,
+                     help="router changes for each latency test to time until the console shows them; latency "
+                          "tests are skipped without this")
+    parser.addoption("--latency-slo", action="store", type=float, default=None,
+                     help="fail a latency test when its 95th percentile is above this many milliseconds")
+    parser.addoption("--topology-addresses", action="store", type=int, default=100,
+                     help="number of addresses in the synthesized mesh")
+    parser.addoption("--topology-links", action="store", type=int, default=10,
+                     help="number of endpoint links on each router in the synthesized mesh")
+    parser.addoption("--topology-connections", action="store", type=int, default=5,
+                     help="number of client connections to each router in the synthesized mesh")
+    parser.addoption("--benchmark", action="store_true", default=False,
+                     help="run the benchmarks in webdriver/test_benchmark.py, which are skipped otherwise")
+    parser.addoption("--benchmark-rounds", action="store", type=int, default=5,
+                     help="how many times each benchmark measurement is repeated")
+    parser.addoption("--benchmark-output", action="store", default=None,
+                     help="write benchmark results into this JSON file")
+    parser.addoption("--benchmark-baseline", action="store", default=None,
+                     help="JSON file written by --benchmark-output in an earlier run; "
+                          "benchmarks fail if they are slower than that")
+    parser.addoption("--benchmark-threshold", action="store", type=float, default=0.25,
+                     help="allowed slowdown relative to the baseline median, 0.25 means 25 %%")
+    parser.addoption("--soak-iterations", action="store", type=int, default=0,
+                     help="run the soak tests in webdriver/test_soak.py, which are skipped otherwise, "
+                          "with this many rounds of navigation each")
+    parser.addoption("--soak-warmup", action="store", type=int, default=5,
+                     help="soak rounds that are left out of the leak detection")
+    parser.addoption("--soak-tolerance", action="store", type=float, default=0.1,
+                     help="a soak test fails when a steadily growing metric grew more than this, 0.1 means 10 %%")
+    parser.addoption("--instrument", action="store_true", default=False,
+                     help="record durations and WebDriver round trips of page object actions")
+    parser.addoption("--instrument-output", action="store", default=None,
+                     help="write the --instrument report into this JSON file, with .gwN appended under xdist "
+                          "(default: instrumentation.json in the artifacts directory of the worker)")
+    parser.addoption("--cpu-profile", action="store_true", default=False,
+                     help="in Chrome, run the JavaScript profiler during --cpu-profile-actions and save the profiles "
+                          "into the artifacts directory")
+    parser.addoption("--cpu-profile-actions", action="store", default=','.join(DEFAULT_ACTIONS),
+                     help="comma-separated page object methods to profile; click profiles every element click")
+    parser.addoption("--timeouts-history", action="store", default=None,
+                     help="JSON file with durations of waits from earlier runs; page object timeouts are derived "
+                          "from it and it is updated at the end of the run")
+    parser.addoption("--timeouts-margin", action="store", type=float, default=3.0,
+                     help="a learned timeout is the 99th percentile of earlier waits times this")
+    parser.addoption("--timeouts-min", action="store", type=float, default=2.0,
+                     help="learned timeouts are never shorter than this many seconds")
+    parser.addoption("--timeouts-max", action="store", type=float, default=60.0,
+                     help="learned timeouts are never longer than this many seconds")
+    parser.addoption("--record-usage", action="store_true", default=False,
+                     help="record which page object methods each test uses into --usage-map")
+    parser.addoption("--impacted-by", action="store", default=None, metavar="GIT_REF",
+                     help="run only tests that use page object code changed since this git ref, per --usage-map")
+    parser.addoption("--usage-map", action="store", default="page-object-usage.json",
+                     help="JSON file with page object usage of tests, for --record-usage and --impacted-by")
+    parser.addoption("--screenshots", action="store", default="always", choices=POLICIES,
+                     help="which screenshots tests take are stored: always, on-failure (of the test), "
+                          "or sampled (every --screenshot-sample-th)")
+    parser.addoption("--screenshot-sample", action="store", type=int, default=5,
+                     help="with --screenshots sampled, store every n-th screenshot")
+    parser.addoption("--screenshot-scale", action="store", type=float, default=None,
+                     help="downscale stored screenshots by this factor, needs Pillow")
+    parser.addoption("--screenshot-keep-duplicates", action="store_true", default=False,
+                     help="store a screenshot even if it is the same as the previous one of the test")
+    parser.addoption("--capture-traffic", action="store_true", default=False,
+                     help="record HTTP requests, WebSocket frames and management requests of every page, "
+                          "from the Chrome performance log")
+    parser.addoption("--traffic-output", action="store", default=None,
+                     help="write the --capture-traffic report into this JSON file "
+                          "(default: traffic.json in the artifacts directory)")
+    parser.addoption("--driver-max-uses", action="store", type=int, default=20,
+                     help="number of tests a pooled browser session is used for before it is restarted")
+
+
+def pytest_configure(config):
+    configure_timeouts(config)
+    if config.getoption('--capture-traffic'):
+        PageObject.traffic = TrafficRecorder()
+    if config.getoption('--instrument') or config.getoption('--record-usage'):
+        config.instrumentation = Instrumentation()
+        config.instrumentation.install()
+    if config.getoption('--cpu-profile'):
+        actions = [a.strip() for a in config.getoption('--cpu-profile-actions').split(',') if a.strip()]
+        config.cpu_profiler = Profiler(artifacts_directory(config), actions)
+        config.cpu_profiler.install()
+
+
+def pytest_unconfigure(config):
+    worker = xdist_worker_id(config)
+    save_timeouts(config, worker)
+    if config.getoption('--record-usage'):
+        save_usage(config, worker)
+    if PageObject.traffic is not None:
+        save_traffic(config, worker)
+        PageObject.traffic = None
+    profiler = getattr(config, 'cpu_profiler', None)  # type: Profiler
+    if profiler is not None:
+        # installed after the instrumentation, so it goes first
+        profiler.uninstall()
+        profiler.save(os.path.join(artifacts_directory(config), 'cpu-profiles.json'))
+    instrumentation = getattr(config, 'instrumentation', None)  # type: Instrumentation
+    if instrumentation is None:
+        return
+    instrumentation.uninstall()
+    if not config.getoption('--instrument'):
+        return
+    output = config.getoption('--instrument-output')
+    if output is None:
+        output = os.path.join(artifacts_directory(config), 'instrumentation.json')
+    elif worker != 'master':
+        output = '{}.{}'.format(output, worker)
+    instrumentation.save(output)
+
+
+def configure_timeouts(config):
+    history = config.getoption('--timeouts-history')
+    browser = 'local-chrome' if config.getoption('--local-chrome') else str(config.getoption('driver', None))
+    timeouts = TimeoutManager(browser, margin=config.getoption('--timeouts-margin'),
+                              minimum=config.getoption('--timeouts-min'), maximum=config.getoption('--timeouts-max'),
+                              learn=history is not None)
+    if history is not None:
+        timeouts.load(history)
+    PageObject.timeouts = timeouts
+
+
+def save_timeouts(config, worker: str):
+    """Workers write their new samples next to the history, the master merges them into it"""
+    history = config.getoption('--timeouts-history')
+    if history is None:
+        return
+    if worker != 'master':
+        PageObject.timeouts.save('{}.{}'.format(history, worker), only_recorded=True)
+        return
+    PageObject.timeouts.merge_partials(history)
+    PageObject.timeouts.save(history)
+
+
+def save_traffic(config, worker: str):
+    output = config.getoption('--traffic-output')
+    if output is None:
+        output = os.path.join(artifacts_directory(config), 'traffic.json')
+    elif worker != 'master':
+        output = '{}.{}'.format(output, worker)
+    PageObject.traffic.save(output)
+
+
+def save_usage(config, worker: str):
+    """Workers write partial maps next to the usage map, the master merges them into it"""
+    path = config.getoption('--usage-map')
+    if worker != 'master':
+        usage = UsageMap()
+        usage.update(config.getoption('--console'), config.instrumentation.usage())
+        usage.save('{}.{}'.format(path, worker))
+        return
+    usage = UsageMap.load(path)
+    usage.merge_partials(path)
+    if hasattr(config, 'instrumentation'):
+        usage.update(config.getoption('--console'), config.instrumentation.usage())
+    usage.save(path)
+
+
+def pytest_collection_modifyitems(config, items):
+    ref = config.getoption('--impacted-by')
+    if ref is None:
+        return
+    change = diff_change(str(config.rootdir), ref)
+    usage = UsageMap.load(config.getoption('--usage-map'))
+    selected = usage.select(config.getoption('--console'), [item.nodeid for item in items], change)
+    deselected = [item for item in items if item.nodeid not in selected]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = [item for item in items if item.nodeid in selected]
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    instrumentation = getattr(item.config, 'instrumentation', None)  # type: Instrumentation
+    profiler = getattr(item.config, 'cpu_profiler', None)  # type: Profiler
+    if instrumentation is not None:
+        instrumentation.start_test(item.nodeid)
+    if profiler is not None:
+        profiler.start_test(item.name)
+    yield
+    if profiler is not None:
+        profiler.end_test()
+    if instrumentation is not None:
+        instrumentation.end_test()
+
+
+def pytest_terminal_summary(terminalreporter):
+    generator = getattr(terminalreporter.config, 'message_load', None)  # type: LoadGenerator
+    if generator is not None:
+        terminalreporter.write_sep('=', 'message load')
+        terminalreporter.write_line(generator.summary())
+        for error in generator.errors:
+            terminalreporter.write_line(error)
+    recorder = PageObject.traffic
+    if recorder is not None and recorder.tests:
+        terminalreporter.write_sep('=', 'network traffic')
+        for line in recorder.summary_lines():
+            terminalreporter.write_line(line)
+    profiler = getattr(terminalreporter.config, 'cpu_profiler', None)  # type: Profiler
+    if profiler is not None and profiler.profiles:
+        terminalreporter.write_sep('=', 'browser CPU profiles')
+        for line in profiler.summary_lines():
+            terminalreporter.write_line(line)
+    instrumentation = getattr(terminalreporter.config, 'instrumentation', None)  # type: Instrumentation
+    if instrumentation is None or not instrumentation.tests:
+        return
+    terminalreporter.write_sep('=', 'page object actions')
+    for line in instrumentation.summary_lines():
+        terminalreporter.write_line(line)
+
+
+@pytest.hookimpl(tryfirst=True, hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    # make test outcome available to fixtures, http://doc.pytest.org/en/latest/example/simple.html
+    outcome = yield
+    report = outcome.get_result()
+    setattr(item, 'rep_' + report.when, report)
+
+
+@pytest.fixture(scope='session')
+def driver_pool(request) -> DriverPool:
+    pool = DriverPool(size=request.config.getoption('--driver-pool-size'),
+                      max_uses=request.config.getoption('--driver-max-uses'))
+    yield pool
+    pool.close()
 
 
 @pytest.fixture
 def selenium(request: FixtureRequest) -> webdriver.Remote:
-    if request.config.getoption('--local-chrome'):
-        driver = initialize_local_chrome()
-        request.addfinalizer(lambda: deinitialize_selenium(driver))
-        return driver
+    shared_pool = getattr(request.config, 'shared_driver_pool', None)  # type: DriverPool
+    if shared_pool is not None:
+        # runner.py keeps its browser between runs, even after a failed test
+        driver = shared_pool.acquire(request.config.shared_driver_factory, SHARED_DRIVER_CAPABILITIES)
+        yield driver
+        shared_pool.release(driver)
+        return
+    # before the pool, so that the pool's sessions quit before the factory deletes their profiles
+    local_browser = request.getfixturevalue('local_browser')  # type: LocalBrowserFactory
+    if local_browser is not None and request.config.getoption('--driver-pool-size') > 0:
+        yield from pooled_selenium(request, local_browser.create,
+                                   {'local_browser': local_browser.browser, 'headless': local_browser.headless})
+        return
+    if local_browser is not None:
+        driver = local_browser.create()
+        yield driver
+        driver.quit()
+        return
+    if request.config.getoption('--driver-pool-size') > 0:
+        yield from pooled_selenium(request)
+        return
     driver = request.getfixturevalue('selenium')  # type: webdriver.Remote
     yield driver
     # https://github.com/SeleniumHQ/docker-selenium/issues/87#issuecomment-286231268
     driver.close()
 
 
+@pytest.fixture
+def capabilities(capabilities: dict, request) -> dict:
+    """pytest-selenium's capabilities, with the performance log turned on under --capture-traffic
+
+    Function scoped like the fixture it overrides, which driver_kwargs depends on.
+    """
+    if request.config.getoption('--capture-traffic'):
+        return merge_capabilities(capabilities, traffic.capabilities())
+    return capabilities
+
+
+@pytest.fixture(autouse=True)
+def capture_traffic(request):
+    """Files the traffic of the test under its node id, before the browser goes away"""
+    recorder = PageObject.traffic
+    if recorder is None or 'selenium' not in request.fixturenames:
+        # tests without a browser have no traffic, and should not start a browser for it
+        yield None
+        return
+    driver = request.getfixturevalue('selenium')  # type: webdriver.Remote
+    yield recorder
+    recorder.finish_test(driver, request.node.nodeid)
+
+
+@pytest.fixture
+def tabs(selenium: webdriver.Remote) -> TabGroup:
+    """Tabs of the test's browser session; tabs the test opened are closed after it"""
+    group = TabGroup(selenium)
+    yield group
+    group.close()
+
+
+@pytest.fixture(scope='session')
+def local_browser(request, base_url: str) -> LocalBrowserFactory:
+    """Factory for --local-browser, with the profile warmed up; None when browsers come from pytest-selenium"""
+    browser = request.config.getoption('--local-browser')
+    if browser is None and request.config.getoption('--local-chrome'):
+        browser = 'chrome'
+    if browser is None:
+        yield None
+        return
+    capabilities = traffic.capabilities() if request.config.getoption('--capture-traffic') else None
+    factory = LocalBrowserFactory(browser, headless=not request.config.getoption('--headed'),
+                                  binary=request.config.getoption('--browser-binary'),
+                                  profile_dir=request.config.getoption('--profile-dir'),
+                                  capabilities=capabilities)
+    if base_url:
+        factory.warm_up([base_url, page_object_container(request.config).connect_page.url(base_url)])
+    yield factory
+    factory.cleanup()
+
+
+def pooled_selenium(request: FixtureRequest, factory: Callable[[], webdriver.Remote] = None,
+                    capabilities: dict = None):
+    """Borrows a session from the pool instead of starting a new one; by default, pytest-selenium starts them"""
+    pool = request.getfixturevalue('driver_pool')  # type: DriverPool
+    if factory is None:
+        driver_class = request.getfixturevalue('driver_class')
+        driver_kwargs = request.getfixturevalue('driver_kwargs')  # type: dict
+        capabilities = dict(driver_kwargs.get('desired_capabilities') or {})
+        capabilities.pop('name', None)  # pytest-selenium names remote sessions after the test
+        factory = lambda: driver_class(**driver_kwargs)
+    driver = pool.acquire(factory, capabilities)
+    # pytest-selenium looks here when it gathers screenshots and logs for the html report
+    request.node._driver = driver
+    yield driver
+    pool.release(driver, failed=setup_or_call_failed(request.node))
+
+
+def setup_or_call_failed(item) -> bool:
+    """Whether the setup or the call of the test failed; a test skipped during setup did not fail"""
+    setup = getattr(item, 'rep_setup', None)
+    if setup is None or setup.failed:
+        return True
+    if setup.skipped:
+        return False
+    call = getattr(item, 'rep_call', None)
+    return call is None or call.failed
+
+
+def xdist_worker_id(config) -> str:
+    """Returns gw0, gw1, ... inside a pytest-xdist worker and 'master' otherwise"""
+    # pytest-xdist renamed slave to worker in version 1.22
+    for attribute, key in (('workerinput', 'workerid'), ('slaveinput', 'slaveid')):
+        if hasattr(config, attribute):
+            return getattr(config, attribute)[key]
+    return 'master'
+
+
+def worker_number(config) -> int:
+    worker = xdist_worker_id(config)
+    if worker == 'master':
+        return 0
+    return int(worker[len('gw'):])
+
+
+def worker_count(config) -> int:
+    for attribute, key in (('workerinput', 'workercount'), ('slaveinput', 'slavecount')):
+        if hasattr(config, attribute) and key in getattr(config, attribute):
+            return getattr(config, attribute)[key]
+    return getattr(config.option, 'numprocesses', None) or 1
+
+
+def worker_port_offset(config) -> int:
+    if not config.getoption('--per-worker-ports'):
+        return 0
+    return worker_number(config)
+
+
+def router_port(config) -> int:
+    port = config.getoption('--console-port')
+    if config.getoption('--fake-router') or config.getoption('--mesh'):
+        # every worker starts its own fake router, or its own mesh
+        return port + worker_number(config)
+    return port + worker_port_offset(config)
+
+
+@pytest.fixture(scope='session')
+def base_url(base_url, request):
+    offset = worker_port_offset(request.config)
+    if base_url and offset != 0:
+        url = urlsplit(base_url)
+        netloc = '{}:{}'.format(url.hostname, (url.port or 80) + offset)
+        base_url = urlunsplit((url.scheme, netloc, url.path, url.query, url.fragment))
+    if base_url and request.config.getoption('--console-proxy'):
+        url = urlsplit(base_url)
+        # browsers other than Chrome get the error collector of the page objects from the page itself this way
+        proxy = CachingProxy(urlunsplit((url.scheme, url.netloc, '', '', '')),
+                             head_html='<script>{}</script>'.format(ERROR_COLLECTOR))
+        proxy.start()
+        request.addfinalizer(proxy.stop)
+        base_url = proxy.url + urlunsplit(('', '', url.path, url.query, url.fragment))
+    return base_url
+
+
+def artifacts_directory(config) -> str:
+    directory = config.getoption('--artifacts-dir')
+    worker = xdist_worker_id(config)
+    if worker != 'master':
+        directory = os.path.join(directory, worker)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.abspath(directory)
+
+
+@pytest.fixture(scope='session')
+def artifacts_dir(request) -> str:
+    return artifacts_directory(request.config)
+
+
+@pytest.fixture(scope='session')
+def screenshot_writer(request, artifacts_dir: str) -> ScreenshotWriter:
+    try:
+        writer = ScreenshotWriter(artifacts_dir,
+                                  policy=request.config.getoption('--screenshots'),
+                                  sample_every=request.config.getoption('--screenshot-sample'),
+                                  scale=request.config.getoption('--screenshot-scale'),
+                                  deduplicate=not request.config.getoption('--screenshot-keep-duplicates'))
+    except ValueError as e:
+        raise pytest.UsageError(str(e))
+    yield writer
+    writer.close()
+
+
+@pytest.fixture
+def screenshots(request, screenshot_writer: ScreenshotWriter) -> ScreenshotWriter:
+    """Screenshot writer that learns at the end of the test whether the test failed"""
+    yield screenshot_writer
+    report = getattr(request.node, 'rep_call', None)
+    screenshot_writer.finish_test(request.node.nodeid, failed=report is None or report.failed)
+
+
 @pytest.fixture(scope="module")
 def console_ip(request):
     return request.config.getoption("--console-ip")
 
 
+@pytest.fixture(scope="module")
+def console_port(request) -> int:
+    return router_port(request.config)
+
+
+@pytest.fixture(scope='session')
+def topology(request) -> Topology:
+    """Size of the synthesized mesh the fake router pretends to be part of, None for the default standalone router"""
+    routers = request.config.getoption('--topology-routers')
+    if routers is None:
+        return None
+    if not request.config.getoption('--fake-router') and not request.config.getoption('--mesh'):
+        raise pytest.UsageError('--topology-routers can only be used together with --fake-router or --mesh')
+    return Topology(routers,
+                    addresses=request.config.getoption('--topology-addresses'),
+                    links=request.config.getoption('--topology-links'),
+                    connections=request.config.getoption('--topology-connections'))
+
+
+@pytest.fixture(scope='session', autouse=True)
+def fake_router(request) -> FakeRouter:
+    """Starts the in-process router stand-in when asked to with --fake-router"""
+    if not request.config.getoption('--fake-router'):
+        yield None
+        return
+    path = request.config.getoption('--fake-router-data')
+    topology = request.getfixturevalue('topology')  # type: Topology
+    if topology is not None:
+        data = synthesize(topology)
+    else:
+        data = load_data(path) if path else None
+    router = FakeRouter(request.config.getoption('--console-ip'), router_port(request.config), data)
+    router.start()
+    yield router
+    router.stop()
+
+
+@pytest.fixture(scope='session', autouse=True)
+def mesh(request) -> Mesh:
+    """Starts a mesh of real routers when asked to with --mesh, and waits until all of them have routes"""
+    kind = request.config.getoption('--mesh')
+    if kind is None:
+        yield None
+        return
+    if request.config.getoption('--fake-router'):
+        raise pytest.UsageError('--mesh and --fake-router cannot be used together')
+    topology = request.getfixturevalue('topology')  # type: Topology
+    if topology is None:
+        raise pytest.UsageError('--mesh needs --topology-routers')
+    # with pytest-xdist, every worker has a mesh of its own
+    offset = worker_number(request.config) * topology.routers
+    config = request.config
+    conflicts = port_conflicts(Mesh.port_ranges(topology.routers, config.getoption('--console-port'),
+                                                config.getoption('--mesh-port'),
+                                                config.getoption('--mesh-inter-router-port'), 20009,
+                                                meshes=worker_count(config)))
+    if conflicts:
+        raise pytest.UsageError('Ports of the meshes conflict, change --mesh-port or --console-port: ' +
+                                '; '.join(conflicts))
+    launcher = DockerLauncher(config.getoption('--mesh-image')) if kind == 'docker' else ProcessLauncher()
+    mesh = Mesh(topology, launcher, os.path.join(artifacts_directory(config), 'mesh'), console_port=router_port(config),
+                port=config.getoption('--mesh-port') + offset,
+                inter_router_port=config.getoption('--mesh-inter-router-port') + offset,
+                proxy_port=20009 + worker_number(config))
+    mesh.start()
+    try:
+        mesh.wait_converged(config.getoption('--mesh-timeout'))
+        yield mesh
+    finally:
+        mesh.stop()
+
+
+@pytest.fixture(scope='session')
+def amqp_endpoints(request, mesh: Mesh):
+    """Host and AMQP port of the router, or of every router in the mesh"""
+    config = request.config
+    if mesh is not None:
+        return [('127.0.0.1', mesh.port + i) for i in range(mesh.topology.routers)]
+    return [(config.getoption('--console-ip'), config.getoption('--load-port') + worker_port_offset(config))]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def message_load(request) -> LoadGenerator:
+    """Sends --load-rate messages per second through the router while the tests run
+
+    Tests can change the rate with set_rate; it is not set back after them.
+    """
+    config = request.config
+    rate = config.getoption('--load-rate')
+    if rate <= 0:
+        yield None
+        return
+    if config.getoption('--fake-router'):
+        raise pytest.UsageError('--load-rate needs a real router, the fake router does not pass messages on')
+    endpoints = request.getfixturevalue('amqp_endpoints')
+    generator = LoadGenerator(endpoints, rate, size=config.getoption('--load-size'))
+    generator.start()
+    config.message_load = generator
+    yield generator
+    generator.stop()
+
+
+@pytest.fixture
+def connected(selenium: webdriver.Remote, base_url: str, console_ip: str, console_port: int, pages):
+    """Browser in which the console connects to the router as soon as it loads, without the connect form"""
+    pages.connect_page.connect_directly(selenium, base_url, console_ip, console_port)
+    return selenium
+
+
+@pytest.fixture(scope='session')
+def benchmark_recorder(request) -> BenchmarkRecorder:
+    recorder = BenchmarkRecorder({'console': request.config.getoption('--console'),
+                                  'driver': str(request.config.getoption('driver', None))})
+    yield recorder
+    output = request.config.getoption('--benchmark-output')
+    if output and recorder.samples:
+        recorder.save(output)
+
+
+@pytest.fixture
+def benchmark(request, benchmark_recorder: BenchmarkRecorder) -> BenchmarkRecorder:
+    """Recorder for benchmark measurements
+
+    Measurements that regressed against --benchmark-baseline are reported as an error of the test that took them.
+    """
+    if not request.config.getoption('--benchmark'):
+        pytest.skip('benchmarks run only with --benchmark')
+    names_before = set(benchmark_recorder.samples)
+    yield benchmark_recorder
+    baseline = request.config.getoption('--benchmark-baseline')
+    if baseline:
+        names = [n for n in benchmark_recorder.samples if n not in names_before]
+        problems = benchmark_recorder.regressions(BenchmarkRecorder.load_baseline(baseline),
+                                                  request.config.getoption('--benchmark-threshold'), names)
+        if problems:
+            pytest.fail('Slower than baseline:\n' + '\n'.join(problems))
+
+
+@pytest.fixture
+def soak(request, artifacts_dir: str) -> SoakMonitor:
+    """Monitor for soak tests; the test fails if a metric it sampled grew steadily
+
+    The samples are written to soak-<test name>.json in the artifacts directory.
+    """
+    iterations = request.config.getoption('--soak-iterations')
+    if iterations <= 0:
+        pytest.skip('soak tests run only with --soak-iterations')
+    monitor = SoakMonitor(iterations, warmup=request.config.getoption('--soak-warmup'),
+                          tolerance=request.config.getoption('--soak-tolerance'))
+    yield monitor
+    monitor.save(os.path.join(artifacts_dir, 'soak-{}.json'.format(request.node.name)))
+    problems = monitor.leaks()
+    if problems:
+        pytest.fail('Growing over repeated navigation:\n' + '\n'.join(problems))
+
+
+@pytest.fixture
+def latency(request, artifacts_dir: str, selenium: webdriver.Remote) -> LatencyRecorder:
+    """Recorder for latency tests; the test fails if its 95th percentile is above --latency-slo
+
+    The latencies are written to latency-<test name>.json in the artifacts directory.
+    """
+    if request.config.getoption('--latency-samples') <= 0:
+        pytest.skip('latency tests run only with --latency-samples')
+    if request.config.getoption('--fake-router'):
+        pytest.skip('latency tests change the router, the fake router cannot be changed')
+    recorder = LatencyRecorder(selenium)
+    yield recorder
+    recorder.save(os.path.join(artifacts_dir, 'latency-{}.json'.format(request.node.name)))
+    slo = request.config.getoption('--latency-slo')
+    distribution = recorder.distribution()
+    if slo is not None and distribution['count'] and distribution['p95'] > slo:
+        pytest.fail('95th percentile latency {:.0f} ms is above {:.0f} ms'.format(distribution['p95'], slo))
+
+
 @pytest.fixture(scope="module")
 def pages(request):
-    console = request.config.getoption("--console")
+    return page_object_container(request.config)
+
+
+def page_object_container(config) -> PageObjectContainer:
+    console = config.getoption("--console")
     if console == 'hawtio':
         return HawtioPageObjectContainer()
     elif console == 'stand-alone':
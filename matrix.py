@@ -0,0 +1,90 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Runs the console x browser matrix concurrently on one machine
+
+Every combination is a separate py.test process, which can in turn spread its
+tests over pytest-xdist workers with -n. Outputs of a combination, including
+screenshots and the py.test log, go to its own directory under --artifacts-dir.
+
+    python matrix.py --console hawtio --console stand-alone --driver Chrome --driver Firefox \
+        --jobs 4 -- -n 2 --driver-pool-size 1
+
+Everything after -- is passed to py.test.
+"""
+
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_combination(console: str, driver: str, args: argparse.Namespace, pytest_args: list) -> int:
+    """Runs py.test for one console and driver, returns its exit code"""
+    name = '{}-{}'.format(console, driver)
+    artifacts_dir = os.path.join(args.artifacts_dir, name)
+    os.makedirs(artifacts_dir, exist_ok=True)
+    command = [sys.executable, '-m', 'pytest',
+               '--driver', driver,
+               '--console', console,
+               '--base-url', '{}/{}'.format(args.console_url, console),
+               '--artifacts-dir', artifacts_dir] + pytest_args
+    thence = time.time()
+    with open(os.path.join(artifacts_dir, 'pytest.log'), 'w') as log:
+        code = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT)
+    print('{} finished with exit code {}. Took {:.1f} s'.format(name, code, time.time() - thence))
+    return code
+
+
+def main():
+    argv = sys.argv[1:]
+    pytest_args = []
+    if '--' in argv:
+        pytest_args = argv[argv.index('--') + 1:]
+        argv = argv[:argv.index('--')]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--console', action='append', choices=['hawtio', 'stand-alone'],
+                        help='console to test, can be repeated (default: both)')
+    parser.add_argument('--driver', action='append',
+                        help='pytest-selenium driver, can be repeated (default: Chrome and Firefox)')
+    parser.add_argument('--console-url', default='http://127.0.0.1:8080',
+                        help='URL of the Tomcat serving the consoles')
+    parser.add_argument('--artifacts-dir', default='artifacts')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='number of combinations running at the same time')
+    args = parser.parse_args(argv)
+
+    consoles = args.console or ['hawtio', 'stand-alone']
+    drivers = args.driver or ['Chrome', 'Firefox']
+
+    thence = time.time()
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(run_combination, console, driver, args, pytest_args)
+                   for console, driver in itertools.product(consoles, drivers)]
+        codes = [f.result() for f in futures]
+    print('Matrix finished. Took {:.1f} s'.format(time.time() - thence))
+    sys.exit(max(codes))
+
+
+if __name__ == '__main__':
+    main()
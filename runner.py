@@ -19,35 +19,33 @@
 
 """Quick test runner
 
-Edit the source at indicated spots to pick what gets run and
-where. After a run, you are dropped to IPython debugger.
-Press
-  q to terminate the runner
-  c to reload test sources and do new run in same browser window
+Keeps one browser open and watches the webdriver package. When a file changes,
+it reloads the changed module and every module that imports it, then reruns
+the test modules among them with py.test, in the same browser. Runs are
+in-process, so there is no interpreter or browser startup between them.
 
-Keep this configured for the local Chrome on jdanek's laptop.
+    python runner.py
+    python runner.py webdriver/test_overview_page.py -- -k expanding --pdb
 
-If there are ever multiple users, I may switch to CLI parameters,
-env variables, or something like that.
+Everything after -- is passed to py.test. Stop the runner with Ctrl+C.
+
+Keep the defaults configured for the local Chrome on jdanek's laptop.
 """
 
+import argparse
+import ast
+import functools
 import importlib
+import os
+import sys
 import time
-import traceback
+from typing import Dict, List, Set
 
+import pytest
 from selenium import webdriver
-from IPython.core.debugger import Tracer
-
-import webdriver.page_objects as page_objects
-import webdriver.test_connect_page as test_connect_page
-import webdriver.test_overview_page as test_overview_page
-
-# useful inside the IPython debugger
-from selenium.webdriver.common.by import By
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
+from webdriver.driver_pool import DriverPool
+from webdriver.drivers import LocalBrowserFactory
 
 # BASE_URL = 'http://10.0.2.2:8080/hawtio'
 # CONSOLE_IP = '10.0.2.2'
@@ -55,12 +53,22 @@ from selenium.webdriver.support import expected_conditions as EC
 BASE_URL = 'http://127.0.0.1:8080/hawtio'
 CONSOLE_IP = '127.0.0.1'
 
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PACKAGE = 'webdriver'
+# conftest.py is imported by py.test under this name
+CONFTEST = 'conftest'
+# capabilities the runner's browser is pooled under
+SHARED_DRIVER_CAPABILITIES = {'runner': True}
 
-def initialize_local_chrome():
-    options = webdriver.ChromeOptions()
-    options.binary_location = '/home/jdanek/.nix-profile/bin/google-chrome-stable'
-    driver = webdriver.Chrome(chrome_options=options)
-    return driver
+
+CHROME_BINARY = '/home/jdanek/.nix-profile/bin/google-chrome-stable'
+
+
+def initialize_local_chrome(headless: bool = True, profile_dir: str = None, base_url: str = BASE_URL):
+    binary = CHROME_BINARY if os.path.exists(CHROME_BINARY) else None
+    factory = LocalBrowserFactory('chrome', headless=headless, binary=binary, profile_dir=profile_dir)
+    factory.warm_up([base_url])
+    return factory.create()
 
 
 def initialize_remote_selenium():
@@ -84,43 +92,181 @@ def deinitialize_selenium(driver: webdriver.Remote):
     driver.close()
 
 
-def reload_test(selenium):
-    """Reloads modules and instantiates a test.
-
-    Edit this method to choose which test you want to be executed
-    """
-    base_url = BASE_URL
-    console_ip = CONSOLE_IP
-
-    importlib.reload(page_objects)
-    importlib.reload(test_connect_page)
-    importlib.reload(test_overview_page)
-
-    suite = test_connect_page.TestConnectPage().setup(base_url, console_ip, selenium)
-    test = suite.test_submit_form_with_enter_key
-    return test
-
-
-def main():
-
-    selenium = initialize_local_chrome()
-    # selenium = initialize_remote_selenium()
-    try:
+def module_files() -> Dict[str, str]:
+    """Module name -> file name, for everything the runner watches"""
+    files = {CONFTEST: os.path.join(ROOT, 'conftest.py')}
+    for name in sorted(os.listdir(os.path.join(ROOT, PACKAGE))):
+        if name.endswith('.py') and name != '__init__.py':
+            files['{}.{}'.format(PACKAGE, name[:-len('.py')])] = os.path.join(ROOT, PACKAGE, name)
+    return files
+
+
+def is_test_module(module: str) -> bool:
+    return module.startswith(PACKAGE + '.test_')
+
+
+class ImportGraph(object):
+    """Which watched modules import which, found by parsing their sources"""
+    def __init__(self, files: Dict[str, str]):
+        self.files = files
+        self.imports = {m: self._parse(m, path) for m, path in files.items()}  # type: Dict[str, Set[str]]
+
+    def _parse(self, module: str, path: str) -> Set[str]:
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        package = module.rpartition('.')[0]
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ''
+                if node.level:
+                    base = '.'.join(filter(None, [package, base]))
+                names.add(base)
+                # from webdriver import page_objects
+                names.update('{}.{}'.format(base, alias.name) for alias in node.names)
+        return {name for name in names if name in self.files and name != module}
+
+    def dependents(self, changed: Set[str]) -> Set[str]:
+        """The changed modules and all modules that import them, directly or not"""
+        affected = set(changed)
+        grown = True
+        while grown:
+            grown = False
+            for module, imports in self.imports.items():
+                if module not in affected and imports & affected:
+                    affected.add(module)
+                    grown = True
+        return affected
+
+    def reload_order(self, modules: Set[str]) -> List[str]:
+        """Orders modules so that every module comes after the modules it imports"""
+        order = []  # type: List[str]
+
+        def visit(module, path):
+            if module in order or module not in modules:
+                return
+            if module in path:
+                raise ImportError('Circular import: {}'.format(' -> '.join(path + [module])))
+            for imported in sorted(self.imports[module]):
+                visit(imported, path + [module])
+            order.append(module)
+
+        for m in sorted(modules):
+            visit(m, [])
+        return order
+
+
+class RunnerPlugin(object):
+    """Lends the runner's browser to conftest.py and times the tests"""
+    def __init__(self, pool: DriverPool, factory):
+        self.pool = pool
+        self.factory = factory
+        self.durations = {}  # type: Dict[str, float]
+
+    def pytest_configure(self, config):
+        config.shared_driver_pool = self.pool
+        config.shared_driver_factory = self.factory
+
+    def pytest_runtest_logreport(self, report):
+        self.durations[report.nodeid] = self.durations.get(report.nodeid, 0.0) + report.duration
+
+
+class Runner(object):
+    def __init__(self, factory, tests: List[str], pytest_args: List[str], interval: float):
+        self.factory = factory
+        self.tests = tests
+        self.pytest_args = pytest_args
+        self.interval = interval
+        # a single browser, kept for as long as the runner runs, see the selenium fixture in conftest.py
+        self.pool = DriverPool(size=1, max_uses=sys.maxsize)
+        self.mtimes = self._mtimes()
+
+    def _mtimes(self) -> Dict[str, float]:
+        return {module: os.stat(path).st_mtime for module, path in module_files().items()}
+
+    def changed_modules(self) -> Set[str]:
+        mtimes = self._mtimes()
+        changed = {module for module, mtime in mtimes.items() if self.mtimes.get(module) != mtime}
+        self.mtimes = mtimes
+        return changed
+
+    def reload(self, changed: Set[str]) -> List[str]:
+        """Reloads the changed modules and their dependents, returns the test modules to rerun"""
+        graph = ImportGraph(module_files())
+        affected = graph.dependents(changed)
+        for module in graph.reload_order(affected):
+            if module in sys.modules:
+                importlib.reload(sys.modules[module])
+        if CONFTEST in affected:
+            # every test depends on conftest, whether it imports it or not
+            return self.tests
+        selected = [graph.files[m] for m in sorted(affected) if is_test_module(m)]
+        return [path for path in selected if any(path.startswith(t) for t in self.tests)]
+
+    def run(self, paths: List[str]):
+        plugin = RunnerPlugin(self.pool, self.factory)
+        thence = time.time()
+        code = pytest.main(self.pytest_args + paths, plugins=[plugin])
+        took = time.time() - thence
+        for nodeid, duration in sorted(plugin.durations.items(), key=lambda item: item[1], reverse=True)[:10]:
+            print('{:8.2f} s  {}'.format(duration, nodeid))
+        print('Run finished with exit code {}. Took {:.1f} s'.format(code, took))
+
+    def watch(self):
+        # make sure the browser is up before the first run, so that run times are comparable
+        self.pool.release(self.pool.acquire(self.factory, SHARED_DRIVER_CAPABILITIES))
+        self.run(self.tests)
+        print('Watching {} for changes'.format(os.path.join(ROOT, PACKAGE)))
         while True:
+            time.sleep(self.interval)
+            changed = self.changed_modules()
+            if not changed:
+                continue
             thence = time.time()
-            print('Beginning a new run')
-            test = reload_test(selenium)
-
             try:
-                test()
-            except:
-                traceback.print_exc()
+                paths = self.reload(changed)
+            except Exception as e:  # a syntax error in the file being edited, most likely
+                print('Reloading {} failed: {!r}'.format(', '.join(sorted(changed)), e))
+                continue
+            print('Changed {}, reloaded in {:.2f} s'.format(', '.join(sorted(changed)), time.time() - thence))
+            if paths:
+                self.run(paths)
+            else:
+                print('No tests depend on the change')
 
-            print('Run finished. Took {}. Continue?'.format(time.time() - thence))
-            Tracer(colors='NoColor')()
 
+def main():
+    argv = sys.argv[1:]
+    pytest_args = []
+    if '--' in argv:
+        pytest_args = argv[argv.index('--') + 1:]
+        argv = argv[:argv.index('--')]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tests', nargs='*', default=[os.path.join(ROOT, PACKAGE)],
+                        help='test files to run first and to limit reruns to (default: all)')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--console-ip', default=CONSOLE_IP)
+    parser.add_argument('--console', default='hawtio', choices=['hawtio', 'stand-alone'])
+    parser.add_argument('--remote', action='store_true', help='use the remote Selenium instead of local Chrome')
+    parser.add_argument('--headed', action='store_true', help='show the local Chrome window')
+    parser.add_argument('--profile-dir', help='warmed up Chrome profile to start from, see webdriver/drivers.py')
+    parser.add_argument('--interval', type=float, default=0.5, help='how often to look for changes, in seconds')
+    args = parser.parse_args(argv)
+
+    pytest_args = ['--base-url', args.base_url, '--console-ip', args.console_ip,
+                   '--console', args.console] + pytest_args
+    factory = initialize_remote_selenium if args.remote else functools.partial(
+        initialize_local_chrome, headless=not args.headed, profile_dir=args.profile_dir, base_url=args.base_url)
+    runner = Runner(factory, [os.path.abspath(t) for t in args.tests], pytest_args, args.interval)
+    try:
+        runner.watch()
+    except KeyboardInterrupt:
+        pass
     finally:
-        deinitialize_selenium(selenium)
+        runner.pool.close()
 
 
 # Tip: select everything from here up and Execute Selection in Console (Alt+Shift+E in Intellij)
@@ -0,0 +1,495 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Just enough AMQP 1.0 to talk to the console and to a router, without qpid-proton
+
+Covers the type system, frames, performatives and message sections, as described in
+http://docs.oasis-open.org/amqp/core/v1.0/os/amqp-core-complete-v1.0-os.pdf
+Type names follow qpid-proton (ubyte, uint, symbol, ...).
+"""
+
+import struct
+import uuid
+from typing import Dict, List, Tuple
+
+AMQP_HEADER = b'AMQP\x00\x01\x00\x00'
+SASL_HEADER = b'AMQP\x03\x01\x00\x00'
+
+FRAME_AMQP = 0
+FRAME_SASL = 1
+
+
+class ubyte(int):
+    pass
+
+
+class ushort(int):
+    pass
+
+
+class uint(int):
+    pass
+
+
+class ulong(int):
+    pass
+
+
+class byte(int):
+    pass
+
+
+class short(int):
+    pass
+
+
+class int32(int):
+    pass
+
+
+class timestamp(int):
+    """Milliseconds since the Unix epoch"""
+
+
+class float32(float):
+    pass
+
+
+class symbol(str):
+    pass
+
+
+class Array(list):
+    """AMQP array; all elements must be of the same type"""
+
+
+class Described(object):
+    def __init__(self, descriptor, value):
+        self.descriptor = descriptor
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Described) and (self.descriptor, self.value) == (other.descriptor, other.value)
+
+    def __repr__(self):
+        return 'Described({!r}, {!r})'.format(self.descriptor, self.value)
+
+
+class DecodeError(Exception):
+    pass
+
+
+# Encoding
+
+def _sized(small_code: int, large_code: int, payload: bytes) -> bytes:
+    if len(payload) < 256:
+        return struct.pack('>BB', small_code, len(payload)) + payload
+    return struct.pack('>BI', large_code, len(payload)) + payload
+
+
+def _compound(small_code: int, large_code: int, count: int, payload: bytes) -> bytes:
+    if len(payload) + 1 < 256 and count < 256:
+        return struct.pack('>BBB', small_code, len(payload) + 1, count) + payload
+    return struct.pack('>BII', large_code, len(payload) + 4, count) + payload
+
+
+def encode(value, wide: bool = False) -> bytes:
+    """Encodes a value, including its constructor
+
+    Compact encodings (smalluint, str8, ...) are used unless `wide` is set, as it has to be for array elements.
+    """
+    if value is None:
+        return b'\x40'
+    if isinstance(value, Described):
+        return b'\x00' + encode(value.descriptor) + encode(value.value)
+    if isinstance(value, bool):
+        if wide:
+            return struct.pack('>BB', 0x56, int(value))
+        return b'\x41' if value else b'\x42'
+    if isinstance(value, ubyte):
+        return struct.pack('>BB', 0x50, value)
+    if isinstance(value, ushort):
+        return struct.pack('>BH', 0x60, value)
+    if isinstance(value, uint):
+        if not wide and value == 0:
+            return b'\x43'
+        if not wide and value < 256:
+            return struct.pack('>BB', 0x52, value)
+        return struct.pack('>BI', 0x70, value)
+    if isinstance(value, ulong):
+        if not wide and value == 0:
+            return b'\x44'
+        if not wide and value < 256:
+            return struct.pack('>BB', 0x53, value)
+        return struct.pack('>BQ', 0x80, value)
+    if isinstance(value, byte):
+        return struct.pack('>Bb', 0x51, value)
+    if isinstance(value, short):
+        return struct.pack('>Bh', 0x61, value)
+    if isinstance(value, timestamp):
+        return struct.pack('>Bq', 0x83, value)
+    if isinstance(value, int32) or (isinstance(value, int) and -2 ** 31 <= value < 2 ** 31):
+        if not wide and -128 <= value < 128:
+            return struct.pack('>Bb', 0x54, value)
+        return struct.pack('>Bi', 0x71, value)
+    if isinstance(value, int):
+        if not wide and -128 <= value < 128:
+            return struct.pack('>Bb', 0x55, value)
+        return struct.pack('>Bq', 0x81, value)
+    if isinstance(value, float32):
+        return struct.pack('>Bf', 0x72, value)
+    if isinstance(value, float):
+        return struct.pack('>Bd', 0x82, value)
+    if isinstance(value, uuid.UUID):
+        return b'\x98' + value.bytes
+    if isinstance(value, symbol):
+        payload = value.encode('ascii')
+        return struct.pack('>BI', 0xb3, len(payload)) + payload if wide else _sized(0xa3, 0xb3, payload)
+    if isinstance(value, str):
+        payload = value.encode('utf-8')
+        return struct.pack('>BI', 0xb1, len(payload)) + payload if wide else _sized(0xa1, 0xb1, payload)
+    if isinstance(value, (bytes, bytearray)):
+        payload = bytes(value)
+        return struct.pack('>BI', 0xb0, len(payload)) + payload if wide else _sized(0xa0, 0xb0, payload)
+    if isinstance(value, Array):
+        return _encode_array(value)
+    if isinstance(value, (list, tuple)):
+        if not value and not wide:
+            return b'\x45'
+        return _compound(0xc0, 0xd0, len(value), b''.join(encode(v) for v in value))
+    if isinstance(value, dict):
+        payload = b''.join(encode(k) + encode(v) for k, v in value.items())
+        return _compound(0xc1, 0xd1, 2 * len(value), payload)
+    raise TypeError('Cannot encode {!r} as AMQP'.format(value))
+
+
+def _encode_array(values: Array) -> bytes:
+    if not values:
+        return struct.pack('>BBBB', 0xe0, 2, 0, 0x40)
+    elements = [encode(v, wide=True) for v in values]
+    constructor = elements[0][:1]
+    if any(e[:1] != constructor for e in elements):
+        raise TypeError('Array elements must be of the same type: {!r}'.format(values))
+    payload = constructor + b''.join(e[1:] for e in elements)
+    if len(payload) + 1 < 256 and len(values) < 256:
+        return struct.pack('>BBB', 0xe0, len(payload) + 1, len(values)) + payload
+    return struct.pack('>BII', 0xf0, len(payload) + 4, len(values)) + payload
+
+
+# Decoding
+
+_FIXED = {
+    0x50: ('>B', ubyte), 0x51: ('>b', byte), 0x60: ('>H', ushort), 0x61: ('>h', short),
+    0x70: ('>I', uint), 0x52: ('>B', uint), 0x71: ('>i', int), 0x54: ('>b', int),
+    0x80: ('>Q', ulong), 0x53: ('>B', ulong), 0x81: ('>q', int), 0x55: ('>b', int),
+    0x72: ('>f', float), 0x82: ('>d', float), 0x83: ('>q', timestamp),
+    0x73: ('>I', chr),
+}
+
+
+class Decoder(object):
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = data
+        self.offset = offset
+
+    def read(self, n: int) -> bytes:
+        if self.offset + n > len(self.data):
+            raise DecodeError('Unexpected end of data')
+        chunk = self.data[self.offset:self.offset + n]
+        self.offset += n
+        return chunk
+
+    def unpack(self, fmt: str):
+        return struct.unpack(fmt, self.read(struct.calcsize(fmt)))[0]
+
+    def at_end(self) -> bool:
+        return self.offset >= len(self.data)
+
+    def value(self):
+        code = self.unpack('>B')
+        if code == 0x00:
+            descriptor = self.value()
+            return Described(descriptor, self.value())
+        return self.value_of(code)
+
+    def value_of(self, code: int):
+        if code == 0x40:
+            return None
+        if code == 0x41:
+            return True
+        if code == 0x42:
+            return False
+        if code == 0x56:
+            return self.unpack('>B') != 0
+        if code == 0x43:
+            return uint(0)
+        if code == 0x44:
+            return ulong(0)
+        if code in _FIXED:
+            fmt, cast = _FIXED[code]
+            return cast(self.unpack(fmt))
+        if code == 0x98:
+            return uuid.UUID(bytes=self.read(16))
+        if code in (0xa0, 0xa1, 0xa3, 0xb0, 0xb1, 0xb3):
+            size = self.unpack('>B' if code < 0xb0 else '>I')
+            payload = self.read(size)
+            if code & 0x0f == 0x00:
+                return payload
+            if code & 0x0f == 0x01:
+                return payload.decode('utf-8')
+            return symbol(payload.decode('ascii'))
+        if code == 0x45:
+            return []
+        if code in (0xc0, 0xc1, 0xd0, 0xd1):
+            small = code < 0xd0
+            self.unpack('>B' if small else '>I')  # size
+            count = self.unpack('>B' if small else '>I')
+            items = [self.value() for _ in range(count)]
+            if code & 0x0f == 0x00:
+                return items
+            return dict(zip(items[0::2], items[1::2]))
+        if code in (0xe0, 0xf0):
+            small = code == 0xe0
+            self.unpack('>B' if small else '>I')  # size
+            count = self.unpack('>B' if small else '>I')
+            element_code = self.unpack('>B')
+            descriptor = None
+            if element_code == 0x00:
+                descriptor = self.value()
+                element_code = self.unpack('>B')
+            items = [self.value_of(element_code) for _ in range(count)]
+            if descriptor is not None:
+                items = [Described(descriptor, item) for item in items]
+            return Array(items)
+        raise DecodeError('Unknown AMQP type code 0x{:02x}'.format(code))
+
+
+def decode(data: bytes):
+    return Decoder(data).value()
+
+
+# Performatives, SASL frames and other described lists
+
+_LISTS = {
+    0x10: ('open', ['container_id', 'hostname', 'max_frame_size', 'channel_max', 'idle_time_out',
+                    'outgoing_locales', 'incoming_locales', 'offered_capabilities', 'desired_capabilities',
+                    'properties']),
+    0x11: ('begin', ['remote_channel', 'next_outgoing_id', 'incoming_window', 'outgoing_window', 'handle_max',
+                     'offered_capabilities', 'desired_capabilities', 'properties']),
+    0x12: ('attach', ['name', 'handle', 'role', 'snd_settle_mode', 'rcv_settle_mode', 'source', 'target',
+                      'unsettled', 'incomplete_unsettled', 'initial_delivery_count', 'max_message_size',
+                      'offered_capabilities', 'desired_capabilities', 'properties']),
+    0x13: ('flow', ['next_incoming_id', 'incoming_window', 'next_outgoing_id', 'outgoing_window', 'handle',
+                    'delivery_count', 'link_credit', 'available', 'drain', 'echo', 'properties']),
+    0x14: ('transfer', ['handle', 'delivery_id', 'delivery_tag', 'message_format', 'settled', 'more',
+                        'rcv_settle_mode', 'state', 'resume', 'aborted', 'batchable']),
+    0x15: ('disposition', ['role', 'first', 'last', 'settled', 'state', 'batchable']),
+    0x16: ('detach', ['handle', 'closed', 'error']),
+    0x17: ('end', ['error']),
+    0x18: ('close', ['error']),
+    0x1d: ('error', ['condition', 'description', 'info']),
+    0x23: ('received', ['section_number', 'section_offset']),
+    0x24: ('accepted', []),
+    0x25: ('rejected', ['error']),
+    0x26: ('released', []),
+    0x27: ('modified', ['delivery_failed', 'undeliverable_here', 'message_annotations']),
+    0x28: ('source', ['address', 'durable', 'expiry_policy', 'timeout', 'dynamic', 'dynamic_node_properties',
+                      'distribution_mode', 'filter', 'default_outcome', 'outcomes', 'capabilities']),
+    0x29: ('target', ['address', 'durable', 'expiry_policy', 'timeout', 'dynamic', 'dynamic_node_properties',
+                      'capabilities']),
+    0x40: ('sasl_mechanisms', ['sasl_server_mechanisms']),
+    0x41: ('sasl_init', ['mechanism', 'initial_response', 'hostname']),
+    0x42: ('sasl_challenge', ['challenge']),
+    0x43: ('sasl_response', ['response']),
+    0x44: ('sasl_outcome', ['code', 'additional_data']),
+}
+_CODES = {name: code for code, (name, _) in _LISTS.items()}
+
+
+class Performative(object):
+    """A described list from the table above, with fields accessible as attributes"""
+    def __init__(self, kind: str, **fields):
+        if kind not in _CODES:
+            raise ValueError('Unknown performative {}'.format(kind))
+        self.kind = kind
+        self.fields = fields
+
+    def __getattr__(self, item):
+        if item in ('kind', 'fields'):
+            raise AttributeError(item)
+        return self.fields.get(item)
+
+    def to_described(self) -> Described:
+        names = _LISTS[_CODES[self.kind]][1]
+        values = [self.fields.get(n) for n in names]
+        while values and values[-1] is None:
+            values.pop()
+        return Described(ulong(_CODES[self.kind]), values)
+
+    @classmethod
+    def from_described(cls, described: Described) -> 'Performative':
+        kind, names = _LISTS[int(described.descriptor)]
+        values = described.value or []
+        return cls(kind, **dict(zip(names, values)))
+
+    def __repr__(self):
+        return '{}({})'.format(self.kind, ', '.join('{}={!r}'.format(k, v) for k, v in sorted(self.fields.items())
+                                                     if v is not None))
+
+
+def _as_performatives(value):
+    """Turns described lists we know into Performative instances, recursively"""
+    if isinstance(value, Described) and isinstance(value.descriptor, int) and int(value.descriptor) in _LISTS:
+        performative = Performative.from_described(value)
+        performative.fields = {k: _as_performatives(v) for k, v in performative.fields.items()}
+        return performative
+    return value
+
+
+def _to_described(value):
+    if isinstance(value, Performative):
+        described = value.to_described()
+        described.value = [_to_described(v) for v in described.value]
+        return described
+    return value
+
+
+def encode_frame(performative: Performative, channel: int = 0, payload: bytes = b'', frame_type: int = FRAME_AMQP) \
+        -> bytes:
+    body = encode(_to_described(performative)) + payload
+    return struct.pack('>IBBH', 8 + len(body), 2, frame_type, channel) + body
+
+
+EMPTY_FRAME = struct.pack('>IBBH', 8, 2, FRAME_AMQP, 0)
+
+
+def decode_frame(frame: bytes) -> Tuple[int, int, Performative, bytes]:
+    """Returns frame type, channel, performative (None for an empty frame) and the rest of the body"""
+    size, doff, frame_type, channel = struct.unpack('>IBBH', frame[:8])
+    if size == 4 * doff:
+        return frame_type, channel, None, b''
+    decoder = Decoder(frame, 4 * doff)
+    performative = _as_performatives(decoder.value())
+    return frame_type, channel, performative, frame[decoder.offset:]
+
+
+def split_frames(buffer: bytearray) -> List[bytes]:
+    """Removes all complete frames from the beginning of the buffer and returns them"""
+    frames = []
+    while len(buffer) >= 4:
+        size = struct.unpack('>I', buffer[:4])[0]
+        if len(buffer) < size:
+            break
+        frames.append(bytes(buffer[:size]))
+        del buffer[:size]
+    return frames
+
+
+# Messages
+
+_PROPERTIES = ['message_id', 'user_id', 'to', 'subject', 'reply_to', 'correlation_id', 'content_type',
+               'content_encoding', 'absolute_expiry_time', 'creation_time', 'group_id', 'group_sequence',
+               'reply_to_group_id']
+
+_HEADER = 0x70
+_DELIVERY_ANNOTATIONS = 0x71
+_MESSAGE_ANNOTATIONS = 0x72
+_PROPERTIES_SECTION = 0x73
+_APPLICATION_PROPERTIES = 0x74
+_DATA = 0x75
+_AMQP_SEQUENCE = 0x76
+_AMQP_VALUE = 0x77
+_FOOTER = 0x78
+
+# a section can also be described by the symbolic name of its descriptor
+_SECTION_SYMBOLS = {
+    'amqp:header:list': _HEADER,
+    'amqp:delivery-annotations:map': _DELIVERY_ANNOTATIONS,
+    'amqp:message-annotations:map': _MESSAGE_ANNOTATIONS,
+    'amqp:properties:list': _PROPERTIES_SECTION,
+    'amqp:application-properties:map': _APPLICATION_PROPERTIES,
+    'amqp:data:binary': _DATA,
+    'amqp:amqp-sequence:list': _AMQP_SEQUENCE,
+    'amqp:amqp-value:*': _AMQP_VALUE,
+    'amqp:footer:map': _FOOTER,
+}
+
+
+class Message(object):
+    def __init__(self, body=None, properties: Dict = None, application_properties: Dict = None,
+                 message_annotations: Dict = None):
+        self.body = body
+        self.properties = properties or {}
+        self.application_properties = application_properties or {}
+        self.message_annotations = message_annotations or {}
+
+    def __getattr__(self, item):
+        # message properties are available as attributes, message.to, message.reply_to, ...
+        if item in _PROPERTIES:
+            return self.properties.get(item)
+        raise AttributeError(item)
+
+    def __repr__(self):
+        return 'Message(properties={!r}, application_properties={!r}, body={!r})'.format(
+            self.properties, self.application_properties, self.body)
+
+
+def encode_message(message: Message) -> bytes:
+    sections = []
+    if message.message_annotations:
+        sections.append(Described(ulong(_MESSAGE_ANNOTATIONS),
+                                  {symbol(k): v for k, v in message.message_annotations.items()}))
+    if message.properties:
+        values = [message.properties.get(p) for p in _PROPERTIES]
+        while values and values[-1] is None:
+            values.pop()
+        sections.append(Described(ulong(_PROPERTIES_SECTION), values))
+    if message.application_properties:
+        sections.append(Described(ulong(_APPLICATION_PROPERTIES), message.application_properties))
+    if isinstance(message.body, (bytes, bytearray)):
+        sections.append(Described(ulong(_DATA), bytes(message.body)))
+    else:
+        sections.append(Described(ulong(_AMQP_VALUE), message.body))
+    return b''.join(encode(s) for s in sections)
+
+
+def decode_message(data: bytes) -> Message:
+    message = Message()
+    decoder = Decoder(data)
+    while not decoder.at_end():
+        section = decoder.value()
+        if not isinstance(section, Described):
+            raise DecodeError('Message section is not described: {!r}'.format(section))
+        code = _section_code(section.descriptor)
+        if code == _PROPERTIES_SECTION:
+            message.properties = {k: v for k, v in zip(_PROPERTIES, section.value) if v is not None}
+        elif code == _APPLICATION_PROPERTIES:
+            message.application_properties = section.value or {}
+        elif code == _MESSAGE_ANNOTATIONS:
+            message.message_annotations = section.value or {}
+        elif code in (_AMQP_VALUE, _DATA, _AMQP_SEQUENCE):
+            message.body = section.value
+    return message
+
+
+def _section_code(descriptor) -> int:
+    """The numeric code of a section descriptor; None for a symbolic one that is not in the specification"""
+    if isinstance(descriptor, str):
+        return _SECTION_SYMBOLS.get(descriptor)
+    return int(descriptor)
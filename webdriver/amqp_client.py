@@ -0,0 +1,297 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Blocking AMQP client for talking to a router, built on webdriver.amqp
+
+One TCP connection with SASL ANONYMOUS, one session, and any number of links on it.
+Nothing happens in the background: frames from the router are read while the client
+waits for credit, for a message, or for the answer to an attach. A Client is not
+thread-safe, give every thread its own.
+
+    with Client('127.0.0.1', 5672) as client:
+        nodes = client.query('org.apache.qpid.dispatch.router.node', ['id'])
+"""
+
+import collections
+import itertools
+import socket
+import time
+import uuid
+from typing import Deque, Dict, List, Optional
+
+from webdriver.amqp import (AMQP_HEADER, FRAME_AMQP, FRAME_SASL, SASL_HEADER, Message, Performative,
+                            decode_frame, decode_message, encode_frame, encode_message, symbol,
+                            ubyte, uint, ushort)
+
+MANAGEMENT_ADDRESS = '$management'
+WINDOW = uint(2 ** 31 - 1)
+
+
+class AmqpError(Exception):
+    pass
+
+
+class AmqpTimeout(AmqpError):
+    """The router did not give credit, a message or an answer in time"""
+
+
+class Link(object):
+    def __init__(self, name: str, handle: int, sender: bool, address: Optional[str]):
+        self.name = name
+        self.handle = handle
+        self.sender = sender
+        self.address = address
+        self.attached = False
+        self.credit = 0
+        self.delivery_count = 0
+        self.partial = bytearray()
+        self.messages = collections.deque()  # type: Deque[Message]
+
+
+class Client(object):
+    def __init__(self, host: str, port: int, timeout: float = 10.0, container_id: str = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.container_id = container_id or 'dispatch-console-tests-{}'.format(uuid.uuid4())
+        self.max_frame_size = 65536
+        self.links = {}  # type: Dict[int, Link]
+        self.sent = 0
+        self.received = 0
+        self._socket = None  # type: socket.socket
+        self._buffer = bytearray()
+        self._handles = itertools.count()
+        self._next_delivery_id = 0
+        self._next_incoming_id = 0
+        self._management_replies = None  # type: Link
+        self._management_senders = {}  # type: Dict[str, Link]
+
+    def __enter__(self) -> 'Client':
+        self.connect()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def connect(self):
+        self._socket = socket.create_connection((self.host, self.port), self.timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.sendall(SASL_HEADER)
+        self._expect_header(SASL_HEADER)
+        self._expect('sasl_mechanisms')
+        self._send(Performative('sasl_init', mechanism=symbol('ANONYMOUS'), initial_response=b''),
+                   frame_type=FRAME_SASL)
+        outcome = self._expect('sasl_outcome')
+        if outcome.code != 0:
+            raise AmqpError('SASL ANONYMOUS was refused by {}:{}'.format(self.host, self.port))
+        self._socket.sendall(AMQP_HEADER)
+        self._expect_header(AMQP_HEADER)
+        self._send(Performative('open', container_id=self.container_id, hostname=self.host,
+                                max_frame_size=uint(self.max_frame_size), channel_max=ushort(0)))
+        remote_open = self._expect('open')
+        if remote_open.max_frame_size:
+            self.max_frame_size = min(self.max_frame_size, int(remote_open.max_frame_size))
+        self._send(Performative('begin', next_outgoing_id=uint(0), incoming_window=WINDOW, outgoing_window=WINDOW))
+        begin = self._expect('begin')
+        self._next_incoming_id = int(begin.next_outgoing_id or 0)
+
+    def close(self):
+        if self._socket is None:
+            return
+        try:
+            self._send(Performative('close'))
+        except OSError:
+            pass
+        self._socket.close()
+        self._socket = None
+
+    def sender(self, address: Optional[str]) -> Link:
+        """Attaches a sender to address, or an anonymous one for address None"""
+        return self._attach(Link('sender-{}'.format(uuid.uuid4()), next(self._handles), True, address))
+
+    def receiver(self, address: Optional[str] = None, credit: int = 100) -> Link:
+        """Attaches a receiver; without an address, the router assigns one, which is then in link.address"""
+        link = self._attach(Link('receiver-{}'.format(uuid.uuid4()), next(self._handles), False, address))
+        link.credit = credit
+        self._flow(link)
+        return link
+
+    def send(self, link: Link, message: Message, timeout: float = None):
+        """Sends a pre-settled message once the link has credit"""
+        self._wait(lambda: link.credit > 0, timeout, 'credit on {}'.format(link.address))
+        data = encode_message(message)
+        chunk_size = self.max_frame_size - 64  # room for the frame header and the transfer performative
+        chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)] or [b'']
+        delivery_id = self._next_delivery_id
+        self._next_delivery_id += 1
+        for i, chunk in enumerate(chunks):
+            more = i < len(chunks) - 1
+            if i == 0:
+                transfer = Performative('transfer', handle=uint(link.handle), delivery_id=uint(delivery_id),
+                                        delivery_tag=delivery_id.to_bytes(8, 'big'), message_format=uint(0),
+                                        settled=True, more=more)
+            else:
+                transfer = Performative('transfer', handle=uint(link.handle), more=more)
+            self._send(transfer, payload=chunk)
+        link.credit -= 1
+        link.delivery_count += 1
+        self.sent += 1
+
+    def receive(self, link: Link, timeout: float = None) -> Message:
+        self._wait(lambda: bool(link.messages), timeout, 'a message on {}'.format(link.address))
+        return link.messages.popleft()
+
+    def poll(self, timeout: float = 0.0):
+        """Processes frames that arrive within timeout"""
+        try:
+            self._process(self._read_frame(timeout))
+        except socket.timeout:
+            pass
+
+    def request(self, address: str, message: Message, timeout: float = None) -> Message:
+        """Sends a management request to address and returns the response"""
+        if self._management_replies is None:
+            self._management_replies = self.receiver()
+        if address not in self._management_senders:
+            self._management_senders[address] = self.sender(address)
+        correlation_id = str(uuid.uuid4())
+        message.properties.update(reply_to=self._management_replies.address, correlation_id=correlation_id)
+        self.send(self._management_senders[address], message, timeout)
+        while True:
+            response = self.receive(self._management_replies, timeout)
+            if response.correlation_id == correlation_id:
+                return response
+
+    def query(self, entity_type: str, attributes: List[str], router: str = None, timeout: float = None) \
+            -> List[Dict[str, object]]:
+        """Management QUERY, of the router connected to or of another one in the mesh"""
+        address = MANAGEMENT_ADDRESS if router is None else 'amqp:/_topo/0/{}/{}'.format(router, MANAGEMENT_ADDRESS)
+        response = self.request(address, Message(body={'attributeNames': attributes},
+                                                 application_properties={'operation': 'QUERY',
+                                                                         'entityType': entity_type}), timeout)
+        code = response.application_properties.get('statusCode')
+        if code != 200:
+            raise AmqpError('QUERY {} failed with {} {}'.format(
+                entity_type, code, response.application_properties.get('statusDescription')))
+        names = response.body['attributeNames']
+        return [dict(zip(names, values)) for values in response.body['results']]
+
+    def _attach(self, link: Link) -> Link:
+        self.links[link.handle] = link
+        if link.sender:
+            self._send(Performative('attach', name=link.name, handle=uint(link.handle), role=False,
+                                    snd_settle_mode=ubyte(1), source=Performative('source'),
+                                    target=Performative('target', address=link.address),
+                                    initial_delivery_count=uint(0)))
+        else:
+            source = Performative('source', address=link.address, dynamic=link.address is None)
+            self._send(Performative('attach', name=link.name, handle=uint(link.handle), role=True,
+                                    source=source, target=Performative('target')))
+        self._wait(lambda: link.attached, None, 'attach of {}'.format(link.address))
+        return link
+
+    def _flow(self, link: Link):
+        self._send(Performative('flow', next_incoming_id=uint(self._next_incoming_id), incoming_window=WINDOW,
+                                next_outgoing_id=uint(self._next_delivery_id), outgoing_window=WINDOW,
+                                handle=uint(link.handle), delivery_count=uint(link.delivery_count),
+                                link_credit=uint(link.credit)))
+
+    def _wait(self, condition, timeout: Optional[float], what: str):
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while not condition():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise AmqpTimeout('Timed out waiting for {}'.format(what))
+            try:
+                self._process(self._read_frame(remaining))
+            except socket.timeout:
+                pass
+
+    def _process(self, frame: bytes):
+        _, channel, performative, payload = decode_frame(frame)
+        if performative is None:
+            return  # heartbeat
+        kind = performative.kind
+        if kind == 'attach':
+            link = next((l for l in self.links.values() if l.name == performative.name), None)
+            if link is None:
+                return
+            if not link.sender and performative.source is not None and performative.source.address:
+                link.address = performative.source.address
+            if (link.sender and performative.target is None) or (not link.sender and performative.source is None):
+                raise AmqpError('Attach of {} was refused'.format(link.address))
+            link.attached = True
+        elif kind == 'flow' and performative.handle is not None:
+            link = self.links.get(int(performative.handle))
+            if link is not None and link.sender:
+                link.credit = (performative.delivery_count or 0) + (performative.link_credit or 0) - \
+                              link.delivery_count
+        elif kind == 'transfer':
+            self._next_incoming_id += 1
+            link = self.links[int(performative.handle)]
+            link.partial += payload
+            if performative.more:
+                return
+            link.messages.append(decode_message(bytes(link.partial)))
+            link.partial = bytearray()
+            link.delivery_count += 1
+            link.credit -= 1
+            self.received += 1
+            if not performative.settled:
+                self._send(Performative('disposition', role=True, first=performative.delivery_id, settled=True,
+                                        state=Performative('accepted')))
+            if link.credit <= 0:
+                link.credit = 100
+                self._flow(link)
+        elif kind in ('detach', 'end', 'close') and performative.error is not None:
+            raise AmqpError('{} from {}:{}: {}'.format(kind, self.host, self.port, performative.error))
+        elif kind == 'close':
+            raise AmqpError('Connection to {}:{} was closed'.format(self.host, self.port))
+
+    def _send(self, performative: Performative, payload: bytes = b'', frame_type: int = FRAME_AMQP):
+        self._socket.sendall(encode_frame(performative, 0, payload, frame_type))
+
+    def _expect_header(self, header: bytes):
+        self._fill(8, self.timeout)
+        received = bytes(self._buffer[:8])
+        del self._buffer[:8]
+        if received != header:
+            raise AmqpError('Expected protocol header {!r}, got {!r}'.format(header, received))
+
+    def _expect(self, kind: str) -> Performative:
+        _, _, performative, _ = decode_frame(self._read_frame(self.timeout))
+        if performative is None or performative.kind != kind:
+            raise AmqpError('Expected {}, got {!r}'.format(kind, performative))
+        return performative
+
+    def _read_frame(self, timeout: float) -> bytes:
+        self._fill(4, timeout)
+        size = int.from_bytes(self._buffer[:4], 'big')
+        self._fill(size, timeout)
+        frame = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return frame
+
+    def _fill(self, n: int, timeout: float):
+        self._socket.settimeout(max(timeout, 0.001))
+        while len(self._buffer) < n:
+            data = self._socket.recv(65536)
+            if not data:
+                raise AmqpError('Connection to {}:{} was closed'.format(self.host, self.port))
+            self._buffer += data
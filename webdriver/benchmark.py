@@ -0,0 +1,173 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Timing measurements of the console, taken by the browser
+
+Durations come from the User Timing API (performance.mark/measure), and from
+Navigation and Resource Timing for page loads, so that WebDriver round-trips
+are not counted in. All values are in milliseconds.
+"""
+
+import json
+import statistics
+from collections import OrderedDict
+from typing import Dict, List
+
+from selenium import webdriver
+
+
+def mark(selenium: webdriver.Remote, name: str):
+    selenium.execute_script("window.performance.mark(arguments[0]);", name)
+
+
+def measure(selenium: webdriver.Remote, name: str, start_mark: str, end_mark: str) -> float:
+    """Duration between two marks in the current document"""
+    return selenium.execute_script("""
+    window.performance.measure(arguments[0], arguments[1], arguments[2]);
+    var entries = window.performance.getEntriesByName(arguments[0], 'measure');
+    return entries[entries.length - 1].duration;""", name, start_mark, end_mark)
+
+
+def time_to_element(selenium: webdriver.Remote, css_selector: str, timeout: int = 30) -> float:
+    """Milliseconds from the navigation start of the current document until a matching element appears"""
+    selenium.set_script_timeout(timeout)
+    return selenium.execute_async_script("""
+    var selector = arguments[0], callback = arguments[arguments.length - 1];
+    if (document.querySelector(selector)) {
+      callback(window.performance.now());
+      return;
+    }
+    var observer = new MutationObserver(function () {
+      if (document.querySelector(selector)) {
+        observer.disconnect();
+        callback(window.performance.now());
+      }
+    });
+    observer.observe(document.documentElement, {childList: true, subtree: true});""", css_selector)
+
+
+def watch_click(selenium: webdriver.Remote, name: str, css_selectors: List[str]):
+    """Times from the next click in the page until all css_selectors match, see wait_measurement
+
+    The last selector has to match an element added after the click, so that the measurement does not stop
+    at what the previous page left behind. The clock starts in the browser's click event, and it stops in the
+    MutationObserver callback that finds all elements, so neither WebDriver round-trips nor polling are
+    counted in. The page must not be loaded again.
+    """
+    selenium.execute_script("""
+    var name = arguments[0], selectors = arguments[1], last = selectors[selectors.length - 1];
+    var results = window.qdBenchmark = window.qdBenchmark || {};
+    delete results[name];
+    var added = false;
+    var observer = new MutationObserver(function (mutations) {
+      added = added || mutations.some(function (mutation) {
+        return Array.prototype.some.call(mutation.addedNodes, function (node) {
+          return node.nodeType === 1 && (node.matches(last) || node.querySelector(last));
+        });
+      });
+      if (added && selectors.every(function (selector) { return document.querySelector(selector); })) {
+        observer.disconnect();
+        results[name] = window.performance.now() - start;
+      }
+    });
+    var start = null;
+    window.addEventListener('click', function onClick() {
+      window.removeEventListener('click', onClick, true);
+      start = window.performance.now();
+      observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+    }, true);""", name, css_selectors)
+
+
+def wait_measurement(selenium: webdriver.Remote, name: str, timeout: int = 30) -> float:
+    """Milliseconds measured by watch_click, once the measurement is done"""
+    selenium.set_script_timeout(timeout)
+    return selenium.execute_async_script("""
+    var name = arguments[0], callback = arguments[arguments.length - 1];
+    (function poll() {
+      var results = window.qdBenchmark || {};
+      if (results.hasOwnProperty(name)) {
+        callback(results[name]);
+      } else {
+        setTimeout(poll, 20);
+      }
+    })();""", name)
+
+
+def navigation_timing(selenium: webdriver.Remote) -> Dict[str, float]:
+    """Page load milestones of the current document, and totals from Resource Timing"""
+    return selenium.execute_script("""
+    var t = window.performance.timing, start = t.navigationStart;
+    var resources = window.performance.getEntriesByType('resource');
+    var transferred = 0, duration = 0;
+    resources.forEach(function (r) {
+      transferred += r.transferSize || 0;
+      duration = Math.max(duration, r.responseEnd);
+    });
+    return {
+      responseEnd: t.responseEnd - start,
+      domContentLoaded: t.domContentLoadedEventEnd - start,
+      load: t.loadEventEnd - start,
+      resourceCount: resources.length,
+      resourceBytes: transferred,
+      resourcesDone: duration
+    };""")
+
+
+class BenchmarkRecorder(object):
+    """Collects samples of named measurements, saves them and compares them with a baseline"""
+    def __init__(self, environment: Dict[str, str] = None):
+        self.environment = environment or {}
+        self.samples = OrderedDict()  # type: Dict[str, List[float]]
+
+    def record(self, name: str, value: float):
+        self.samples.setdefault(name, []).append(value)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return OrderedDict((name, {
+            'median': statistics.median(values),
+            'min': min(values),
+            'max': max(values),
+            'samples': values,
+        }) for name, values in self.samples.items())
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump({'environment': self.environment, 'results': self.summary()}, f, indent=2)
+
+    @staticmethod
+    def load_baseline(path: str) -> Dict[str, Dict[str, float]]:
+        with open(path) as f:
+            return json.load(f)['results']
+
+    def regressions(self, baseline: Dict[str, Dict[str, float]], threshold: float, names: List[str] = None) \
+            -> List[str]:
+        """Describes measurements whose median got worse than the baseline median by more than threshold
+
+        Threshold is relative, 0.25 allows the median to grow by a quarter.
+        """
+        problems = []
+        summary = self.summary()
+        for name in names or summary.keys():
+            if name not in baseline or name not in summary:
+                continue
+            before, now = baseline[name]['median'], summary[name]['median']
+            if before > 0 and now > before * (1 + threshold):
+                problems.append('{}: median {:.1f} ms, baseline {:.1f} ms (+{:.0%})'.format(
+                    name, now, before, now / before - 1))
+        return problems
@@ -0,0 +1,256 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Reverse proxy in front of the console server that keeps static assets in memory
+
+The first successful GET of a script, stylesheet, image or font is fetched from
+the upstream server. After that, the asset is served from memory, with headers
+that let the browser cache it for a long time. Everything else is passed through
+untouched, and a request asking for a WebSocket upgrade turns into a plain TCP
+tunnel to the upstream server. Given head_html, the proxy puts it at the start of
+the head of every HTML page, so that it runs before the page's own scripts.
+
+    python -m webdriver.caching_proxy http://127.0.0.1:8080 --port 8081
+"""
+
+import argparse
+import re
+import http.client
+import http.server
+import select
+import socket
+import socketserver
+import threading
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+STATIC_EXTENSIONS = ('.js', '.css', '.png', '.gif', '.jpg', '.svg', '.ico', '.woff', '.woff2', '.ttf', '.eot',
+                     '.map')
+
+# https://tools.ietf.org/html/rfc7230#section-6.1
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailer',
+              'transfer-encoding', 'upgrade'}
+
+LONG_CACHE = 'public, max-age=31536000'
+
+
+class CachedResponse(object):
+    def __init__(self, status: int, headers: List[Tuple[str, str]], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class ProxyHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server = None  # type: CachingProxy
+
+    def do_GET(self):
+        if not self.is_static():
+            self.pass_through()
+            return
+        key = (self.path, self.headers.get('Accept-Encoding', ''))
+        cached = self.server.cache_get(key)
+        if cached is None:
+            cached = self.pass_through(keep=True)
+            if cached is not None:
+                self.server.cache_put(key, cached)
+            return
+        self.send_response(cached.status)
+        for name, value in cached.headers:
+            self.send_header(name, value)
+        self.send_header('Cache-Control', LONG_CACHE)
+        self.send_header('Content-Length', str(len(cached.body)))
+        self.end_headers()
+        self.wfile.write(cached.body)
+
+    def do_HEAD(self):
+        self.pass_through()
+
+    do_POST = do_PUT = do_DELETE = do_OPTIONS = do_PATCH = do_HEAD
+
+    def is_static(self) -> bool:
+        if self.headers.get('Upgrade'):
+            return False
+        return urlsplit(self.path).path.lower().endswith(STATIC_EXTENSIONS)
+
+    def pass_through(self, keep: bool = False) -> CachedResponse:
+        """Forwards the request upstream and the response back; returns it if keep is set and it can be cached"""
+        if self.headers.get('Upgrade', '').lower() == 'websocket':
+            self.tunnel()
+            return None
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else None
+        # a page that is going to be edited has to come uncompressed
+        edit = self.server.head_html is not None and 'text/html' in self.headers.get('Accept', '')
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() not in HOP_BY_HOP and not (edit and name.lower() == 'accept-encoding')}
+        headers['Host'] = self.server.upstream.netloc
+        connection = self.server.upstream_connection()
+        try:
+            connection.request(self.command, self.path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+        if edit and response.status == 200:
+            data = self.server.add_to_head(response.getheader('Content-Type', ''),
+                                           response.getheader('Content-Encoding'), data)
+        response_headers = [(name, self.server.rewrite_location(value) if name.lower() == 'location' else value)
+                            for name, value in response.getheaders() if name.lower() not in HOP_BY_HOP]
+        stored = keep and response.status == 200 and self.cacheable(response_headers)
+        if stored:
+            # the browser gets the same headers for this response as for the ones served from memory later
+            response_headers = [(name, value) for name, value in response_headers
+                                if name.lower() not in ('cache-control', 'expires', 'set-cookie')]
+        self.send_response(response.status, response.reason)
+        for name, value in response_headers:
+            if name.lower() != 'content-length':
+                self.send_header(name, value)
+        if stored:
+            self.send_header('Cache-Control', LONG_CACHE)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+        self.server.count('passed')
+        if stored:
+            kept = [(name, value) for name, value in response_headers if name.lower() != 'content-length']
+            return CachedResponse(response.status, kept, data)
+        return None
+
+    @staticmethod
+    def cacheable(headers: List[Tuple[str, str]]) -> bool:
+        for name, value in headers:
+            if name.lower() == 'set-cookie':
+                return False
+            if name.lower() == 'cache-control' and ('no-store' in value or 'private' in value):
+                return False
+        return True
+
+    def tunnel(self):
+        """Replays the upgrade request upstream and then copies bytes both ways until one side closes"""
+        upstream = socket.create_connection((self.server.upstream.hostname, self.server.upstream.port or 80))
+        request = ['{} {} {}'.format(self.command, self.path, self.request_version)]
+        for name, value in self.headers.items():
+            request.append('{}: {}'.format(name, self.server.upstream.netloc if name.lower() == 'host' else value))
+        upstream.sendall(('\r\n'.join(request) + '\r\n\r\n').encode('latin-1'))
+        self.server.count('tunnelled')
+        self.wfile.flush()
+        client = self.connection
+        sockets = [client, upstream]
+        try:
+            while True:
+                readable, _, failed = select.select(sockets, [], sockets, 60)
+                if failed:
+                    break
+                if not readable:
+                    continue
+                for source in readable:
+                    data = source.recv(65536)
+                    if not data:
+                        return
+                    (upstream if source is client else client).sendall(data)
+        finally:
+            upstream.close()
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass  # one line per asset would drown the test output
+
+
+class CachingProxy(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """The proxy server; requests to http://host:port/... go to upstream/..."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, upstream: str, host: str = '127.0.0.1', port: int = 0, head_html: str = None):
+        super().__init__((host, port), ProxyHandler)
+        self.upstream = urlsplit(upstream)
+        self.head_html = head_html
+        self.host = host
+        self.port = self.server_address[1]
+        self.stats = {'hits': 0, 'misses': 0, 'passed': 0, 'tunnelled': 0}  # type: Dict[str, int]
+        self._cache = {}  # type: Dict[tuple, CachedResponse]
+        self._lock = threading.Lock()
+        self._thread = None  # type: threading.Thread
+
+    @property
+    def url(self) -> str:
+        return 'http://{}:{}'.format(self.host, self.port)
+
+    def upstream_connection(self) -> http.client.HTTPConnection:
+        if self.upstream.scheme == 'https':
+            return http.client.HTTPSConnection(self.upstream.hostname, self.upstream.port or 443, timeout=60)
+        return http.client.HTTPConnection(self.upstream.hostname, self.upstream.port or 80, timeout=60)
+
+    def rewrite_location(self, location: str) -> str:
+        """Keeps redirects of the upstream server pointing at the proxy"""
+        prefix = '{}://{}'.format(self.upstream.scheme, self.upstream.netloc)
+        if location.startswith(prefix):
+            return self.url + location[len(prefix):]
+        return location
+
+    def add_to_head(self, content_type: str, content_encoding: str, body: bytes) -> bytes:
+        """Puts head_html at the start of the head of an HTML page; other bodies are returned as they are"""
+        if not content_type.startswith('text/html') or content_encoding not in (None, 'identity'):
+            return body
+        head = re.search(rb'<head(\s[^>]*)?>', body, re.IGNORECASE)
+        at = head.end() if head else 0
+        return body[:at] + self.head_html.encode('utf-8') + body[at:]
+
+    def cache_get(self, key: tuple) -> CachedResponse:
+        with self._lock:
+            cached = self._cache.get(key)
+            self.stats['hits' if cached is not None else 'misses'] += 1
+        return cached
+
+    def cache_put(self, key: tuple, response: CachedResponse):
+        with self._lock:
+            self._cache[key] = response
+
+    def count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='caching-proxy', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Caching reverse proxy for the console server')
+    parser.add_argument('upstream', help='URL of the console server, e.g. http://127.0.0.1:8080')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    args = parser.parse_args()
+    proxy = CachingProxy(args.upstream, args.host, args.port)
+    print('Caching proxy for {} listening on {}'.format(args.upstream, proxy.url))
+    try:
+        proxy.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Chrome DevTools protocol commands, sent through chromedriver
+
+Selenium 3 has no API for this, but chromedriver accepts DevTools commands at
+/session/{id}/goog/cdp/execute, so the route is added to the command executor.
+"""
+
+from selenium import webdriver
+
+EXECUTE_CDP_COMMAND = 'executeCdpCommand'
+
+
+def has_devtools(selenium: webdriver.Remote) -> bool:
+    return selenium.capabilities.get('browserName') == 'chrome'
+
+
+def execute_cdp(selenium: webdriver.Remote, command: str, params: dict = None) -> dict:
+    """Result of a DevTools command, such as Performance.getMetrics"""
+    commands = selenium.command_executor._commands
+    if EXECUTE_CDP_COMMAND not in commands:
+        commands[EXECUTE_CDP_COMMAND] = ('POST', '/session/$sessionId/goog/cdp/execute')
+    return selenium.execute(EXECUTE_CDP_COMMAND, {'cmd': command, 'params': params or {}})['value']
@@ -0,0 +1,112 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Pool of reusable WebDriver sessions
+
+Starting a browser (or negotiating a session with SauceLabs/BrowserStack) takes
+longer than most of our tests. The pool keeps finished sessions around, cleans
+them up and hands them to the next test that asks for the same capabilities.
+"""
+
+import json
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+
+def capabilities_key(capabilities: dict) -> str:
+    """Sessions are interchangeable only if they were created with equal capabilities"""
+    return json.dumps(capabilities or {}, sort_keys=True, default=str)
+
+
+class PooledDriver(object):
+    """Bookkeeping for one live session"""
+    def __init__(self, driver: webdriver.Remote, key: str):
+        self.driver = driver
+        self.key = key
+        self.uses = 0
+
+
+class DriverPool(object):
+    """Hands out warmed-up WebDriver sessions, keyed by capabilities
+
+    At most `size` idle sessions are kept for every key. A session is retired after
+    `max_uses` tests, when the test using it failed, or when it cannot be reset.
+    """
+    def __init__(self, size: int = 1, max_uses: int = 20):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle = defaultdict(list)  # type: Dict[str, List[PooledDriver]]
+        self._busy = {}  # type: Dict[int, PooledDriver]
+        self._lock = threading.Lock()
+
+    def acquire(self, factory: Callable[[], webdriver.Remote], capabilities: dict = None) -> webdriver.Remote:
+        key = capabilities_key(capabilities)
+        with self._lock:
+            pooled = self._idle[key].pop() if self._idle[key] else None
+        if pooled is None:
+            pooled = PooledDriver(factory(), key)
+        pooled.uses += 1
+        with self._lock:
+            self._busy[id(pooled.driver)] = pooled
+        return pooled.driver
+
+    def release(self, driver: webdriver.Remote, failed: bool = False):
+        with self._lock:
+            pooled = self._busy.pop(id(driver))
+        if failed or pooled.uses >= self.max_uses or not self.reset(driver):
+            self.retire(driver)
+            return
+        with self._lock:
+            if len(self._idle[pooled.key]) < self.size:
+                self._idle[pooled.key].append(pooled)
+                return
+        self.retire(driver)
+
+    @staticmethod
+    def reset(driver: webdriver.Remote) -> bool:
+        """Wipes what a test could have left behind in the browser, returns False if that did not work"""
+        try:
+            driver.delete_all_cookies()
+            # storage is per origin, so it has to be cleared before leaving the console
+            driver.execute_script("""
+            try { window.localStorage.clear(); } catch (ex) {}
+            try { window.sessionStorage.clear(); } catch (ex) {}""")
+            driver.get('about:blank')
+        except WebDriverException:
+            return False
+        return True
+
+    @staticmethod
+    def retire(driver: webdriver.Remote):
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass  # the session is likely dead already, which is why we are retiring it
+
+    def close(self):
+        with self._lock:
+            pooled = [p for idle in self._idle.values() for p in idle] + list(self._busy.values())
+            self._idle.clear()
+            self._busy.clear()
+        for p in pooled:
+            self.retire(p.driver)
@@ -0,0 +1,159 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Local Chrome and Firefox, headless unless asked otherwise
+
+Browsers start with extensions, background networking, sync, updates and first run
+screens turned off. Given a profile directory, the factory first warms it up: it
+opens the console once, so that the disk cache holds its static assets, and every
+browser then starts from a copy of that profile. Copies are needed because a
+running browser locks its profile.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import List
+
+from selenium import webdriver
+
+from webdriver.traffic import merge_capabilities
+
+# marks a profile directory that has been warmed up already
+WARM_MARKER = '.dispatch-console-tests-warm'
+# lock files of a running Chrome or Firefox, which must not be copied along with the profile
+PROFILE_LOCKS = shutil.ignore_patterns('Singleton*', 'lock', '.parentlock', 'parent.lock')
+
+CHROME_ARGUMENTS = [
+    '--disable-background-networking',
+    # tabs in the background run at full speed, see webdriver/tabs.py
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-extensions',
+    '--disable-sync',
+    '--no-default-browser-check',
+    '--no-first-run',
+    '--window-size=1280,1024',
+]
+
+FIREFOX_PREFERENCES = {
+    'app.update.enabled': False,
+    'browser.cache.disk.enable': True,
+    'browser.safebrowsing.enabled': False,
+    'browser.safebrowsing.malware.enabled': False,
+    'browser.search.update': False,
+    'browser.shell.checkDefaultBrowser': False,
+    'datareporting.healthreport.uploadEnabled': False,
+    'datareporting.policy.dataSubmissionEnabled': False,
+    'extensions.update.enabled': False,
+    'network.prefetch-next': False,
+    'toolkit.telemetry.enabled': False,
+}
+
+
+class LocalBrowserFactory(object):
+    """Starts local browsers, see the module docstring"""
+    def __init__(self, browser: str = 'chrome', headless: bool = True, binary: str = None, profile_dir: str = None,
+                 capabilities: dict = None):
+        if browser not in ('chrome', 'firefox'):
+            raise ValueError('Unknown local browser {}, expected chrome or firefox'.format(browser))
+        self.browser = browser
+        self.headless = headless
+        self.binary = binary
+        self.profile_dir = profile_dir
+        # added to the browser's own capabilities, e.g. traffic.capabilities()
+        self.capabilities = capabilities or {}
+        self._copies = []  # type: List[str]
+
+    def create(self) -> webdriver.Remote:
+        if self.profile_dir is None or not self.is_warm():
+            return self._start()
+        if self.browser == 'firefox':
+            return self._start(self.profile_dir)
+        profile = os.path.join(tempfile.mkdtemp(prefix='dispatch-console-tests-'), 'profile')
+        shutil.copytree(self.profile_dir, profile, symlinks=True, ignore=PROFILE_LOCKS)
+        self._copies.append(os.path.dirname(profile))
+        return self._start(profile)
+
+    def _start(self, profile: str = None) -> webdriver.Remote:
+        if self.browser == 'chrome':
+            options = webdriver.ChromeOptions()
+            for argument in CHROME_ARGUMENTS:
+                options.add_argument(argument)
+            if self.headless:
+                options.add_argument('--headless')
+                options.add_argument('--disable-gpu')
+            if profile is not None:
+                options.add_argument('--user-data-dir={}'.format(profile))
+            if self.binary is not None:
+                options.binary_location = self.binary
+            return webdriver.Chrome(desired_capabilities=merge_capabilities(options.to_capabilities(),
+                                                                            self.capabilities))
+
+        options = webdriver.FirefoxOptions()
+        if self.headless:
+            options.add_argument('-headless')
+        if self.binary is not None:
+            options.binary_location = self.binary
+        # selenium copies the profile directory into a temporary one by itself
+        firefox_profile = webdriver.FirefoxProfile(profile)
+        for name, value in FIREFOX_PREFERENCES.items():
+            firefox_profile.set_preference(name, value)
+        capabilities = merge_capabilities(webdriver.DesiredCapabilities.FIREFOX, self.capabilities)
+        return webdriver.Firefox(firefox_profile=firefox_profile, firefox_options=options, capabilities=capabilities)
+
+    def is_warm(self) -> bool:
+        return os.path.exists(os.path.join(self.profile_dir, WARM_MARKER))
+
+    def warm_up(self, urls: List[str]):
+        """Fills the profile's disk cache by loading the urls once, unless that was done already"""
+        if self.profile_dir is None or self.is_warm():
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if self.browser == 'chrome':
+            driver = self._start(self.profile_dir)
+            try:
+                for url in urls:
+                    driver.get(url)
+            finally:
+                driver.quit()
+        else:
+            driver = self._start(self.profile_dir if os.listdir(self.profile_dir) else None)
+            try:
+                for url in urls:
+                    driver.get(url)
+                # geckodriver runs Firefox in a temporary copy of the profile, and deletes it on quit
+                running = driver.capabilities.get('moz:profile')
+                if running is None:
+                    return  # an old geckodriver that does not tell; the profile stays cold
+                driver.get('about:blank')
+                shutil.rmtree(self.profile_dir)
+                shutil.copytree(running, self.profile_dir, symlinks=True, ignore=PROFILE_LOCKS)
+            finally:
+                driver.quit()
+        open(os.path.join(self.profile_dir, WARM_MARKER), 'w').close()
+
+    def cleanup(self):
+        """Deletes the profile copies; call after the browsers quit"""
+        for copy in self._copies:
+            shutil.rmtree(copy, ignore_errors=True)
+        self._copies = []
@@ -0,0 +1,671 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""In-process stand-in for the management endpoint of qpid-dispatch router
+
+The console talks AMQP over WebSocket to the router (in our docker image, websockify
+on port 5673 forwards to the router). FakeRouter accepts these connections, or plain
+AMQP connections, and answers management requests from scripted entity data, so the
+console can be tested without Docker.
+
+Scripted data is a dict (or a JSON file) of the following shape
+
+    {
+        "schema": {"prefix": "org.apache.qpid.dispatch", "entityTypes": {...}},
+        "routers": {
+            "Router.A": {"router": [{"name": "...", ...}], "listener": [...], ...}
+        },
+        "mgmtNodes": [...]  # optional, answer to GET-MGMT-NODES
+    }
+
+Run `python -m webdriver.fake_router --help` to start one by hand.
+"""
+
+import argparse
+import base64
+import copy
+import hashlib
+import itertools
+import json
+import socket
+import socketserver
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from webdriver.amqp import (AMQP_HEADER, SASL_HEADER, FRAME_SASL, EMPTY_FRAME, Array, Message, Performative,
+                            decode_frame, decode_message, encode_frame, encode_message, symbol, ubyte, uint,
+                            ushort)
+
+ENTITY_PREFIX = 'org.apache.qpid.dispatch.'
+MANAGEMENT_ADDRESS = '$management'
+
+# attributes of the entity types the console shows, in the order qdmanage prints them
+ENTITY_ATTRIBUTES = {
+    'router': ['name', 'identity', 'id', 'mode', 'area', 'version', 'addrCount', 'linkCount', 'nodeCount',
+               'connectionCount', 'linkRouteCount', 'autoLinkCount', 'workerThreads'],
+    'listener': ['name', 'identity', 'host', 'port', 'role', 'authenticatePeer', 'saslMechanisms', 'http'],
+    'connector': ['name', 'identity', 'host', 'port', 'role', 'cost'],
+    'address': ['name', 'identity', 'prefix', 'distribution', 'waypoint'],
+    'linkRoute': ['name', 'identity', 'prefix', 'containerId', 'connection', 'dir'],
+    'autoLink': ['name', 'identity', 'addr', 'dir', 'phase', 'containerId', 'connection', 'operStatus'],
+    'sslProfile': ['name', 'identity', 'certDb', 'certFile', 'keyFile'],
+    'authServicePlugin': ['name', 'identity', 'host', 'port'],
+    'log': ['name', 'identity', 'module', 'enable', 'includeSource', 'includeTimestamp'],
+    'connection': ['name', 'identity', 'host', 'role', 'dir', 'container', 'sasl', 'isAuthenticated', 'user',
+                   'isEncrypted', 'opened', 'properties'],
+    'router.link': ['name', 'identity', 'linkType', 'linkDir', 'linkName', 'owningAddr', 'capacity', 'peer',
+                    'undeliveredCount', 'unsettledCount', 'deliveryCount', 'presettledCount', 'acceptedCount',
+                    'rejectedCount', 'releasedCount', 'modifiedCount', 'adminStatus', 'operStatus',
+                    'connectionId'],
+    'router.address': ['name', 'identity', 'distribution', 'inProcess', 'subscriberCount', 'remoteCount',
+                       'deliveriesIngress', 'deliveriesEgress', 'deliveriesTransit', 'deliveriesToContainer',
+                       'deliveriesFromContainer'],
+    'router.node': ['name', 'identity', 'id', 'protocolVersion', 'instance', 'linkState', 'nextHop',
+                    'validOrigins', 'address', 'routerLink', 'cost'],
+    'allocator': ['name', 'identity', 'typeName', 'typeSize', 'transferBatchSize', 'localFreeListMax',
+                  'globalFreeListMax', 'totalAllocFromHeap', 'totalFreeToHeap', 'heldByThreads'],
+    'policy': ['name', 'identity', 'maxConnections', 'enableVhostPolicy', 'connectionsProcessed',
+               'connectionsDenied', 'connectionsCurrent'],
+    'vhost': ['name', 'identity', 'id', 'maxConnections', 'allowUnknownUser'],
+    'vhostStats': ['name', 'identity', 'id', 'connectionsApproved', 'connectionsDenied', 'connectionsCurrent'],
+}
+
+CONFIGURATION_ENTITIES = {'router', 'listener', 'connector', 'address', 'linkRoute', 'autoLink', 'sslProfile',
+                          'authServicePlugin', 'log', 'policy', 'vhost'}
+
+
+def default_schema() -> dict:
+    """Schema in the format of GET-SCHEMA, covering ENTITY_ATTRIBUTES"""
+    entity_types = {}
+    for entity_type, attributes in ENTITY_ATTRIBUTES.items():
+        configuration = entity_type in CONFIGURATION_ENTITIES
+        entity_types[entity_type] = {
+            'fullyQualifiedType': ENTITY_PREFIX + entity_type,
+            'extends': 'configurationEntity' if configuration else 'operationalEntity',
+            'operations': ['CREATE', 'READ', 'UPDATE', 'DELETE'] if configuration else ['READ'],
+            'attributes': {a: {'type': 'string', 'description': ''} for a in attributes},
+            'description': '',
+        }
+    return {'prefix': ENTITY_PREFIX[:-1], 'entityTypes': entity_types, 'annotations': {}}
+
+
+def standalone_router_data(router_id: str = 'Router.A') -> dict:
+    """Entities of a standalone router configured like docker/run/router/console.conf"""
+    def entity(entity_type, name, **attributes):
+        attributes.update(name=name, identity='{}/{}'.format(entity_type, name))
+        return attributes
+
+    addresses = [('closest', 'closest'), ('multicast', 'multicast'), ('unicast', 'closest'),
+                 ('exclusive', 'closest'), ('broadcast', 'multicast')]
+    return {
+        'schema': default_schema(),
+        'routers': {router_id: {
+            'router': [entity('router', 'router/' + router_id, id=router_id, mode='standalone', area='0',
+                              version='0.8.0', addrCount=len(addresses), linkCount=2, nodeCount=0,
+                              connectionCount=1, linkRouteCount=0, autoLinkCount=0, workerThreads=4)],
+            'listener': [entity('listener', 'listener/0.0.0.0:amqp', host='0.0.0.0', port='amqp', role='normal',
+                                authenticatePeer=False, saslMechanisms=None, http=False),
+                         entity('listener', 'ProxyListener', host='0.0.0.0', port='20009', role='normal',
+                                authenticatePeer=False, saslMechanisms='ANONYMOUS', http=False)],
+            'address': [entity('address', 'address/' + prefix, prefix=prefix, distribution=distribution,
+                               waypoint=False) for prefix, distribution in addresses],
+            'log': [entity('log', 'log/' + module, module=module, enable='default', includeSource=False,
+                           includeTimestamp=True) for module in ['DEFAULT', 'ROUTER', 'AGENT', 'SERVER']],
+            'connection': [entity('connection', 'connection/127.0.0.1:20009', host='127.0.0.1:20009',
+                                  role='normal', dir='in', container='console', sasl='ANONYMOUS',
+                                  isAuthenticated=False, user='anonymous', isEncrypted=False, opened=True,
+                                  properties={})],
+            'router.link': [entity('router.link', 'router.link/{}'.format(i), linkType='endpoint',
+                                   linkDir=direction, linkName='link-{}'.format(i), owningAddr='M0$management',
+                                   capacity=250, peer=None, undeliveredCount=0, unsettledCount=0,
+                                   deliveryCount=0, presettledCount=0, acceptedCount=0, rejectedCount=0,
+                                   releasedCount=0, modifiedCount=0, adminStatus='enabled', operStatus='up',
+                                   connectionId=1)
+                            for i, direction in enumerate(['in', 'out'])],
+            'router.address': [entity('router.address', 'router.address/' + prefix, distribution=distribution,
+                                      inProcess=0, subscriberCount=0, remoteCount=0, deliveriesIngress=0,
+                                      deliveriesEgress=0, deliveriesTransit=0, deliveriesToContainer=0,
+                                      deliveriesFromContainer=0) for prefix, distribution in addresses],
+            'router.node': [],
+            'allocator': [entity('allocator', 'allocator/qd_message_t', typeName='qd_message_t', typeSize=128,
+                                 transferBatchSize=64, localFreeListMax=128, globalFreeListMax=0,
+                                 totalAllocFromHeap=64, totalFreeToHeap=0, heldByThreads=64)],
+            'policy': [entity('policy', 'policy/policy', maxConnections=65535, enableVhostPolicy=False,
+                              connectionsProcessed=1, connectionsDenied=0, connectionsCurrent=1)],
+        }},
+    }
+
+
+def management_node(router_id: str) -> str:
+    return 'amqp:/_topo/0/{}/{}'.format(router_id, MANAGEMENT_ADDRESS)
+
+
+class ManagementAgent(object):
+    """Answers AMQP management requests from scripted data"""
+    def __init__(self, data: dict):
+        self.data = copy.deepcopy(data)
+        self.schema = self.data.get('schema') or default_schema()
+        self.routers = self.data['routers']  # type: Dict[str, Dict[str, List[dict]]]
+        self.requests = Counter()  # operation -> number of requests
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_management_address(address: Optional[str]) -> bool:
+        return address is not None and address.endswith(MANAGEMENT_ADDRESS)
+
+    def router_for(self, address: str, local_router: str) -> str:
+        """Which router is the management request for, based on its address"""
+        if '_topo/' in address:
+            # amqp:/_topo/0/Router.B/$management
+            return address.split('_topo/', 1)[1].split('/')[1]
+        return local_router
+
+    def handle(self, router_id: str, request: Message) -> Message:
+        properties = request.application_properties
+        operation = properties.get('operation')
+        with self._lock:
+            self.requests[operation] += 1
+            try:
+                if router_id not in self.routers:
+                    raise ManagementError(404, 'Router {} not found'.format(router_id))
+                handler = getattr(self, 'op_' + str(operation).replace('-', '_').lower(), None)
+                if handler is None:
+                    raise ManagementError(501, 'Operation {} not implemented'.format(operation))
+                code, body = handler(self.routers[router_id], properties, request.body)
+                description = 'OK'
+            except ManagementError as e:
+                code, description, body = e.code, e.description, None
+        return Message(body=body,
+                       properties={'to': request.reply_to, 'correlation_id': request.correlation_id},
+                       application_properties={'statusCode': code, 'statusDescription': description})
+
+    @staticmethod
+    def short_type(entity_type: Optional[str]) -> Optional[str]:
+        if entity_type and entity_type.startswith(ENTITY_PREFIX):
+            return entity_type[len(ENTITY_PREFIX):]
+        return entity_type
+
+    def attribute_names(self, entity_type: str) -> List[str]:
+        entity_schema = self.schema['entityTypes'].get(entity_type, {})
+        return list(entity_schema.get('attributes', {}).keys()) or ENTITY_ATTRIBUTES.get(entity_type, [])
+
+    def find(self, entities: Dict[str, List[dict]], properties: dict) -> Tuple[str, dict]:
+        entity_type = self.short_type(properties.get('type'))
+        for t, candidates in entities.items():
+            if entity_type not in (None, t):
+                continue
+            for e in candidates:
+                if ('name' in properties and e.get('name') == properties['name']) or \
+                        ('identity' in properties and e.get('identity') == properties['identity']):
+                    return t, e
+        raise ManagementError(404, 'Entity not found: {}'.format(properties.get('name') or properties.get('identity')))
+
+    def op_query(self, entities, properties, body):
+        entity_type = self.short_type(properties.get('entityType'))
+        names = list((body or {}).get('attributeNames') or [])
+        if entity_type is not None:
+            rows = [(entity_type, e) for e in entities.get(entity_type, [])]
+            names = names or self.attribute_names(entity_type)
+        else:
+            rows = [(t, e) for t, candidates in entities.items() for e in candidates]
+            names = names or ['name', 'identity', 'type']
+        results = [[ENTITY_PREFIX + t if n == 'type' else e.get(n) for n in names] for t, e in rows]
+        return 200, {'attributeNames': names, 'results': results}
+
+    def op_read(self, entities, properties, body):
+        entity_type, entity = self.find(entities, properties)
+        return 200, dict(entity, type=ENTITY_PREFIX + entity_type)
+
+    def op_create(self, entities, properties, body):
+        entity_type = self.short_type(properties.get('type'))
+        name = properties.get('name') or (body or {}).get('name')
+        entity = dict(body or {}, name=name, identity='{}/{}'.format(entity_type, name))
+        entities.setdefault(entity_type, []).append(entity)
+        return 201, dict(entity, type=ENTITY_PREFIX + entity_type)
+
+    def op_update(self, entities, properties, body):
+        entity_type, entity = self.find(entities, properties)
+        entity.update(body or {})
+        return 200, dict(entity, type=ENTITY_PREFIX + entity_type)
+
+    def op_delete(self, entities, properties, body):
+        entity_type, entity = self.find(entities, properties)
+        entities[entity_type].remove(entity)
+        return 204, None
+
+    def op_get_mgmt_nodes(self, entities, properties, body):
+        if 'mgmtNodes' in self.data:
+            return 200, self.data['mgmtNodes']
+        return 200, [management_node(r) for r in self.routers]
+
+    def op_get_schema(self, entities, properties, body):
+        return 200, self.schema
+
+    def op_get_types(self, entities, properties, body):
+        return 200, {ENTITY_PREFIX + t: [] for t in self.schema['entityTypes']}
+
+    def op_get_attributes(self, entities, properties, body):
+        return 200, {ENTITY_PREFIX + t: self.attribute_names(t) for t in self.schema['entityTypes']}
+
+    def op_get_operations(self, entities, properties, body):
+        return 200, {ENTITY_PREFIX + t: s.get('operations', []) for t, s in self.schema['entityTypes'].items()}
+
+    def op_get_log(self, entities, properties, body):
+        return 200, []
+
+
+class ManagementError(Exception):
+    def __init__(self, code: int, description: str):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+
+
+class RawTransport(object):
+    """AMQP directly over TCP"""
+    def __init__(self, rfile, wfile):
+        self.rfile = rfile
+        self.wfile = wfile
+        self.lock = threading.Lock()
+
+    def recv(self) -> bytes:
+        return self.rfile.read1(65536)
+
+    def send(self, data: bytes):
+        with self.lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+
+
+class WebSocketTransport(RawTransport):
+    """AMQP over WebSocket, https://tools.ietf.org/html/rfc6455
+
+    websockify, which the console is used to, speaks the 'binary' and 'base64' subprotocols.
+    """
+    GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+    PROTOCOLS = ['binary', 'AMQPWSB10', 'amqp', 'base64']
+
+    def __init__(self, rfile, wfile):
+        super().__init__(rfile, wfile)
+        self.protocol = None
+
+    def handshake(self) -> bool:
+        self.rfile.readline()  # GET / HTTP/1.1
+        headers = {}
+        while True:
+            line = self.rfile.readline().decode('latin-1').strip()
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+        key = headers.get('sec-websocket-key')
+        if key is None:
+            self.send(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + self.GUID).encode('ascii')).digest()).decode('ascii')
+        offered = [p.strip() for p in headers.get('sec-websocket-protocol', '').split(',') if p.strip()]
+        self.protocol = next((p for p in self.PROTOCOLS if p in offered), None)
+        response = ['HTTP/1.1 101 Switching Protocols', 'Upgrade: websocket', 'Connection: Upgrade',
+                    'Sec-WebSocket-Accept: ' + accept]
+        if self.protocol:
+            response.append('Sec-WebSocket-Protocol: ' + self.protocol)
+        self.send(('\r\n'.join(response) + '\r\n\r\n').encode('latin-1'))
+        return True
+
+    def _read_exact(self, n: int) -> bytes:
+        data = self.rfile.read(n)
+        if len(data) < n:
+            raise EOFError()
+        return data
+
+    def recv(self) -> bytes:
+        message = b''
+        try:
+            while True:
+                b1, b2 = self._read_exact(2)
+                opcode = b1 & 0x0f
+                length = b2 & 0x7f
+                if length == 126:
+                    length = int.from_bytes(self._read_exact(2), 'big')
+                elif length == 127:
+                    length = int.from_bytes(self._read_exact(8), 'big')
+                mask = self._read_exact(4) if b2 & 0x80 else None
+                payload = self._read_exact(length)
+                if mask is not None:
+                    payload = _unmask(payload, mask)
+                if opcode == 0x8:  # close
+                    self._send_frame(0x8, payload[:2])
+                    return b''
+                if opcode == 0x9:  # ping
+                    self._send_frame(0xa, payload)
+                    continue
+                if opcode == 0xa:  # pong
+                    continue
+                message += payload
+                if b1 & 0x80:  # final fragment
+                    break
+        except EOFError:
+            return b''
+        if self.protocol == 'base64':
+            return base64.b64decode(message)
+        return message
+
+    def send_message(self, data: bytes):
+        if self.protocol == 'base64':
+            self._send_frame(0x1, base64.b64encode(data))
+        else:
+            self._send_frame(0x2, data)
+
+    def _send_frame(self, opcode: int, payload: bytes):
+        if len(payload) < 126:
+            header = bytes([0x80 | opcode, len(payload)])
+        elif len(payload) < 2 ** 16:
+            header = bytes([0x80 | opcode, 126]) + len(payload).to_bytes(2, 'big')
+        else:
+            header = bytes([0x80 | opcode, 127]) + len(payload).to_bytes(8, 'big')
+        self.send(header + payload)
+
+
+def _unmask(payload: bytes, mask: bytes) -> bytes:
+    n = len(payload)
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(n, 'big')
+
+
+class _Link(object):
+    def __init__(self, name: str, handle: int, address: Optional[str]):
+        self.name = name
+        self.handle = handle
+        self.address = address
+        self.credit = 0
+        self.delivery_count = 0
+        self.queue = []  # type: List[Message]
+        # incoming message that spans multiple transfer frames
+        self.partial = b''
+        self.delivery_id = None
+        self.settled = False
+
+
+class _Session(object):
+    def __init__(self):
+        self.next_delivery_id = 0
+        self.senders = {}  # type: Dict[int, _Link]
+        self.receivers = {}  # type: Dict[int, _Link]
+
+
+class AmqpConnection(object):
+    """Server side of one AMQP connection, routes management requests to the agent"""
+    MAX_FRAME_SIZE = 65536
+
+    _temporary_ids = itertools.count()
+
+    def __init__(self, router: 'FakeRouter', transport: RawTransport):
+        self.router = router
+        self.transport = transport
+        self.send_bytes = transport.send_message if isinstance(transport, WebSocketTransport) else transport.send
+        self.buffer = bytearray()
+        self.sessions = {}  # type: Dict[int, _Session]
+        self.max_frame_size = self.MAX_FRAME_SIZE
+        self.closed = threading.Event()
+
+    def _fill(self, n: int) -> bool:
+        while len(self.buffer) < n:
+            data = self.transport.recv()
+            if not data:
+                return False
+            self.buffer += data
+        return True
+
+    def _next_frame(self) -> Optional[bytes]:
+        """Takes one frame off the buffer; frames the peer pipelined behind it stay there for the next call"""
+        if not self._fill(4):
+            return None
+        size = int.from_bytes(self.buffer[:4], 'big')
+        if not self._fill(size):
+            return None
+        frame = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return frame
+
+    def send(self, performative: Performative, channel: int = 0, payload: bytes = b'', frame_type: int = 0):
+        self.send_bytes(encode_frame(performative, channel, payload, frame_type))
+
+    def run(self):
+        if not self._fill(8):
+            return
+        header = bytes(self.buffer[:8])
+        del self.buffer[:8]
+        if header == SASL_HEADER:
+            self.send_bytes(SASL_HEADER)
+            self.send(Performative('sasl_mechanisms', sasl_server_mechanisms=Array([symbol('ANONYMOUS')])),
+                      frame_type=FRAME_SASL)
+            if self._next_frame() is None:  # sasl-init, anything goes
+                return
+            self.send(Performative('sasl_outcome', code=ubyte(0)), frame_type=FRAME_SASL)
+            if not self._fill(8):
+                return
+            header = bytes(self.buffer[:8])
+            del self.buffer[:8]
+        self.send_bytes(AMQP_HEADER)
+        if header != AMQP_HEADER:
+            return
+        try:
+            while not self.closed.is_set():
+                frame = self._next_frame()
+                if frame is None:
+                    break
+                _, channel, performative, payload = decode_frame(frame)
+                if performative is not None:
+                    getattr(self, 'on_' + performative.kind)(channel, performative, payload)
+        finally:
+            self.closed.set()
+
+    def on_open(self, channel, open_, payload):
+        if open_.max_frame_size:
+            self.max_frame_size = min(self.max_frame_size, open_.max_frame_size)
+        self.send(Performative('open', container_id=self.router.router_id, max_frame_size=uint(self.max_frame_size),
+                               channel_max=ushort(255)))
+        if open_.idle_time_out:
+            threading.Thread(target=self._heartbeat, args=(open_.idle_time_out / 2000.0,), daemon=True).start()
+
+    def _heartbeat(self, interval: float):
+        while not self.closed.wait(interval):
+            try:
+                self.send_bytes(EMPTY_FRAME)
+            except (OSError, ValueError):
+                return
+
+    def on_begin(self, channel, begin, payload):
+        self.sessions[channel] = _Session()
+        self.send(Performative('begin', remote_channel=ushort(channel), next_outgoing_id=uint(0),
+                               incoming_window=uint(2 ** 31 - 1), outgoing_window=uint(2 ** 31 - 1)), channel)
+
+    def on_attach(self, channel, attach, payload):
+        session = self.sessions[channel]
+        if attach.role:  # peer is the receiver, we are sending
+            source = attach.source or Performative('source')
+            address = source.address
+            if source.dynamic:
+                address = 'amqp:/_topo/0/{}/temp.{}'.format(self.router.router_id, next(self._temporary_ids))
+            session.senders[attach.handle] = _Link(attach.name, attach.handle, address)
+            self.send(Performative('attach', name=attach.name, handle=attach.handle, role=False,
+                                   source=Performative('source', address=address, dynamic=source.dynamic),
+                                   target=attach.target, initial_delivery_count=uint(0)), channel)
+        else:
+            address = attach.target.address if attach.target is not None else None
+            session.receivers[attach.handle] = _Link(attach.name, attach.handle, address)
+            self.send(Performative('attach', name=attach.name, handle=attach.handle, role=True,
+                                   source=attach.source, target=attach.target), channel)
+            self.send(Performative('flow', next_incoming_id=uint(0), incoming_window=uint(2 ** 31 - 1),
+                                   next_outgoing_id=uint(0), outgoing_window=uint(2 ** 31 - 1),
+                                   handle=attach.handle, delivery_count=attach.initial_delivery_count or uint(0),
+                                   link_credit=uint(1000)), channel)
+
+    def on_flow(self, channel, flow, payload):
+        session = self.sessions[channel]
+        link = session.senders.get(flow.handle)
+        if link is None:
+            return
+        link.credit = (flow.delivery_count or 0) + (flow.link_credit or 0) - link.delivery_count
+        self._flush(channel, link)
+
+    def on_transfer(self, channel, transfer, payload):
+        session = self.sessions[channel]
+        link = session.receivers[transfer.handle]
+        if transfer.delivery_id is not None:
+            link.delivery_id = transfer.delivery_id
+            link.settled = transfer.settled
+        link.partial += payload
+        if transfer.more:
+            return
+        message = decode_message(link.partial)
+        link.partial = b''
+        link.delivery_count += 1
+        if not link.settled:
+            self.send(Performative('disposition', role=True, first=link.delivery_id, settled=True,
+                                   state=Performative('accepted')), channel)
+        address = link.address or message.to
+        self.router.delivered(address)
+        if self.router.agent.is_management_address(address):
+            router_id = self.router.agent.router_for(address, self.router.router_id)
+            self.reply(self.router.agent.handle(router_id, message))
+
+    def reply(self, message: Message):
+        for channel, session in self.sessions.items():
+            for link in session.senders.values():
+                if link.address == message.to:
+                    link.queue.append(message)
+                    self._flush(channel, link)
+                    return
+
+    def _flush(self, channel: int, link: _Link):
+        session = self.sessions[channel]
+        while link.credit > 0 and link.queue:
+            data = encode_message(link.queue.pop(0))
+            delivery_id = session.next_delivery_id
+            session.next_delivery_id += 1
+            chunk_size = self.max_frame_size - 64  # room for the frame header and the transfer performative
+            chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)] or [b'']
+            for i, chunk in enumerate(chunks):
+                more = i < len(chunks) - 1
+                if i == 0:
+                    transfer = Performative('transfer', handle=uint(link.handle), delivery_id=uint(delivery_id),
+                                            delivery_tag=delivery_id.to_bytes(4, 'big'),
+                                            message_format=uint(0), settled=True, more=more)
+                else:
+                    transfer = Performative('transfer', handle=uint(link.handle), more=more)
+                self.send(transfer, channel, chunk)
+            link.credit -= 1
+            link.delivery_count += 1
+
+    def on_disposition(self, channel, disposition, payload):
+        pass  # we only send settled messages
+
+    def on_detach(self, channel, detach, payload):
+        session = self.sessions[channel]
+        session.senders.pop(detach.handle, None)
+        session.receivers.pop(detach.handle, None)
+        self.send(Performative('detach', handle=detach.handle, closed=True), channel)
+
+    def on_end(self, channel, end, payload):
+        self.sessions.pop(channel, None)
+        self.send(Performative('end'), channel)
+
+    def on_close(self, channel, close, payload):
+        self.send(Performative('close'))
+        self.closed.set()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.rfile.peek(4)[:4] == b'GET ':
+            transport = WebSocketTransport(self.rfile, self.wfile)
+            if not transport.handshake():
+                return
+        else:
+            transport = RawTransport(self.rfile, self.wfile)
+        try:
+            AmqpConnection(self.server.router, transport).run()
+        except (OSError, EOFError):
+            pass  # client went away
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeRouter(object):
+    """Listens for console connections, pretending to be router `router_id` from the scripted data"""
+    def __init__(self, host: str = '127.0.0.1', port: int = 5673, data: dict = None, router_id: str = None):
+        self.agent = ManagementAgent(data or standalone_router_data())
+        self.router_id = router_id or next(iter(sorted(self.agent.routers)))
+        self.deliveries = Counter()  # address -> number of messages received
+        self._server = _Server((host, port), _Handler, bind_and_activate=False)
+        self._server.router = self
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def delivered(self, address: str):
+        self.deliveries[address] += 1
+
+    def start(self):
+        self._server.server_bind()
+        self._server.server_activate()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+def load_data(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake qpid-dispatch router management endpoint')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5673)
+    parser.add_argument('--data', help='JSON file with scripted entity data')
+    parser.add_argument('--dump-data', action='store_true', help='print the default scripted data and exit')
+    args = parser.parse_args()
+
+    if args.dump_data:
+        print(json.dumps(standalone_router_data(), indent=2, sort_keys=True))
+        return
+    router = FakeRouter(args.host, args.port, load_data(args.data) if args.data else None)
+    router.start()
+    print('Fake router {} listening on {}:{}'.format(router.router_id, args.host, router.port))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        router.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Which tests a change to the page objects can affect
+
+A run with --record-usage stores, for every console, which page object methods
+(as Class.method, named after the class that defines the method) and which page
+object classes each test used. --impacted-by <git ref> then maps the lines that
+changed in webdriver/page_objects.py since that ref to methods and classes, and
+keeps only the tests that used them.
+
+The selection errs on the side of running a test:
+ * tests missing from the usage map run,
+ * a change outside of classes and module level constants runs everything,
+ * a change to any other Python file runs everything, except for changes to
+   test modules, which run the tests in them.
+"""
+
+import ast
+import glob
+import json
+import os
+import re
+import subprocess
+from typing import Dict, List, Set, Tuple
+
+PAGE_OBJECTS = 'webdriver/page_objects.py'
+
+HUNK_HEADER = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+
+class Change(object):
+    """What a diff touched in the page objects"""
+    def __init__(self):
+        self.everything = False
+        self.actions = set()  # type: Set[str]
+        self.classes = set()  # type: Set[str]
+        self.test_files = set()  # type: Set[str]
+
+    def affects(self, nodeid: str, usage: Dict[str, List[str]]) -> bool:
+        if self.everything:
+            return True
+        if nodeid.split('::')[0] in self.test_files:
+            return True
+        return bool(self.actions.intersection(usage.get('actions', [])) or
+                    self.classes.intersection(usage.get('classes', [])))
+
+    def __repr__(self):
+        return 'Change(everything={}, actions={}, classes={}, test_files={})'.format(
+            self.everything, sorted(self.actions), sorted(self.classes), sorted(self.test_files))
+
+
+def git(root: str, *args) -> str:
+    return subprocess.check_output(['git'] + list(args), cwd=root, universal_newlines=True)
+
+
+def changed_lines(diff: str) -> Set[int]:
+    """Line numbers in the new version of a file that a -U0 diff added or changed, or next to a deletion"""
+    lines = set()
+    for line in diff.splitlines():
+        match = HUNK_HEADER.match(line)
+        if match:
+            start, count = int(match.group(1)), int(match.group(2) or 1)
+            # a pure deletion is reported as the line before it, with count 0
+            lines.update(range(start, start + count) if count else [start, start + 1])
+    return lines
+
+
+def _spans(body: list, end: int) -> List[Tuple[ast.AST, int, int]]:
+    """Statements with the line range each one covers; Python 3.5 ast has no end_lineno"""
+    spans = []
+    for i, node in enumerate(body):
+        last = body[i + 1].lineno - 1 if i + 1 < len(body) else end
+        first = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        spans.append((node, first, last))
+    return spans
+
+
+def _referencing_actions(tree: ast.Module, names: Set[str]) -> Set[str]:
+    """Methods whose body mentions one of the module level names"""
+    actions = set()
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        for item in node.body:
+            if isinstance(item, ast.FunctionDef) and any(
+                    isinstance(n, ast.Name) and n.id in names for n in ast.walk(item)):
+                actions.add('{}.{}'.format(node.name, item.name))
+    return actions
+
+
+def analyze(source: str, lines: Set[int], change: Change):
+    """Records into change what the changed lines of page_objects.py belong to"""
+    tree = ast.parse(source)
+    end = len(source.splitlines())
+    constants = set()  # type: Set[str]
+    for node, first, last in _spans(tree.body, end):
+        touched = {line for line in lines if first <= line <= last}
+        if not touched:
+            continue
+        if isinstance(node, ast.ClassDef):
+            for item, item_first, item_last in _spans(node.body, last):
+                if not any(item_first <= line <= item_last for line in touched):
+                    continue
+                if isinstance(item, ast.FunctionDef):
+                    change.actions.add('{}.{}'.format(node.name, item.name))
+                else:
+                    # a class attribute, such as a locator, can change the behaviour of any method on the class
+                    change.classes.add(node.name)
+            if any(line < node.body[0].lineno for line in touched):
+                change.classes.add(node.name)  # the class statement itself, or the decorators
+        elif isinstance(node, ast.Assign):
+            constants.update(t.id for t in node.targets if isinstance(t, ast.Name))
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Str):
+            pass  # docstring
+        else:
+            change.everything = True
+    change.actions.update(_referencing_actions(tree, constants))
+
+
+def diff_change(root: str, ref: str) -> Change:
+    """What changed between ref and the working tree"""
+    change = Change()
+    for path in git(root, 'diff', '--relative', '--name-only', ref, '--').splitlines():
+        if not path.endswith('.py'):
+            continue
+        if path == PAGE_OBJECTS:
+            diff = git(root, 'diff', '--relative', '-U0', ref, '--', path)
+            if not os.path.exists(os.path.join(root, path)):
+                change.everything = True
+                continue
+            with open(os.path.join(root, path)) as f:
+                analyze(f.read(), changed_lines(diff), change)
+        elif re.match(r'^webdriver/test_[^/]*\.py$', path):
+            change.test_files.add(path)
+        else:
+            change.everything = True
+    return change
+
+
+class UsageMap(object):
+    """Page object usage of tests, by console and test node id"""
+    def __init__(self, consoles: Dict[str, Dict[str, dict]] = None):
+        self.consoles = consoles or {}
+
+    @classmethod
+    def load(cls, path: str) -> 'UsageMap':
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls(json.load(f)['consoles'])
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump({'consoles': self.consoles}, f, indent=2, sort_keys=True)
+
+    def update(self, console: str, usage: Dict[str, dict]):
+        self.consoles.setdefault(console, {}).update(usage)
+
+    def merge_partials(self, path: str):
+        """Merges maps written by pytest-xdist workers into path.gwN and deletes them"""
+        for partial in sorted(glob.glob(path + '.gw*')):
+            for console, usage in UsageMap.load(partial).consoles.items():
+                self.update(console, usage)
+            os.remove(partial)
+
+    def select(self, console: str, nodeids: List[str], change: Change) -> Set[str]:
+        """The node ids that should run"""
+        usage = self.consoles.get(console, {})
+        return {nodeid for nodeid in nodeids if nodeid not in usage or change.affects(nodeid, usage[nodeid])}
@@ -0,0 +1,207 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Where tests spend their time
+
+Instrumentation.install() wraps the methods, classmethods and properties of page
+objects, WebDriverWait.until and the WebDriver command executor. Every call of a
+wrapped action records its duration and the number of WebDriver commands (round
+trips to the browser) it sent, under the test that is currently running.
+Durations of nested actions are inclusive, so wait_for_frameworks called from
+connect_to is counted in both. Under --instrument, conftest.py saves the report of
+every pytest-xdist worker separately, see --instrument-output.
+"""
+
+import functools
+import inspect
+import json
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Set, Tuple
+
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+from selenium.webdriver.support.wait import WebDriverWait
+
+from webdriver import page_objects
+
+
+class ActionStats(object):
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.round_trips = 0
+
+    def add(self, seconds: float, round_trips: int):
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.round_trips += round_trips
+
+    def merge(self, other: 'ActionStats'):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+        self.round_trips += other.round_trips
+
+    def to_dict(self) -> dict:
+        return OrderedDict([('calls', self.calls), ('seconds', round(self.seconds, 4)),
+                            ('max_seconds', round(self.max_seconds, 4)), ('round_trips', self.round_trips)])
+
+
+class PerTestStats(object):
+    def __init__(self):
+        self.actions = OrderedDict()  # type: Dict[str, ActionStats]
+        self.commands = Counter()  # type: Counter
+        # page object classes the test used, including their base classes
+        self.classes = set()  # type: Set[str]
+        self.seconds = 0.0
+
+    @property
+    def round_trips(self) -> int:
+        return sum(self.commands.values())
+
+    def to_dict(self) -> dict:
+        return OrderedDict([
+            ('seconds', round(self.seconds, 4)),
+            ('round_trips', self.round_trips),
+            ('commands', OrderedDict(self.commands.most_common())),
+            ('classes', sorted(self.classes)),
+            ('actions', OrderedDict((name, stats.to_dict()) for name, stats in self.actions.items())),
+        ])
+
+
+class Instrumentation(object):
+    """Records per-test durations and round trips of page object actions"""
+    def __init__(self):
+        self.tests = OrderedDict()  # type: Dict[str, PerTestStats]
+        self.current = None  # type: PerTestStats
+        self.round_trips = 0
+        self._test_started = 0.0
+        self._originals = []  # type: List[Tuple[object, str, object]]
+
+    def start_test(self, name: str):
+        self.current = self.tests.setdefault(name, PerTestStats())
+        self._test_started = time.perf_counter()
+
+    def end_test(self):
+        if self.current is not None:
+            self.current.seconds += time.perf_counter() - self._test_started
+        self.current = None
+
+    def install(self):
+        for cls in vars(page_objects).values():
+            if inspect.isclass(cls) and issubclass(cls, page_objects.PageObject):
+                self._instrument_class(cls)
+        self._patch(WebDriverWait, 'until', self.timed('WebDriverWait.until', WebDriverWait.until))
+        self._patch(RemoteConnection, 'execute', self._counting(RemoteConnection.execute))
+
+    def uninstall(self):
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+    def timed(self, action: str, function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if self.current is None:
+                return function(*args, **kwargs)
+            stats = self.current.actions.setdefault(action, ActionStats())
+            if args:
+                self._record_class(args[0])
+            round_trips = self.round_trips
+            thence = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.add(time.perf_counter() - thence, self.round_trips - round_trips)
+        return wrapper
+
+    def _record_class(self, owner):
+        cls = owner if inspect.isclass(owner) else type(owner)
+        if issubclass(cls, page_objects.PageObject):
+            self.current.classes.update(c.__name__ for c in cls.__mro__ if issubclass(c, page_objects.PageObject))
+
+    def usage(self) -> Dict[str, dict]:
+        """Page object methods and classes each test used, see webdriver.impact"""
+        return {name: {'actions': sorted(stats.actions), 'classes': sorted(stats.classes)}
+                for name, stats in self.tests.items()}
+
+    def _counting(self, execute: Callable) -> Callable:
+        @functools.wraps(execute)
+        def wrapper(connection, command, params):
+            self.round_trips += 1
+            if self.current is not None:
+                self.current.commands[command] += 1
+            return execute(connection, command, params)
+        return wrapper
+
+    def _instrument_class(self, cls):
+        for name, attribute in list(vars(cls).items()):
+            if name.startswith('__'):
+                continue
+            action = '{}.{}'.format(cls.__name__, name)
+            if isinstance(attribute, classmethod):
+                wrapped = classmethod(self.timed(action, attribute.__func__))
+            elif isinstance(attribute, staticmethod):
+                wrapped = staticmethod(self.timed(action, attribute.__func__))
+            elif isinstance(attribute, property) and attribute.fget is not None:
+                wrapped = property(self.timed(action, attribute.fget), attribute.fset, attribute.fdel,
+                                   attribute.__doc__)
+            elif inspect.isfunction(attribute):
+                wrapped = self.timed(action, attribute)
+            else:
+                continue
+            self._patch(cls, name, wrapped)
+
+    def _patch(self, owner, name: str, replacement):
+        self._originals.append((owner, name, vars(owner)[name]))
+        setattr(owner, name, replacement)
+
+    def session_actions(self) -> Dict[str, ActionStats]:
+        """Stats of every action, summed over all tests"""
+        total = {}  # type: Dict[str, ActionStats]
+        for test in self.tests.values():
+            for name, stats in test.actions.items():
+                total.setdefault(name, ActionStats()).merge(stats)
+        return total
+
+    def report(self) -> dict:
+        actions = sorted(self.session_actions().items(), key=lambda item: item[1].seconds, reverse=True)
+        return OrderedDict([
+            ('round_trips', self.round_trips),
+            ('actions', OrderedDict((name, stats.to_dict()) for name, stats in actions)),
+            ('tests', OrderedDict((name, stats.to_dict()) for name, stats in self.tests.items())),
+        ])
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary_lines(self, limit: int = 20) -> List[str]:
+        """Table of the actions that took the most time in the session"""
+        actions = sorted(self.session_actions().items(), key=lambda item: item[1].seconds, reverse=True)
+        width = max([len(name) for name, _ in actions[:limit]] + [len('action')])
+        lines = ['{:<{w}} {:>7} {:>10} {:>9} {:>12}'.format('action', 'calls', 'total [s]', 'max [s]', 'round trips',
+                                                            w=width)]
+        for name, stats in actions[:limit]:
+            lines.append('{:<{w}} {:>7} {:>10.2f} {:>9.2f} {:>12}'.format(
+                name, stats.calls, stats.seconds, stats.max_seconds, stats.round_trips, w=width))
+        lines.append('{} tests, {} WebDriver round trips'.format(len(self.tests), self.round_trips))
+        return lines
@@ -0,0 +1,160 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""How long a change on the router takes to show in the console
+
+A test makes a change that brings a unique marker into the router's management
+data, such as a receiver on a new address, and notes when the router confirmed it.
+In the page, a MutationObserver notes when text with the marker was first added to
+the DOM. The latency is the difference of the two, after correcting for the offset
+between the browser's clock and this host's, which is estimated from WebDriver
+round-trips like NTP does: the browser read its clock somewhere within the round-trip,
+so the shortest round-trip bounds the error.
+
+Router timestamps come from this host, so routers on another machine add their own
+clock offset. Times are in milliseconds.
+"""
+
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+
+# Sets up window.qdLatency, which records when text with a watched marker first shows up
+OBSERVER_SCRIPT = """
+if (window.qdLatency) {
+  return;
+}
+var latency = window.qdLatency = {pending: [], seen: {}};
+latency.check = function (text) {
+  latency.pending = latency.pending.filter(function (marker) {
+    if (text.indexOf(marker) < 0) {
+      return true;
+    }
+    latency.seen[marker] = Date.now();
+    return false;
+  });
+};
+new MutationObserver(function (mutations) {
+  if (!latency.pending.length) {
+    return;
+  }
+  mutations.forEach(function (mutation) {
+    if (mutation.type === 'characterData') {
+      latency.check(mutation.target.data);
+    } else {
+      for (var i = 0; i < mutation.addedNodes.length; i++) {
+        latency.check(mutation.addedNodes[i].textContent || '');
+      }
+    }
+  });
+}).observe(document.documentElement, {childList: true, characterData: true, subtree: true});
+"""
+
+# Starts watching for the marker in arguments[0]
+WATCH_SCRIPT = """
+window.qdLatency.pending.push(arguments[0]);
+window.qdLatency.check(document.body.textContent);
+"""
+
+# Returns the markers seen since the last call, with the browser time they were seen at
+COLLECT_SCRIPT = """
+var seen = window.qdLatency ? window.qdLatency.seen : {};
+if (window.qdLatency) {
+  window.qdLatency.seen = {};
+}
+return seen;
+"""
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile, p between 0 and 100"""
+    ordered = sorted(values)
+    rank = max(math.ceil(p * len(ordered) / 100), 1)
+    return ordered[rank - 1]
+
+
+class LatencyRecorder(object):
+    def __init__(self, selenium: webdriver.Remote):
+        self.selenium = selenium
+        self.offset = 0.0  # browser clock minus this host's clock
+        self.offset_error = None  # type: float
+        self.changes = OrderedDict()  # type: Dict[str, float]
+        self.seen = OrderedDict()  # type: Dict[str, float]
+
+    def install(self):
+        """Starts the observer; needed again after the browser loads another document"""
+        self.selenium.execute_script(OBSERVER_SCRIPT)
+
+    def sync_clock(self, samples: int = 9) -> float:
+        """Estimates the browser's clock offset from the round-trip that took the shortest time"""
+        best = None
+        for _ in range(samples):
+            before = time.time() * 1000
+            browser = self.selenium.execute_script('return Date.now();')
+            after = time.time() * 1000
+            if best is None or after - before < best[0]:
+                best = (after - before, browser - (before + after) / 2)
+        self.offset_error, self.offset = best[0] / 2, best[1]
+        return self.offset
+
+    def expect(self, marker: str):
+        """Watches for the marker; call it before making the change, or the change could be missed"""
+        self.selenium.execute_script(WATCH_SCRIPT, marker)
+
+    def changed(self, marker: str, timestamp: float = None):
+        """Notes when the router made the change with the marker, in this host's time.time() milliseconds"""
+        self.changes[marker] = time.time() * 1000 if timestamp is None else timestamp
+
+    def collect(self) -> Dict[str, float]:
+        for marker, browser_time in self.selenium.execute_script(COLLECT_SCRIPT).items():
+            self.seen[marker] = browser_time - self.offset
+        return self.seen
+
+    def wait_seen(self, markers: List[str], timeout: float = 30, poll_interval: float = 0.1):
+        deadline = time.monotonic() + timeout
+        while True:
+            seen = self.collect()
+            if all(m in seen for m in markers):
+                return
+            if time.monotonic() > deadline:
+                missing = [m for m in markers if m not in self.seen]
+                raise TimeoutException('Not shown in {} s: {}'.format(timeout, ', '.join(missing)))
+            time.sleep(poll_interval)
+
+    def latencies(self) -> Dict[str, float]:
+        """Latency of every change that was seen"""
+        return OrderedDict((m, self.seen[m] - t) for m, t in self.changes.items() if m in self.seen)
+
+    def distribution(self) -> Dict[str, float]:
+        values = list(self.latencies().values())
+        if not values:
+            return OrderedDict(count=0)
+        return OrderedDict([('count', len(values)), ('p50', percentile(values, 50)),
+                            ('p95', percentile(values, 95)), ('p99', percentile(values, 99)),
+                            ('max', max(values)), ('clock_error', self.offset_error)])
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump({'distribution': self.distribution(), 'clock_offset': self.offset,
+                       'latencies': self.latencies()}, f, indent=2)
@@ -0,0 +1,169 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Message traffic through the router, so that the console has changing statistics to show
+
+For every address prefix from docker/run/router/console.conf, one sender thread sends
+pre-settled messages to <prefix>/dispatch-console-tests and receiver threads take them;
+multicast prefixes get two receivers, so that they fan out. The total rate is split
+evenly between the senders. In a mesh, the senders and receivers of an address connect
+to different routers, so that messages also cross inter-router links.
+
+    with LoadGenerator([('127.0.0.1', 5672)], rate=500):
+        ...
+
+Every thread has a connection of its own, see webdriver.amqp_client.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from webdriver.amqp import Message
+from webdriver.amqp_client import AmqpError, AmqpTimeout, Client, Link
+
+# address prefixes from console.conf, with their distribution
+PREFIXES = OrderedDict([('closest', 'closest'), ('multicast', 'multicast'), ('unicast', 'closest'),
+                        ('exclusive', 'closest'), ('broadcast', 'multicast')])
+
+Endpoint = Tuple[str, int]
+
+
+class LoadGenerator(object):
+    # receivers attached to each address, by distribution
+    receivers_per_address = {'closest': 1, 'multicast': 2}
+
+    def __init__(self, endpoints: List[Endpoint], rate: float = 100.0, size: int = 100,
+                 prefixes: List[str] = None, name: str = 'dispatch-console-tests'):
+        """rate is in messages per second over all senders, size is the body size in bytes"""
+        self.endpoints = endpoints
+        self.rate = rate
+        self.size = size
+        self.prefixes = list(PREFIXES) if prefixes is None else prefixes
+        self.name = name
+        self.sent = OrderedDict((p, 0) for p in self.prefixes)  # type: Dict[str, int]
+        self.received = OrderedDict((p, 0) for p in self.prefixes)  # type: Dict[str, int]
+        self.errors = []  # type: List[str]
+        self.started = None  # type: float
+        self._stopping = threading.Event()
+        self._threads = []  # type: List[threading.Thread]
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'LoadGenerator':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def address(self, prefix: str) -> str:
+        return '{}/{}'.format(prefix, self.name)
+
+    def start(self):
+        """Attaches all receivers, then starts the senders"""
+        self._stopping.clear()
+        receivers = []
+        for i, prefix in enumerate(self.prefixes):
+            for j in range(self.receivers_per_address[PREFIXES[prefix]]):
+                receivers.append((prefix, self.endpoints[(i + j + 1) % len(self.endpoints)]))
+        ready = threading.Barrier(len(receivers) + 1)
+        for prefix, endpoint in receivers:
+            self._run(self._receive, prefix, endpoint, ready)
+        try:
+            ready.wait(30)
+        except threading.BrokenBarrierError:
+            self.stop()
+            raise AmqpError('Receivers did not attach: {}'.format('; '.join(self.errors)))
+        for i, prefix in enumerate(self.prefixes):
+            self._run(self._send, prefix, self.endpoints[i % len(self.endpoints)])
+        self.started = time.monotonic()
+
+    def stop(self):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(10)
+        self._threads = []
+
+    def set_rate(self, rate: float):
+        """Changes the rate of the running senders"""
+        self.rate = rate
+
+    def totals(self) -> Tuple[int, int]:
+        """Messages sent and received so far"""
+        with self._lock:
+            return sum(self.sent.values()), sum(self.received.values())
+
+    def summary(self) -> str:
+        sent, received = self.totals()
+        elapsed = time.monotonic() - self.started if self.started else 0
+        return 'sent {} and received {} messages in {:.1f} s, {:.0f} per second'.format(
+            sent, received, elapsed, sent / elapsed if elapsed else 0)
+
+    def _run(self, target, *args):
+        thread = threading.Thread(target=self._guard, args=(target,) + args, daemon=True,
+                                  name='load-{}-{}'.format(target.__name__.strip('_'), args[0]))
+        self._threads.append(thread)
+        thread.start()
+
+    def _guard(self, target, prefix: str, *args):
+        try:
+            target(prefix, *args)
+        except (OSError, AmqpError, threading.BrokenBarrierError) as e:
+            with self._lock:
+                self.errors.append('{} {}: {}'.format(target.__name__.strip('_'), self.address(prefix), e))
+            for barrier in args:
+                if isinstance(barrier, threading.Barrier):
+                    barrier.abort()
+
+    def _send(self, prefix: str, endpoint: Endpoint):
+        with Client(*endpoint) as client:
+            link = client.sender(self.address(prefix))
+            body = b'x' * self.size
+            next_send = time.monotonic()
+            while not self._stopping.is_set():
+                interval = len(self.prefixes) / self.rate if self.rate > 0 else 0.5
+                now = time.monotonic()
+                if now < next_send:
+                    client.poll(min(next_send - now, 0.5))  # takes flow frames while waiting
+                    continue
+                if self.rate > 0:
+                    self._send_one(client, link, prefix, body)
+                # after a stall, catch up on at most a second of messages
+                next_send = max(next_send + interval, now - 1)
+
+    def _send_one(self, client: Client, link: Link, prefix: str, body: bytes):
+        try:
+            client.send(link, Message(body=body), timeout=1)
+        except AmqpTimeout:
+            return  # no credit, as nobody is receiving; try again at the next tick
+        with self._lock:
+            self.sent[prefix] += 1
+
+    def _receive(self, prefix: str, endpoint: Endpoint, ready: threading.Barrier):
+        with Client(*endpoint) as client:
+            link = client.receiver(self.address(prefix))
+            ready.wait()
+            while not self._stopping.is_set():
+                client.poll(0.5)
+                if link.messages:
+                    count = len(link.messages)
+                    link.messages.clear()
+                    with self._lock:
+                        self.received[prefix] += count
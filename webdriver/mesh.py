@@ -0,0 +1,295 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Meshes of real routers, configured from docker/run/router/console.conf
+
+Every router gets the template's addresses and listeners, with its own id and ports,
+an inter-router listener, and connectors to its neighbours in the webdriver.topology
+shape. The first router keeps the template's ProxyListener, and websockify forwards
+the console port to it, as in the docker image.
+
+Routers run on this host, either as qdrouterd processes or in containers of the
+router image with host networking (which needs Linux). Configurations and router
+output are kept in the mesh directory.
+
+    python -m webdriver.mesh --routers 5 --launcher docker
+"""
+
+import argparse
+import concurrent.futures
+import os
+import subprocess
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from webdriver.amqp_client import AmqpError, Client
+from webdriver.topology import Topology
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'docker', 'run', 'router', 'console.conf')
+DEFAULT_IMAGE = 'jdanekrh/dispatch-router:latest'
+NODE_TYPE = 'org.apache.qpid.dispatch.router.node'
+
+Section = Tuple[str, Dict[str, str]]
+
+
+class MeshError(RuntimeError):
+    pass
+
+
+def port_conflicts(ranges: Dict[str, range]) -> List[str]:
+    """Pairs of named port ranges that overlap"""
+    names = list(ranges)
+    conflicts = []
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            if ranges[a] and ranges[b] and ranges[a].start < ranges[b].stop and ranges[b].start < ranges[a].stop:
+                conflicts.append('{} ports {}-{} overlap {} ports {}-{}'.format(
+                    a, ranges[a].start, ranges[a].stop - 1, b, ranges[b].start, ranges[b].stop - 1))
+    return conflicts
+
+
+def parse_config(text: str) -> List[Section]:
+    """Sections of a qdrouterd.conf file, in order, as (entity type, attributes)"""
+    sections = []  # type: List[Section]
+    current = None  # type: Dict[str, str]
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if line.endswith('{'):
+            current = OrderedDict()
+            sections.append((line[:-1].strip(), current))
+        elif line == '}':
+            current = None
+        elif current is not None:
+            key, value = line.split(':', 1)
+            current[key.strip()] = value.strip()
+    return sections
+
+
+def render_config(sections: List[Section]) -> str:
+    blocks = []
+    for entity_type, attributes in sections:
+        lines = ['{} {{'.format(entity_type)]
+        lines += ['    {}: {}'.format(key, value) for key, value in attributes.items()]
+        blocks.append('\n'.join(lines + ['}']))
+    return '\n\n'.join(blocks) + '\n'
+
+
+class ProcessLauncher(object):
+    """Runs routers as local qdrouterd processes"""
+    def __init__(self, qdrouterd: str = 'qdrouterd', websockify: str = 'websockify'):
+        self.qdrouterd = qdrouterd
+        self.websockify = websockify
+
+    def start(self, name: str, config: str, log: str, websocket: Tuple[int, int] = None) -> List[subprocess.Popen]:
+        with open(log, 'w') as output:
+            processes = [subprocess.Popen([self.qdrouterd, '-c', config], stdout=output, stderr=subprocess.STDOUT)]
+            if websocket is not None:
+                processes.append(subprocess.Popen(
+                    [self.websockify, str(websocket[0]), '127.0.0.1:{}'.format(websocket[1])],
+                    stdout=output, stderr=subprocess.STDOUT))
+        return processes
+
+    def stop(self, processes: List[subprocess.Popen]):
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class DockerLauncher(object):
+    """Runs routers in containers of the router image, on the host network"""
+    def __init__(self, image: str = DEFAULT_IMAGE, docker: str = 'docker'):
+        self.image = image
+        self.docker = docker
+
+    def start(self, name: str, config: str, log: str, websocket: Tuple[int, int] = None) -> str:
+        command = 'qdrouterd -c /mesh/{}'.format(os.path.basename(config))
+        if websocket is not None:
+            command = 'websockify {} 127.0.0.1:{} & {}'.format(websocket[0], websocket[1], command)
+        with open(log, 'w') as output:
+            subprocess.check_call([self.docker, 'run', '--detach', '--rm', '--network', 'host', '--name', name,
+                                   '--volume', '{}:/mesh:ro'.format(os.path.dirname(config)),
+                                   self.image, 'bash', '-c', command], stdout=output, stderr=subprocess.STDOUT)
+        return name
+
+    def stop(self, container: str):
+        subprocess.call([self.docker, 'rm', '--force', container], stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL)
+
+
+LAUNCHERS = {'process': ProcessLauncher, 'docker': DockerLauncher}
+
+
+class Mesh(object):
+    def __init__(self, topology: Topology, launcher, directory: str, console_port: int = 5673, port: int = 6672,
+                 inter_router_port: int = 55672, proxy_port: int = 20009, template: str = TEMPLATE):
+        """Router i listens on port + i and on inter_router_port + i; the first one also on proxy_port"""
+        conflicts = port_conflicts(self.port_ranges(topology.routers, console_port, port, inter_router_port,
+                                                    proxy_port))
+        if conflicts:
+            raise MeshError('; '.join(conflicts))
+        self.topology = topology
+        self.launcher = launcher
+        self.directory = os.path.abspath(directory)
+        self.console_port = console_port
+        self.port = port
+        self.inter_router_port = inter_router_port
+        self.proxy_port = proxy_port
+        with open(template) as f:
+            self.template = parse_config(f.read())
+        self.handles = OrderedDict()  # router id -> what the launcher needs to stop it
+
+    @staticmethod
+    def port_ranges(routers: int, console_port: int, port: int, inter_router_port: int, proxy_port: int,
+                    meshes: int = 1) -> Dict[str, range]:
+        """Ports used by meshes of routers each, started one after another with consecutive ports"""
+        return OrderedDict([('console', range(console_port, console_port + meshes)),
+                            ('AMQP', range(port, port + routers * meshes)),
+                            ('inter-router', range(inter_router_port, inter_router_port + routers * meshes)),
+                            ('proxy', range(proxy_port, proxy_port + meshes))])
+
+    def configs(self) -> Dict[str, str]:
+        """Configuration file contents by router id"""
+        ids = self.topology.router_ids()
+        neighbours = self.topology.neighbours()
+        configs = OrderedDict()
+        for i, router_id in enumerate(ids):
+            sections = []  # type: List[Section]
+            for entity_type, template in self.template:
+                attributes = OrderedDict(template)
+                if entity_type == 'router':
+                    attributes.update(mode='interior', id=router_id)
+                elif entity_type == 'listener' and attributes.get('name') == 'ProxyListener':
+                    if i != 0:
+                        continue
+                    attributes['port'] = str(self.proxy_port)
+                elif entity_type == 'listener':
+                    attributes['port'] = str(self.port + i)
+                sections.append((entity_type, attributes))
+            sections.append(('listener', OrderedDict([('role', 'inter-router'), ('host', '0.0.0.0'),
+                                                      ('port', str(self.inter_router_port + i)),
+                                                      ('authenticatePeer', 'no')])))
+            # as in the synthesized topology, the router with the lower id opens the connection
+            for peer in neighbours[router_id]:
+                if peer > router_id:
+                    sections.append(('connector', OrderedDict([
+                        ('name', 'to-{}'.format(peer)), ('role', 'inter-router'), ('host', '127.0.0.1'),
+                        ('port', str(self.inter_router_port + ids.index(peer)))])))
+            configs[router_id] = render_config(sections)
+        return configs
+
+    def start(self):
+        """Writes the configurations and starts all routers at once"""
+        os.makedirs(self.directory, exist_ok=True)
+        paths = OrderedDict()
+        for router_id, config in self.configs().items():
+            paths[router_id] = os.path.join(self.directory, '{}.conf'.format(router_id))
+            with open(paths[router_id], 'w') as f:
+                f.write(config)
+
+        def start(router_id):
+            websocket = (self.console_port, self.proxy_port) if router_id == self.topology.router_ids()[0] else None
+            name = 'dispatch-mesh-{}-{}'.format(self.port, router_id.replace('.', '-'))
+            log = os.path.join(self.directory, '{}.log'.format(router_id))
+            return self.launcher.start(name, paths[router_id], log, websocket)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(paths), 16)) as executor:
+            futures = OrderedDict((r, executor.submit(start, r)) for r in paths)
+        failures = []
+        for router_id, future in futures.items():
+            try:
+                self.handles[router_id] = future.result()
+            except (OSError, subprocess.CalledProcessError) as e:
+                failures.append('{}: {}'.format(router_id, e))
+        if failures:
+            self.stop()
+            raise MeshError('Routers failed to start:\n' + '\n'.join(failures))
+
+    def missing_routes(self, timeout: float = 5.0) -> Dict[str, List[str]]:
+        """Routers that some router does not know a route to yet, by the router that is missing them"""
+        ids = self.topology.router_ids()
+        missing = OrderedDict()
+        with Client('127.0.0.1', self.port, timeout) as client:
+            for i, router_id in enumerate(ids):
+                nodes = client.query(NODE_TYPE, ['id'], router=None if i == 0 else router_id)
+                unknown = sorted(set(ids) - {node['id'] for node in nodes} - {router_id})
+                if unknown:
+                    missing[router_id] = unknown
+        return missing
+
+    def wait_converged(self, timeout: float = 60.0):
+        """Waits until every router has a route to every other one"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                missing = self.missing_routes()
+                if not missing:
+                    return
+                problem = '; '.join('{} has no route to {}'.format(r, ', '.join(u)) for r, u in missing.items())
+            except (OSError, AmqpError) as e:
+                problem = str(e)  # not listening yet, or the management address is not reachable yet
+            if time.monotonic() > deadline:
+                raise MeshError('Mesh did not converge in {} s: {}\nRouter output is in {}'.format(
+                    timeout, problem, self.directory))
+            time.sleep(1)
+
+    def stop(self):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(self.handles), 16) or 1) as executor:
+            list(executor.map(self.launcher.stop, self.handles.values()))
+        self.handles.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Start a mesh of routers configured like docker/run/router')
+    parser.add_argument('--routers', type=int, default=3)
+    parser.add_argument('--degree', type=int, default=3, help='inter-router connections each router opens')
+    parser.add_argument('--launcher', choices=sorted(LAUNCHERS), default='process')
+    parser.add_argument('--image', default=DEFAULT_IMAGE, help='router image for the docker launcher')
+    parser.add_argument('--directory', default='mesh', help='where configurations and router output go')
+    parser.add_argument('--console-port', type=int, default=5673)
+    parser.add_argument('--port', type=int, default=6672, help='AMQP port of the first router')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+    launcher = DockerLauncher(args.image) if args.launcher == 'docker' else ProcessLauncher()
+    try:
+        mesh = Mesh(Topology(args.routers, degree=args.degree), launcher, args.directory, args.console_port, args.port)
+    except MeshError as e:
+        parser.error(str(e))
+    mesh.start()
+    try:
+        mesh.wait_converged(args.timeout)
+        print('Mesh of {} routers converged, the console connects to port {}; Ctrl+C stops it'.format(
+            args.routers, args.console_port))
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mesh.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -20,10 +20,11 @@
 from abc import ABCMeta, abstractmethod
 import time
 from unittest.mock import Mock
+from urllib.parse import urlsplit, urlunsplit
 
 import pytest
-from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
-from typing import Type, List
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, WebDriverException
+from typing import Dict, Generator, Iterable, List, Optional, Set, Tuple, Type, Union
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -31,111 +32,522 @@ from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from webdriver.devtools import execute_cdp, has_devtools
+from webdriver.tabs import Tab, Wait
+from webdriver.timeouts import TimeoutManager
+from webdriver.traffic import TrafficRecorder
 
-PLUGIN_NAME = 'dispatch_hawtio_console'
-
-
-class PageObject(object):
-    def __init__(self, selenium: webdriver.Remote):
-        self.selenium = selenium
-
-    def wait_locate_visible_element(self, locator) -> WebElement:
-        timeout = 10
-        return WebDriverWait(self.selenium, timeout).until(EC.presence_of_element_located(locator))
-
-    def wait_for_frameworks(self):
-        """Checks whether the UI frameworks are changing the UI
-
-        Spies on jQuery and Angular, exactly what is needed.
 
-        http://stackoverflow.com/questions/25062969/testing-angularjs-with-selenium
-        """
-        script = """
-try {
-  if (document.readyState !== 'complete') {
-    return false; // Page not loaded yet
+PLUGIN_NAME = 'dispatch_hawtio_console'
+# localStorage key under which both consoles keep the connect form settings
+SETTINGS_KEY = 'QDRSettings'
+
+# Installs window.qdQuiescence, unless the current page already has it. The monitor tracks when
+# the DOM last changed and when Angular last ran a digest, and it can tell whether jQuery or
+# Angular have requests in flight. whenSettled calls back with a token that changes whenever
+# the page is loaded again or its URL (including the Angular route) changes.
+QUIESCENCE_MONITOR = """
+(function () {
+  if (window.qdQuiescence) {
+    return;
+  }
+  var monitor = window.qdQuiescence = {
+    id: Math.random().toString(36).slice(2),
+    lastChange: Date.now(),
+    digests: 0,
+    $rootScope: null,
+    $http: null,
+    $browser: null
+  };
+  function touch() {
+    monitor.lastChange = Date.now();
   }
-  if (window.jQuery) {
-    if (window.jQuery.active) {
+  if (window.MutationObserver) {
+    new MutationObserver(touch).observe(document.documentElement,
+      {childList: true, subtree: true, attributes: true, characterData: true});
+  }
+  monitor.hookAngular = function (root) {
+    if (monitor.$rootScope || !window.angular) {
+      return;
+    }
+    var element = window.angular.element(document.querySelector(root) || document.body);
+    var injector = element.injector() || window.angular.element(document.body).injector();
+    if (!injector) {
+      return;  // not bootstrapped yet
+    }
+    monitor.$rootScope = injector.get('$rootScope');
+    monitor.$http = injector.get('$http');
+    monitor.$browser = injector.get('$browser');
+    var digest = monitor.$rootScope.$digest;
+    monitor.$rootScope.$digest = function () {
+      monitor.digests++;
+      touch();
+      return digest.apply(this, arguments);
+    };
+  };
+  monitor.isSettled = function (root, quietPeriod) {
+    if (document.readyState !== 'complete') {
       return false;
-    } else if (window.jQuery.ajax && window.jQuery.ajax.active) {
+    }
+    if (window.jQuery && (window.jQuery.active || (window.jQuery.ajax && window.jQuery.ajax.active))) {
       return false;
     }
-  }
-  if (window.angular) {
-    if (!window.qa) {
-      // Used to track the render cycle finish after loading is complete
-      window.qa = {
-        doneRendering: false
-      };
+    if (window.angular) {
+      monitor.hookAngular(root);
+      if (!monitor.$rootScope) {
+        return false;
+      }
+      if (monitor.$rootScope.$$phase || monitor.$http.pendingRequests.length !== 0) {
+        return false;
+      }
     }
-    // Get the angular injector for this app (change element if necessary)
-    var injector = window.angular.element('body').injector();
-    // Store providers to use for these checks
-    var $rootScope = injector.get('$rootScope');
-    var $http = injector.get('$http');
-    var $timeout = injector.get('$timeout');
-    // Check if digest
-    if ($rootScope.$$phase === '$apply' || $rootScope.$$phase === '$digest' || $http.pendingRequests.length !== 0) {
-      window.qa.doneRendering = false;
-      return false; // Angular digesting or loading data
+    return Date.now() - monitor.lastChange >= quietPeriod;
+  };
+  monitor.state = function () {
+    return monitor.id + ' ' + window.location.href;
+  };
+  monitor.whenSettled = function (root, quietPeriod, callback) {
+    (function check() {
+      var settled;
+      try {
+        settled = monitor.isSettled(root, quietPeriod);
+      } catch (ex) {
+        settled = false;
+      }
+      if (!settled) {
+        setTimeout(check, 10);
+      } else if (monitor.$browser) {
+        monitor.$browser.notifyWhenNoOutstandingRequests(function () { callback(monitor.state()); });
+      } else {
+        callback(monitor.state());
+      }
+    })();
+  };
+})();
+"""
+
+# Installs window.qdErrors, unless the current page already has it. It records uncaught errors, unhandled
+# promise rejections and console.error calls into a ring buffer of the last 100 entries. The buffer is kept
+# in sessionStorage, so that errors logged just before a navigation are not lost. It needs no arguments, so
+# that it can also run before the page's own scripts, see PageObject.collect_errors_from_load.
+ERROR_COLLECTOR = """
+(function (capacity) {
+  if (window.qdErrors) {
+    return;
+  }
+  var key = 'dispatch-console-tests.errors';
+  var entries;
+  try {
+    entries = JSON.parse(window.sessionStorage.getItem(key)) || [];
+  } catch (ex) {
+    entries = [];
+  }
+  function save() {
+    try {
+      window.sessionStorage.setItem(key, JSON.stringify(entries));
+    } catch (ex) {
     }
-    if (!window.qa.doneRendering) {
-      // Set timeout to mark angular rendering as finished
-      $timeout(function() {
-        window.qa.doneRendering = true;
-      }, 0);
-      return false;
+  }
+  function record(kind, message, stack) {
+    entries.push({kind: kind, message: String(message), stack: stack || null, url: window.location.href});
+    if (entries.length > capacity) {
+      entries.splice(0, entries.length - capacity);
     }
+    save();
   }
-  return true;
+  window.addEventListener('error', function (event) {
+    record('error', event.message, event.error && event.error.stack);
+  });
+  window.addEventListener('unhandledrejection', function (event) {
+    var reason = event.reason;
+    record('unhandledrejection', reason && reason.message || reason, reason && reason.stack);
+  });
+  var consoleError = window.console.error;
+  window.console.error = function () {
+    var args = Array.prototype.slice.call(arguments), stack = null;
+    args.forEach(function (arg) {
+      if (arg && arg.stack) {
+        stack = arg.stack;
+      }
+    });
+    record('console.error', args.map(String).join(' '), stack);
+    return consoleError.apply(this, arguments);
+  };
+  window.qdErrors = {
+    drain: function () {
+      var drained = entries;
+      entries = [];
+      save();
+      return drained;
+    }
+  };
+})(100);
+"""
+
+# Returns and forgets what window.qdErrors collected, also when the current page does not have it installed
+DRAIN_ERRORS_SCRIPT = """
+if (window.qdErrors) {
+  return window.qdErrors.drain();
+}
+try {
+  var key = 'dispatch-console-tests.errors';
+  var entries = JSON.parse(window.sessionStorage.getItem(key)) || [];
+  window.sessionStorage.removeItem(key);
+  return entries;
+} catch (ex) {
+  return [];
+}
+"""
+
+# Returns the state token when the quiescence monitor finds the page settled, null otherwise. Unlike whenSettled,
+# it does not wait for $browser to have no outstanding requests; the monitor checks pending $http requests anyway.
+SETTLED_SCRIPT = """
+try {
+  return window.qdQuiescence.isSettled(arguments[0], arguments[1]) ? window.qdQuiescence.state() : null;
 } catch (ex) {
+  return null;
+}
+"""
+
+# Defines qdExpandStep(expanderSelector, nodeCount, titles), which starts expanding tree nodes whose expanders
+# match expanderSelector, optionally only nodes titled as in titles. It returns null while there are fewer than
+# nodeCount expanders, or when nodeCount is null, while there are none or their number changed since the previous
+# step; true when no matching node is left collapsed, false otherwise. An expansion is requested again when the
+# node is still collapsed a second later.
+EXPAND_TREE_STEP = """
+function qdExpandStep(expanderSelector, nodeCount, titles) {
+  var dynatree = window.jQuery && window.jQuery.ui && window.jQuery.ui.dynatree;
+  var expanders = Array.prototype.slice.call(document.querySelectorAll(expanderSelector));
+  if (nodeCount !== null && expanders.length < nodeCount) {
+    return null;  // tree is not rendered yet
+  }
+  if (nodeCount === null) {
+    // without a count to wait for, the tree is rendered once it has expanders and stops growing
+    var previousCount = window.qdExpanderCount;
+    window.qdExpanderCount = expanders.length;
+    if (expanders.length === 0 || expanders.length !== previousCount) {
+      return null;
+    }
+  }
+  var pending = expanders.filter(function (expander) {
+    var node = expander.parentNode;
+    return node.className.indexOf('dynatree-expanded') === -1 &&
+      (titles === null || titles.indexOf(node.textContent.trim()) !== -1);
+  });
+  if (pending.length === 0) {
+    return true;
+  }
+  var now = Date.now();
+  pending.forEach(function (expander) {
+    // clicking a node that is still expanding would collapse it again; a node that is still collapsed a
+    // second after the request lost it, e.g. to a refresh of the tree, and is requested again
+    if (expander.qdExpandRequested && now - expander.qdExpandRequested < 1000) {
+      return;
+    }
+    expander.qdExpandRequested = now;
+    var node = dynatree && dynatree.getNode(expander);
+    if (node) {
+      node.expand(true);
+    } else {
+      expander.click();
+    }
+  });
   return false;
 }
 """
-        self.wait_for(lambda: self.selenium.execute_script(script))
-        self.wait_for_angular()
+
+# Expands tree nodes with qdExpandStep(arguments[0], arguments[1], arguments[2]) every 50 ms. Calls back
+# with true when no matching node is left collapsed, with false when it runs out of time. Milliseconds from
+# the first expansion to the last node expanded are left in window.qdTreeExpansion.
+EXPAND_TREE_SCRIPT = EXPAND_TREE_STEP + """
+var callback = arguments[arguments.length - 1];
+var deadline = Date.now() + 9000;
+var started = null;
+var expanderSelector = arguments[0], nodeCount = arguments[1], titles = arguments[2];
+
+(function step() {
+  var done = qdExpandStep(expanderSelector, nodeCount, titles);
+  if (done) {
+    window.qdTreeExpansion = performance.now() - (started === null ? performance.now() : started);
+    callback(true);
+    return;
+  }
+  if (done === false && started === null) {
+    started = performance.now();
+  }
+  if (Date.now() > deadline) {
+    callback(false);
+    return;
+  }
+  setTimeout(step, 50);
+})();
+"""
+
+# One qdExpandStep; returns true once the tree is expanded
+EXPAND_TREE_STEP_SCRIPT = EXPAND_TREE_STEP + """
+return qdExpandStep(arguments[0], arguments[1], arguments[2]) === true;
+"""
+
+# Serializes elements matching arguments[0] (or their parents, if arguments[2] is true),
+# including values of attributes named in arguments[1]
+SNAPSHOT_SCRIPT = """
+var attributes = arguments[1], parents = arguments[2];
+return Array.prototype.map.call(document.querySelectorAll(arguments[0]), function (element) {
+  if (parents) {
+    element = element.parentNode;
+  }
+  var values = {};
+  attributes.forEach(function (name) {
+    values[name] = element.getAttribute(name);
+  });
+  return {
+    tag: element.tagName.toLowerCase(),
+    classes: element.getAttribute('class') || '',
+    text: element.textContent.trim(),
+    visible: !!(element.offsetWidth || element.offsetHeight || element.getClientRects().length),
+    attributes: values
+  };
+});
+"""
+
+
+class ElementSnapshot(object):
+    """State of an element at the time PageObject.snapshot was taken
+
+    Unlike WebElement, reading it does not talk to the browser, and it never goes stale.
+    """
+    def __init__(self, tag: str, classes: str, text: str, visible: bool, attributes: Dict[str, str]):
+        self.tag = tag
+        self.classes = classes.split()
+        self.text = text
+        self.visible = visible
+        self.attributes = attributes
+
+    def has_class(self, name: str) -> bool:
+        return name in self.classes
+
+    def __repr__(self):
+        return '<{} class="{}">{}</{}>'.format(self.tag, ' '.join(self.classes), self.text, self.tag)
+
+
+class CachedElement(WebElement):
+    """Element that locates itself again when it goes stale, and retries the command that failed"""
+    def __init__(self, element: WebElement, relocate):
+        super().__init__(element.parent, element.id, w3c=element._w3c)
+        self._relocate = relocate
+
+    def _execute(self, command, params=None):
+        try:
+            return super()._execute(command, dict(params or {}))
+        except StaleElementReferenceException:
+            self._id = self._relocate().id
+            return super()._execute(command, dict(params or {}))
+
+
+class PageObject(object):
+    # element with the ng-app attribute
+    angular_root = 'html'
+    # how long the DOM must stay unchanged for the page to be considered rendered, in milliseconds
+    quiet_period = 50
+    # present once the page is shown, see wait and is_shown
+    shown_locator = None  # type: Tuple[str, str]
+    # replaced by conftest.py with one that learns from earlier runs
+    timeouts = TimeoutManager()
+    # set by conftest.py under --capture-traffic; creating a page object starts attributing traffic to it
+    traffic = None  # type: TrafficRecorder
+    # windows, by session id and window handle, that collect errors from page load on
+    _load_collectors = set()  # type: Set[Tuple[str, str]]
+
+    def __init__(self, selenium: webdriver.Remote, wait: bool = True):
+        """With wait False, the constructor does not wait for the page; tasks in tabs then yield from ready()"""
+        self.selenium = selenium
+        if self.traffic is not None:
+            self.traffic.checkpoint(selenium, type(self).__name__)
+        # token from the quiescence monitor, see wait_for_frameworks
+        self.page_state = None  # type: str
+        self._element_cache = {}  # type: Dict[tuple, CachedElement]
+
+    def wait_locate_visible_element(self, locator) -> WebElement:
+        with self.timeouts.timed('locate {}'.format(locator[1]), 10) as timeout:
+            return WebDriverWait(self.selenium, timeout).until(EC.presence_of_element_located(locator))
+
+    def cached_element(self, locator) -> WebElement:
+        """Like wait_locate_visible_element, but remembers the element until the page changes
+
+        The cache is emptied when wait_for_frameworks notices that the page was loaded again or that
+        its route changed. An element that went stale in the meantime locates itself again.
+        """
+        element = self._element_cache.get(locator)
+        if element is None:
+            element = CachedElement(self.wait_locate_visible_element(locator),
+                                    lambda: self.wait_locate_visible_element(locator))
+            self._element_cache[locator] = element
+        return element
+
+    def invalidate_cache(self):
+        self._element_cache.clear()
+
+    def snapshot(self, css_selector: str, attributes: Iterable[str] = (), parents: bool = False) \
+            -> List[ElementSnapshot]:
+        """Fetches state of all matching elements (or of their parent elements) in one round-trip"""
+        elements = self.selenium.execute_script(SNAPSHOT_SCRIPT, css_selector, list(attributes), parents)
+        return [ElementSnapshot(**e) for e in elements]
+
+    def wait_for_frameworks(self):
+        """Waits until the UI frameworks stop changing the UI
+
+        Spies on jQuery, Angular and DOM mutations, exactly what is needed. The spying is done by
+        a monitor that is installed into the page once per page load; waiting for it to report
+        a quiet page is a single async script call.
+
+        http://stackoverflow.com/questions/25062969/testing-angularjs-with-selenium
+        """
+        with self.timeouts.timed('{}.wait_for_frameworks'.format(type(self).__name__), 10) as timeout:
+            self.selenium.set_script_timeout(timeout)
+            state = self.selenium.execute_async_script(ERROR_COLLECTOR + QUIESCENCE_MONITOR + """
+            var callback = arguments[arguments.length - 1];
+            window.qdQuiescence.whenSettled(arguments[0], arguments[1], callback);""",
+                                                       self.angular_root, self.quiet_period)
+        self.track_page_state(state)
+
+    def track_page_state(self, state: str):
+        if state != self.page_state:
+            self.invalidate_cache()
+            self.page_state = state
+
+    def is_settled(self) -> bool:
+        """Non-blocking check for what wait_for_frameworks waits for"""
+        state = self.selenium.execute_script(ERROR_COLLECTOR + QUIESCENCE_MONITOR + SETTLED_SCRIPT,
+                                             self.angular_root, self.quiet_period)
+        if state is None:
+            return False
+        self.track_page_state(state)
+        return True
+
+    def settle(self) -> Wait:
+        """wait_for_frameworks for tasks run by a TabScheduler"""
+        timeout = self.timeouts.timeout('{}.wait_for_frameworks'.format(type(self).__name__), 10)
+        return Wait(self.is_settled, timeout, 'frameworks to settle in {}'.format(type(self).__name__))
+
+    def present(self, locator) -> Wait:
+        """wait_locate_visible_element for tasks run by a TabScheduler"""
+        timeout = self.timeouts.timeout('locate {}'.format(locator[1]), 10)
+        return Wait(lambda: self.selenium.find_elements(*locator), timeout, '{} to be present'.format(locator[1]))
+
+    def ready(self) -> Generator[Wait, object, None]:
+        """What the constructor waits for, for tasks run by a TabScheduler"""
+        yield self.settle()
+
+    @classmethod
+    def wait(cls, selenium: webdriver.Remote):
+        with cls.timeouts.timed('{}.wait'.format(cls.__name__), 30) as timeout:
+            WebDriverWait(selenium, timeout).until(EC.presence_of_element_located(cls.shown_locator))
+
+    @classmethod
+    def is_shown(cls, selenium: webdriver.Remote) -> bool:
+        return len(selenium.find_elements(*cls.shown_locator)) > 0
+
+    @classmethod
+    def open_in_tab(cls, base_url: str, tab: Tab) -> Generator[Wait, object, 'PageObject']:
+        """Like open, for tasks run by a TabScheduler; use as page = yield from Page.open_in_tab(base_url, tab)"""
+        cls.collect_errors_from_load(tab)
+        tab.navigate(cls.url(base_url))
+        timeout = cls.timeouts.timeout('{}.wait'.format(cls.__name__), 30)
+        yield Wait(lambda: cls.is_shown(tab), timeout, '{} to be shown'.format(cls.__name__))
+        cls.install_error_collector(tab)
+        page = cls(tab, wait=False)
+        yield from page.ready()
+        return page
+
+    @staticmethod
+    def install_error_collector(selenium: webdriver.Remote):
+        """Starts collecting JavaScript errors in the current page; wait_for_frameworks does this too"""
+        selenium.execute_script(ERROR_COLLECTOR)
+
+    @classmethod
+    def collect_errors_from_load(cls, selenium: webdriver.Remote):
+        """Has Chrome install the error collector into every document of the window before its own scripts run
+
+        Otherwise errors thrown while the console starts up are lost, as install_error_collector can only run
+        once the page has loaded. Other browsers have no such hook; --console-proxy puts the collector into
+        the console's HTML for them.
+        """
+        if not has_devtools(selenium):
+            return
+        window = (selenium.session_id, selenium.current_window_handle)
+        if window in cls._load_collectors:
+            return
+        try:
+            execute_cdp(selenium, 'Page.addScriptToEvaluateOnNewDocument', {'source': ERROR_COLLECTOR})
+        except WebDriverException:
+            return  # an old chromedriver, or a grid that does not pass the command on
+        cls._load_collectors.add(window)
+
+    @staticmethod
+    def drain_errors(selenium: webdriver.Remote) -> List[Dict[str, str]]:
+        """JavaScript errors collected since the last call, oldest first"""
+        return selenium.execute_script(DRAIN_ERRORS_SCRIPT)
 
     @staticmethod
     def wait_for(condition):
-        timeout = 10
-        t = 0
-        d = 0.3
-        while True:
-            result = condition()
-            if result:
-                # print('waited for', t)
-                return
-            if t > timeout:
-                assert t < timeout
-            time.sleep(d)
-            t += d
-
-    def wait_for_angular(self, element: str = "html"):
+        key = 'wait_for {}'.format(getattr(condition, '__qualname__', 'condition'))
+        with PageObject.timeouts.timed(key, 10) as timeout:
+            t = 0
+            d = 0.3
+            while True:
+                result = condition()
+                if result:
+                    # print('waited for', t)
+                    return
+                if t > timeout:
+                    assert t < timeout
+                time.sleep(d)
+                t += d
+
+    def wait_for_angular(self, element: str = None):
+        if element is None:
+            element = self.angular_root
         # waitForAngular()
         # https://github.com/angular/protractor/blob/71532f055c720b533fbf9dab2b3100b657966da6/lib/clientsidescripts.js#L51
-        self.selenium.set_script_timeout(10)
-        self.selenium.execute_async_script("""
-        callback = arguments[arguments.length - 1];
-        angular.element('{}').injector().get('$browser').notifyWhenNoOutstandingRequests(callback);""".format(element))
+        with self.timeouts.timed('wait_for_angular', 10) as timeout:
+            self.selenium.set_script_timeout(timeout)
+            self.selenium.execute_async_script("""
+            callback = arguments[arguments.length - 1];
+            angular.element('{}').injector().get('$browser').notifyWhenNoOutstandingRequests(callback);""".format(
+                element))
 
 
 class LogsPage(PageObject):
+    shown_locator = (By.CSS_SELECTOR, '.active a[ng-href="#/logs"]')
+
+    @classmethod
+    def url(cls, base_url):
+        return '{}/logs'.format(base_url)
+
     @classmethod
     def open(cls, base_url, selenium):
-        url = '{}/logs'.format(base_url)
-        selenium.get(url)
+        cls.collect_errors_from_load(selenium)
+        selenium.get(cls.url(base_url))
+        cls.install_error_collector(selenium)
         return cls(selenium)
 
     @classmethod
     def wait(cls, selenium: webdriver.Remote):
-        locator = (By.CSS_SELECTOR, '.active a[ng-href="#/logs"]')
-        WebDriverWait(selenium, 30).until(EC.visibility_of_element_located(locator))
+        with cls.timeouts.timed('{}.wait'.format(cls.__name__), 30) as timeout:
+            WebDriverWait(selenium, timeout).until(EC.visibility_of_element_located(cls.shown_locator))
 
 
 class ConnectPage(PageObject):
-    def __init__(self, selenium: webdriver.Remote):
-        super().__init__(selenium)
+    # Connect link in the top bar is active
+    shown_locator = (By.CSS_SELECTOR, '.active a[ng-href="#/{}/connect"]'.format(PLUGIN_NAME))
+    host_locator = (By.NAME, 'address')
+    port_locator = (By.NAME, 'port')
+    connect_button_locator = (By.CSS_SELECTOR, '#dispatch-login-container button')
+
+    def __init__(self, selenium: webdriver.Remote, wait: bool = True):
+        super().__init__(selenium, wait)
+        if not wait:
+            return
         self.wait_for_frameworks()
 
         # ensure that all these things are in the page
@@ -143,17 +555,22 @@ class ConnectPage(PageObject):
         _ = self.port
         _ = self.connect_button
 
+    def ready(self) -> Generator[Wait, object, None]:
+        yield self.settle()
+        for locator in (self.host_locator, self.port_locator, self.connect_button_locator):
+            yield self.present(locator)
+
     @property
     def host(self):
-        return self.wait_locate_visible_element((By.NAME, 'address'))
+        return self.cached_element(self.host_locator)
 
     @property
     def port(self):
-        return self.wait_locate_visible_element((By.NAME, 'port'))
+        return self.cached_element(self.port_locator)
 
     @property
     def connect_button(self):
-        return self.selenium.find_element(By.CSS_SELECTOR, '#dispatch-login-container button')
+        return self.cached_element(self.connect_button_locator)
 
     @classmethod
     def url(cls, base_url):
@@ -161,20 +578,47 @@ class ConnectPage(PageObject):
 
     @classmethod
     def open(cls, base_url, selenium):
+        cls.collect_errors_from_load(selenium)
         selenium.get(cls.url(base_url))
+        cls.install_error_collector(selenium)
         return cls(selenium)
 
-    @classmethod
-    def wait(cls, selenium: webdriver.Remote):
-        # wait for Connect link in the top bar to be active
-        locator = (By.CSS_SELECTOR, '.active a[ng-href="#/{}/connect"]'.format(PLUGIN_NAME))
-        WebDriverWait(selenium, 30).until(EC.presence_of_element_located(locator))
-
     def find_wait_clickable(self, by, value, root=None):
         locator = (by, value)
-        element = WebDriverWait(self.selenium, 10).until(EC.element_to_be_clickable(locator))
+        with self.timeouts.timed('clickable {}'.format(value), 10) as timeout:
+            element = WebDriverWait(self.selenium, timeout).until(EC.element_to_be_clickable(locator))
         return element
 
+    @staticmethod
+    def open_blank(selenium: webdriver.Remote, base_url: str):
+        """Opens a page on the console's origin, which gives access to the console's storage"""
+        # storage is per origin, so some page from the console server has to be open. Any page is fine,
+        # so we avoid loading the heavy console by asking for one that does not exist.
+        url = urlsplit(base_url)
+        selenium.get(urlunsplit((url.scheme, url.netloc, '/dispatch-console-tests-blank', '', '')))
+
+    @classmethod
+    def clear_storage(cls, selenium: webdriver.Remote, base_url: str):
+        """Forgets what the console stored in the browser, connection settings as well as expanded tree nodes"""
+        cls.open_blank(selenium, base_url)
+        selenium.execute_script('window.localStorage.clear(); window.sessionStorage.clear();')
+
+    @classmethod
+    def connect_directly(cls, selenium: webdriver.Remote, base_url: str, host: str, port, clear: bool = False):
+        """Makes the console connect to the router on its own, next time it is loaded
+
+        Stores connection settings into localStorage, the same way the connect form does, with autostart
+        turned on. Then it is possible to navigate straight to a page that needs a connection. With clear,
+        everything else the console stored is forgotten first.
+        """
+        if clear:
+            cls.clear_storage(selenium, base_url)
+        else:
+            cls.open_blank(selenium, base_url)
+        selenium.execute_script("window.localStorage.setItem(arguments[0], JSON.stringify(arguments[1]));",
+                                SETTINGS_KEY, {'address': host, 'port': str(port),
+                                               'username': '', 'password': '', 'autostart': True})
+
     def connect_to(self, host=None, port=None):
         self.host.clear()
         self.wait_for_frameworks()
@@ -188,29 +632,91 @@ class ConnectPage(PageObject):
 
 class PluginPage(PageObject):
     """PluginPage is page inside dispatch-hawtio-plugin. It has a treeview on the left."""
-    def __init__(self, selenium: webdriver.Remote):
-        super().__init__(selenium)
+    # either 'script' or 'click', see expand_tree
+    expand_strategy = 'script'
+    expander_css = '.dynatree-node > .dynatree-expander'
+
+    def __init__(self, selenium: webdriver.Remote, wait: bool = True):
+        super().__init__(selenium, wait)
         self.node_count = None  # type: int
 
+    @classmethod
+    def open(cls, base_url, selenium):
+        """Opens the page directly, see ConnectPage.connect_directly"""
+        cls.collect_errors_from_load(selenium)
+        selenium.get(cls.url(base_url))
+        cls.install_error_collector(selenium)
+        cls.wait(selenium)
+        return cls(selenium)
+
     @property
     def entities_tab(self) -> WebElement:
         locator = (By.CSS_SELECTOR, 'a[ng-href="#/{}/list"]'.format(PLUGIN_NAME))
-        return self.wait_locate_visible_element(locator)
+        return self.cached_element(locator)
 
     @property
     def overview_tab(self) -> WebElement:
         locator = (By.CSS_SELECTOR, 'a[ng-href="#/{}/overview"]'.format(PLUGIN_NAME))
-        return self.wait_locate_visible_element(locator)
+        return self.cached_element(locator)
 
     @property
     def expander_locator(self):
-        return By.CSS_SELECTOR, '.dynatree-node > .dynatree-expander'
+        return By.CSS_SELECTOR, self.expander_css
 
-    def expand_tree(self, node_count):
-        """expand_tree expands treeview (dynatree) by clicking expander arrows one by one"""
+    def expand_tree(self, node_count: Optional[int], titles: List[str] = None, strategy: str = None):
+        """expand_tree expands treeview (dynatree)
+
+        If node_count is given, it first waits for that many expanders to appear; if not, for the number of
+        expanders to stop changing.
+
+        The 'script' strategy expands all nodes (or only the nodes with given titles) in a single
+        in-page script, using the dynatree API where the page has it. The 'click' strategy clicks
+        expander arrows one by one, the way a user would.
+        """
+        strategy = strategy or self.expand_strategy
+        if strategy == 'script':
+            self.expand_tree_by_script(node_count, titles)
+        elif strategy == 'click':
+            if titles is not None:
+                raise ValueError('Expanding a subset of the tree is not supported by the click strategy')
+            self.expand_tree_by_clicking(node_count)
+        else:
+            raise ValueError('Unknown tree expansion strategy: {}'.format(strategy))
+        self.wait_for_frameworks()
+
+        self.assert_tree_expanded(titles)
+
+    def ready(self) -> Generator[Wait, object, None]:
+        yield self.present(self.expander_locator)
+        yield self.settle()
+
+    def expand_tree_in_tab(self, node_count: Optional[int], titles: List[str] = None) \
+            -> Generator[Wait, object, None]:
+        """expand_tree with the script strategy, for tasks run by a TabScheduler
+
+        Every poll of the wait runs one step of the expansion, so that the other tabs get their turns in between.
+        """
+        yield self.settle()
+        timeout = self.timeouts.timeout('{}.expand_tree'.format(type(self).__name__), 10)
+        yield Wait(lambda: self.selenium.execute_script(EXPAND_TREE_STEP_SCRIPT, self.expander_locator[1],
+                                                        node_count, titles),
+                   timeout, 'tree to expand in {}'.format(type(self).__name__))
+        yield self.settle()
+        self.assert_tree_expanded(titles)
+
+    def expand_tree_by_script(self, node_count, titles: List[str] = None):
+        self.wait_for_frameworks()
+        self.selenium.set_script_timeout(10)
+        done = self.selenium.execute_async_script(EXPAND_TREE_SCRIPT, self.expander_locator[1], node_count, titles)
+        assert done, 'Tree did not finish expanding'
+
+    def expand_tree_by_clicking(self, node_count):
         self.wait_for_frameworks()
-        WebDriverWait(self.selenium, 10).until(EC.element_to_be_clickable(self.expander_locator))
-        WebDriverWait(self.selenium, 10).until(lambda _: len(self.expanders) == node_count)
+        with self.timeouts.timed('clickable {}'.format(self.expander_css), 10) as timeout:
+            WebDriverWait(self.selenium, timeout).until(EC.element_to_be_clickable(self.expander_locator))
+        if node_count is not None:
+            with self.timeouts.timed('{} expanders'.format(node_count), 10) as timeout:
+                WebDriverWait(self.selenium, timeout).until(lambda _: len(self.expanders) == node_count)
 
         # least-work way to fight ElementNotVisibleException: Message: Cannot click on element, and
         # http://stackoverflow.com/questions/37781539/selenium-stale-element-reference-element-is-not-attached-to-the-page-document/38683022
@@ -225,24 +731,40 @@ class PluginPage(PageObject):
                 self.wait_for_frameworks()
         self.retry_on_exception(StaleElementReferenceException, loop)
 
-        self.assert_tree_expanded()
+    def assert_tree_expanded(self, titles: List[str] = None):
+        nodes = self.tree_snapshot()
+        assert nodes, 'Tree has no nodes to expand'
+        collapsed = [node.text for node in nodes
+                     if not self.is_expanded(node) and (titles is None or node.text in titles)]
+        assert collapsed == []
 
-    def assert_tree_expanded(self):
-        def loop():
-            self.wait_for_frameworks()
-            assert all(self.is_expanded(e.find_element(By.XPATH, './..')) for e in self.expanders)
-        self.retry_on_exception(StaleElementReferenceException, loop)
+    def discover_node_count(self) -> int:
+        """Counts tree nodes that have an expander, once the page stops changing"""
+        self.wait_for_frameworks()
+        count = len(self.tree_snapshot())
+        assert count > 0, 'Tree has no nodes'
+        return count
+
+    def tree_node_count(self, schema: dict) -> Optional[int]:
+        """Tree nodes with an expander the page shows for a router with the given management schema"""
+        return self.node_count
+
+    def tree_snapshot(self) -> List[ElementSnapshot]:
+        """State of all tree nodes that have an expander"""
+        return self.snapshot(self.expander_locator[1], parents=True)
 
-    def is_expanded(self, node: WebElement):
+    def is_expanded(self, node: Union[WebElement, ElementSnapshot]):
+        if isinstance(node, ElementSnapshot):
+            return node.has_class('dynatree-expanded')
         return 'dynatree-expanded' in node.get_attribute('class')
 
     @property
     def expanders(self) -> List[WebElement]:
-        return self.selenium.find_elements(By.CSS_SELECTOR, '.dynatree-node > .dynatree-expander')
+        return self.selenium.find_elements(By.CSS_SELECTOR, self.expander_css)
 
     @property
-    def expanded_nodes(self) -> List[WebElement]:
-        return self.selenium.find_elements(By.CSS_SELECTOR, '.dynatree-node.dynatree-expanded')
+    def expanded_nodes(self) -> List[ElementSnapshot]:
+        return self.snapshot('.dynatree-node.dynatree-expanded')
 
     def retry_on_exception(self, exception, test_function, retries=50):
         for _ in range(retries):
@@ -254,117 +776,111 @@ class PluginPage(PageObject):
 
 
 class StandalonePluginPage(PageObject):
+    angular_root = 'body'
+    expander_css = '.dynatree-node > .fa-angle'
+
     @property
     def entities_tab(self) -> WebElement:
         locator = (By.CSS_SELECTOR, 'li > a[ng-href="#!/list"]')
-        return self.wait_locate_visible_element(locator)
+        return self.cached_element(locator)
 
     @property
     def overview_tab(self) -> WebElement:
         locator = (By.CSS_SELECTOR, 'li > a[ng-href="#!/overview"]')
-        return self.wait_locate_visible_element(locator)
-
-    def wait_for_angular(self, element: str = "body"):
-        return super().wait_for_angular(element)
+        return self.cached_element(locator)
 
     @property
     def expander_locator(self):
-        return By.CSS_SELECTOR, '.dynatree-node > .fa-angle'
+        return By.CSS_SELECTOR, self.expander_css
 
     @property
     def expanders(self) -> List[WebElement]:
-        return self.selenium.find_elements(By.CSS_SELECTOR, '.dynatree-node > .fa-angle')
+        return self.selenium.find_elements(By.CSS_SELECTOR, self.expander_css)
 
 
 class OverviewPage(PluginPage):
-    def __init__(self, selenium: webdriver.Remote):
-        super().__init__(selenium)
+    # Overview link in the top bar is active
+    shown_locator = (By.CSS_SELECTOR, '.active a[ng-href="#/{}/overview"]'.format(PLUGIN_NAME))
+
+    def __init__(self, selenium: webdriver.Remote, wait: bool = True):
+        super().__init__(selenium, wait)
         self.node_count = 5
         # Wait for at least one node expander to appear
-        _ = self.wait_locate_visible_element(self.expander_locator)
+        if wait:
+            _ = self.wait_locate_visible_element(self.expander_locator)
 
     @classmethod
     def url(cls, base_url):
         return '{}/{}/overview'.format(base_url, PLUGIN_NAME)
 
-    @classmethod
-    def wait(cls, selenium: webdriver.Remote):
-        # wait for Overview link in the top bar to be active
-        locator = (By.CSS_SELECTOR, '.active a[ng-href="#/{}/overview"]'.format(PLUGIN_NAME))
-        WebDriverWait(selenium, 30).until(EC.presence_of_element_located(locator))
+    def tree_node_count(self, schema: dict) -> int:
+        # only the sections (routers, addresses, links, connections and logs) have expanders, however large the mesh
+        return self.node_count
 
 
 class EntitiesPage(PluginPage):
-    def __init__(self, selenium: webdriver.Remote):
-        super().__init__(selenium)
+    # Entities link in the top bar is active
+    shown_locator = (By.CSS_SELECTOR, '.active a[ng-href="#/{}/list"]'.format(PLUGIN_NAME))
+
+    def __init__(self, selenium: webdriver.Remote, wait: bool = True):
+        super().__init__(selenium, wait)
         self.node_count = 17
         # Wait for at least one node expander to appear
-        _ = self.wait_locate_visible_element(self.expander_locator)
+        if wait:
+            _ = self.wait_locate_visible_element(self.expander_locator)
 
     @classmethod
     def url(cls, base_url):
-        return '{}/{}/links'.format(base_url, PLUGIN_NAME)
+        return '{}/{}/list'.format(base_url, PLUGIN_NAME)
 
-    @classmethod
-    def wait(cls, selenium: webdriver.Remote):
-        # wait for Entities link in the top bar to be active
-        locator = (By.CSS_SELECTOR, '.active a[ng-href="#/{}/list"]'.format(PLUGIN_NAME))
-        WebDriverWait(selenium, 30).until(EC.presence_of_element_located(locator))
+    def tree_node_count(self, schema: dict) -> int:
+        # a node for every entity type, also for the types the router has no entities of
+        return len(schema['entityTypes'])
 
 
 # TODO: the order of predecessors matters here; the class hierarchy probably needs changing
 class StandaloneOverviewPage(StandalonePluginPage, OverviewPage):
-    def __init__(self, selenium: webdriver.Remote):
-        super().__init__(selenium)
+    # Overview link in the top bar is active
+    shown_locator = (By.CSS_SELECTOR, 'li.active > a[ng-href="#!/overview"]')
+
+    def __init__(self, selenium: webdriver.Remote, wait: bool = True):
+        super().__init__(selenium, wait)
         # Wait for at least one node expander to appear
-        _ = self.wait_locate_visible_element(self.expander_locator)
+        if wait:
+            _ = self.wait_locate_visible_element(self.expander_locator)
 
     @classmethod
     def url(cls, base_url: str) -> str:
         return '{}/#!/overview'.format(base_url)
 
-    @classmethod
-    def wait(cls, selenium: webdriver.Remote):
-        # wait for Overview link in the top bar to be active
-        locator = (By.CSS_SELECTOR, 'li.active > a[ng-href="#!/overview"]')
-        WebDriverWait(selenium, 30).until(EC.presence_of_element_located(locator))
-
 
 class StandaloneEntitiesPage(StandalonePluginPage, EntitiesPage):
-    def __init__(self, selenium: webdriver.Remote):
-        super().__init__(selenium)
+    # Entities link in the top bar is active
+    shown_locator = (By.CSS_SELECTOR, 'li.active > a[ng-href="#!/list"]')
+
+    def __init__(self, selenium: webdriver.Remote, wait: bool = True):
+        super().__init__(selenium, wait)
         # Wait for at least one node expander to appear
-        _ = self.wait_locate_visible_element(self.expander_locator)
+        if wait:
+            _ = self.wait_locate_visible_element(self.expander_locator)
 
     @classmethod
     def url(cls, base_url: str) -> str:
         return '{}/#!/list'.format(base_url)
 
-    @classmethod
-    def wait(cls, selenium: webdriver.Remote):
-        # wait for Overview link in the top bar to be active
-        locator = (By.CSS_SELECTOR, 'li.active > a[ng-href="#!/list"]')
-        WebDriverWait(selenium, 30).until(EC.presence_of_element_located(locator))
-
 
 class StandaloneConnectPage(ConnectPage):
-    def __init__(self, selenium: webdriver.Remote):
-        super().__init__(selenium)
+    angular_root = 'body'
+    # Connect link in the top bar
+    shown_locator = (By.CSS_SELECTOR, 'a[ng-href="#!/connect"]')
+
+    def __init__(self, selenium: webdriver.Remote, wait: bool = True):
+        super().__init__(selenium, wait)
 
     @classmethod
     def url(cls, base_url: str) -> str:
         return base_url
 
-    @classmethod
-    def wait(cls, selenium: webdriver.Remote):
-        # wait for Connect link in the top bar to be active
-        locator = (By.CSS_SELECTOR, 'a[ng-href="#!/connect"]')
-        WebDriverWait(selenium, 30).until(EC.presence_of_element_located(locator))
-
-    # TODO: again this is bad class hierarchy
-    def wait_for_angular(self, element: str = "body"):
-        return super().wait_for_angular(element)
-
 
 class PageObjectContainer(object, metaclass=ABCMeta):
     @property
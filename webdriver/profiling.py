@@ -0,0 +1,189 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""JavaScript CPU profiles of the browser around page object actions
+
+Profiler.install() wraps the chosen page object methods, and WebElement.click for
+the action "click", so that the DevTools JS profiler runs while they do. Every
+profile is written as <test>__<n>_<action>.cpuprofile into the artifacts directory,
+where Chrome DevTools (Performance, Load profile) can open it. For each action the
+profiler also keeps the functions with the most self time, and the number of Angular
+digests that ran, counted by the quiescence monitor of webdriver.page_objects.
+
+An action called from another profiled action is part of the outer one's profile.
+Only Chrome has the DevTools protocol; in other browsers actions run unprofiled.
+"""
+
+import functools
+import inspect
+import json
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, List, Tuple
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webelement import WebElement
+
+from webdriver import page_objects
+from webdriver.devtools import execute_cdp, has_devtools
+
+DEFAULT_ACTIONS = ['expand_tree', 'connect_to', 'click']
+SAMPLING_INTERVAL = 100  # microseconds
+
+DIGESTS_SCRIPT = 'return window.qdQuiescence ? window.qdQuiescence.digests : null;'
+
+
+def self_times(profile: dict) -> Counter:
+    """Milliseconds each function spent running its own code, by function name and location"""
+    nodes = {node['id']: node for node in profile['nodes']}
+    samples, deltas = profile.get('samples', []), profile.get('timeDeltas', [])
+    times = Counter()
+    for i, node_id in enumerate(samples):
+        # a delta is the time since the previous sample, so it belongs to the sample before it
+        if i + 1 < len(deltas):
+            frame = nodes[node_id]['callFrame']
+            times[function_name(frame)] += deltas[i + 1] / 1000
+    return times
+
+
+def function_name(frame: dict) -> str:
+    name = frame['functionName'] or '(anonymous)'
+    if not frame.get('url'):
+        return name
+    return '{} {}:{}'.format(name, frame['url'].rsplit('/', 1)[-1], frame['lineNumber'] + 1)
+
+
+class ActionProfile(object):
+    def __init__(self, test: str, action: str, seconds: float, digests: int, path: str, top: List[Tuple[str, float]]):
+        self.test = test
+        self.action = action
+        self.seconds = seconds
+        self.digests = digests  # None when the page had no quiescence monitor
+        self.path = path
+        self.top = top
+
+    def to_dict(self) -> dict:
+        return OrderedDict([('test', self.test), ('action', self.action), ('seconds', round(self.seconds, 4)),
+                            ('digests', self.digests), ('profile', os.path.basename(self.path)),
+                            ('self_times', OrderedDict((name, round(ms, 1)) for name, ms in self.top))])
+
+
+class Profiler(object):
+    """Profiles page object actions of the running test, see the module docstring"""
+    def __init__(self, directory: str, actions: List[str] = None, top: int = 10):
+        self.directory = directory
+        self.actions = DEFAULT_ACTIONS if actions is None else actions
+        self.top = top
+        self.profiles = []  # type: List[ActionProfile]
+        self.test = None  # type: str
+        self._count = 0
+        self._depth = 0
+        self._originals = []  # type: List[Tuple[object, str, object]]
+
+    def start_test(self, name: str):
+        self.test = re.sub(r'[^\w.-]+', '_', name)
+        self._count = 0
+
+    def end_test(self):
+        self.test = None
+
+    def install(self):
+        for cls in vars(page_objects).values():
+            if inspect.isclass(cls) and issubclass(cls, page_objects.PageObject):
+                for name in self.actions:
+                    if inspect.isfunction(vars(cls).get(name)):
+                        self._patch(cls, name, self.profiled(name, vars(cls)[name], lambda page: page.selenium))
+        if 'click' in self.actions:
+            self._patch(WebElement, 'click', self.profiled('click', WebElement.click, lambda element: element.parent))
+
+    def uninstall(self):
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+    def profiled(self, action: str, function: Callable, driver_of: Callable) -> Callable:
+        """Wraps function, whose first argument gives driver_of the WebDriver to profile"""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            selenium = driver_of(args[0])
+            if self.test is None or self._depth > 0 or not has_devtools(selenium):
+                return function(*args, **kwargs)
+            self._depth += 1
+            try:
+                return self._profile(action, selenium, lambda: function(*args, **kwargs))
+            finally:
+                self._depth -= 1
+        return wrapper
+
+    def _profile(self, action: str, selenium: webdriver.Remote, call: Callable):
+        digests_before = selenium.execute_script(DIGESTS_SCRIPT)
+        try:
+            execute_cdp(selenium, 'Profiler.enable')
+            execute_cdp(selenium, 'Profiler.setSamplingInterval', {'interval': SAMPLING_INTERVAL})
+            execute_cdp(selenium, 'Profiler.start')
+        except WebDriverException:
+            return call()  # an old chromedriver, or a grid that does not pass the command on
+        thence = time.perf_counter()
+        try:
+            return call()
+        finally:
+            seconds = time.perf_counter() - thence
+            try:
+                profile = execute_cdp(selenium, 'Profiler.stop')['profile']
+                digests = selenium.execute_script(DIGESTS_SCRIPT)
+            except WebDriverException:
+                profile = None  # the window went away; an exception from the action itself is more interesting
+            if profile is not None:
+                if digests is not None and digests_before is not None and digests >= digests_before:
+                    digests -= digests_before  # else the page was loaded again, and counts from zero
+                self._record(action, seconds, digests, profile)
+
+    def _record(self, action: str, seconds: float, digests: int, profile: dict):
+        self._count += 1
+        path = os.path.join(self.directory, '{}__{:02d}_{}.cpuprofile'.format(self.test, self._count, action))
+        with open(path, 'w') as f:
+            json.dump(profile, f)
+        top = self_times(profile).most_common(self.top)
+        self.profiles.append(ActionProfile(self.test, action, seconds, digests, path, top))
+
+    def _patch(self, owner, name: str, replacement):
+        self._originals.append((owner, name, vars(owner)[name]))
+        setattr(owner, name, replacement)
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump([p.to_dict() for p in self.profiles], f, indent=2)
+
+    def summary_lines(self, limit: int = 10) -> List[str]:
+        """Per action: calls, digests, and the functions with the most self time over all of its profiles"""
+        lines = []
+        for action in OrderedDict((p.action, None) for p in self.profiles):
+            profiles = [p for p in self.profiles if p.action == action]
+            digests = [p.digests for p in profiles if p.digests is not None]
+            times = Counter()  # type: Counter
+            for p in profiles:
+                times.update(dict(p.top))
+            lines.append('{}: {} calls, {:.2f} s, {} Angular digests'.format(
+                action, len(profiles), sum(p.seconds for p in profiles), sum(digests) if digests else 'unknown'))
+            for name, ms in times.most_common(limit):
+                lines.append('    {:>10.1f} ms  {}'.format(ms, name))
+        return lines
@@ -0,0 +1,120 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Screenshots written in the background
+
+The test only waits for the browser to return the base64 encoded PNG. Decoding,
+optional downscaling and the disk write happen on a writer thread. A single
+thread writes frames in the order they were taken, which is what deduplication
+against the previous frame of the same test relies on.
+
+Downscaling needs Pillow, which is optional.
+"""
+
+import base64
+import hashlib
+import io
+import os.path
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from selenium import webdriver
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+POLICIES = ['always', 'on-failure', 'sampled']
+
+
+class ScreenshotWriter(object):
+    """Takes screenshots and stores them according to a policy
+
+    always      every screenshot is stored
+    on-failure  screenshots of a test are kept in memory and stored only if the test failed
+    sampled     every sample_every-th screenshot is taken, the others are skipped
+    """
+    def __init__(self, directory: str, policy: str = 'always', sample_every: int = 5, scale: float = None,
+                 deduplicate: bool = True):
+        if policy not in POLICIES:
+            raise ValueError('Unknown screenshot policy {}, expected one of {}'.format(policy, POLICIES))
+        if scale is not None and Image is None:
+            raise ValueError('Downscaling screenshots needs Pillow')
+        self.directory = directory
+        self.policy = policy
+        self.sample_every = sample_every
+        self.scale = scale
+        self.deduplicate = deduplicate
+        self.taken = 0
+        self.written = 0
+        self.duplicates = 0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._futures = []  # type: List[Future]
+        self._held = {}  # type: Dict[str, List[Tuple[str, str]]]
+        self._previous = {}  # type: Dict[str, str]
+
+    def capture(self, selenium: webdriver.Remote, test: str, filename: str):
+        """Takes a screenshot now and stores it later; test groups frames for deduplication and on-failure"""
+        self.taken += 1
+        if self.policy == 'sampled' and (self.taken - 1) % self.sample_every != 0:
+            return
+        payload = selenium.get_screenshot_as_base64()
+        if self.policy == 'on-failure':
+            self._held.setdefault(test, []).append((filename, payload))
+        else:
+            self._submit(test, filename, payload)
+
+    def finish_test(self, test: str, failed: bool):
+        """Stores the held screenshots of a failed test, drops those of a passed one"""
+        held = self._held.pop(test, [])
+        if failed:
+            for filename, payload in held:
+                self._submit(test, filename, payload)
+        self._futures = [f for f in self._futures if not f.done() or f.exception() is not None]
+
+    def close(self):
+        """Waits for pending writes; raises the first error a write ran into"""
+        self._executor.shutdown(wait=True)
+        for future in self._futures:
+            future.result()
+
+    def _submit(self, test: str, filename: str, payload: str):
+        self._futures.append(self._executor.submit(self._write, test, filename, payload))
+
+    def _write(self, test: str, filename: str, payload: str):
+        if self.deduplicate:
+            digest = hashlib.sha1(payload.encode('ascii')).hexdigest()
+            if self._previous.get(test) == digest:
+                self.duplicates += 1
+                return
+            self._previous[test] = digest
+        png = base64.b64decode(payload)
+        if self.scale is not None:
+            png = self._downscale(png)
+        with open(os.path.join(self.directory, filename), 'wb') as f:
+            f.write(png)
+        self.written += 1
+
+    def _downscale(self, png: bytes) -> bytes:
+        image = Image.open(io.BytesIO(png))
+        size = (max(1, int(image.width * self.scale)), max(1, int(image.height * self.scale)))
+        output = io.BytesIO()
+        image.resize(size, Image.BILINEAR).save(output, format='PNG')
+        return output.getvalue()
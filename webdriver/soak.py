@@ -0,0 +1,122 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Leak detection for a console that stays open for a long time
+
+A soak test repeats the same navigation many times and takes a sample of the
+page's footprint after each round: elements in the document, Angular scopes and
+watchers, and in Chrome also the JS heap, all DOM nodes including detached ones,
+and event listeners, as reported by the DevTools Performance domain after a
+garbage collection.
+
+The heap grows and shrinks between collections, so a metric leaks when its minimum
+grows from each window of samples to the next one, and the last window's minimum
+is bigger than the first one's by more than a tolerance.
+"""
+
+import json
+from collections import OrderedDict
+from typing import Dict, List
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from webdriver.devtools import execute_cdp, has_devtools
+
+# Counts elements in the document, and scopes and watchers of the Angular application in arguments[0]
+SAMPLE_SCRIPT = """
+var result = {elements: document.getElementsByTagName('*').length};
+if (window.performance && window.performance.memory) {
+  result.usedJSHeapSize = window.performance.memory.usedJSHeapSize;
+}
+if (window.angular) {
+  var element = window.angular.element(document.querySelector(arguments[0]) || document.body);
+  var injector = element.injector() || window.angular.element(document.body).injector();
+  if (injector) {
+    var scopes = 0, watchers = 0, pending = [injector.get('$rootScope')];
+    while (pending.length) {
+      var scope = pending.pop();
+      scopes++;
+      watchers += scope.$$watchers ? scope.$$watchers.length : 0;
+      for (var child = scope.$$childHead; child; child = child.$$nextSibling) {
+        pending.push(child);
+      }
+    }
+    result.scopes = scopes;
+    result.watchers = watchers;
+  }
+}
+return result;
+"""
+
+# metrics from DevTools Performance.getMetrics that are sampled
+DEVTOOLS_METRICS = ['JSHeapUsedSize', 'Nodes', 'JSEventListeners', 'Documents']
+
+
+def is_growing(values: List[float], windows: int = 4, tolerance: float = 0.1) -> bool:
+    """Whether the minimum of values goes up in every window, by more than tolerance overall"""
+    size = len(values) // windows
+    if size == 0:
+        return False
+    minima = [min(values[i * size:(i + 1) * size]) for i in range(windows)]
+    if any(later <= earlier for earlier, later in zip(minima, minima[1:])):
+        return False
+    return minima[-1] > minima[0] * (1 + tolerance)
+
+
+class SoakMonitor(object):
+    def __init__(self, iterations: int, warmup: int = 5, windows: int = 4, tolerance: float = 0.1):
+        self.iterations = iterations
+        self.warmup = warmup  # rounds that fill caches, and are left out of the leak detection
+        self.windows = windows
+        self.tolerance = tolerance
+        self.samples = []  # type: List[Dict[str, float]]
+
+    def sample(self, selenium: webdriver.Remote, angular_root: str = 'html') -> Dict[str, float]:
+        values = OrderedDict(sorted(selenium.execute_script(SAMPLE_SCRIPT, angular_root).items()))
+        if has_devtools(selenium):
+            try:
+                execute_cdp(selenium, 'HeapProfiler.collectGarbage')
+                execute_cdp(selenium, 'Performance.enable')
+                metrics = {m['name']: m['value'] for m in execute_cdp(selenium, 'Performance.getMetrics')['metrics']}
+            except WebDriverException:
+                metrics = {}  # an old chromedriver, or a grid that does not pass the command on
+            for name in DEVTOOLS_METRICS:
+                if name in metrics:
+                    values[name] = metrics[name]
+        self.samples.append(values)
+        return values
+
+    def series(self) -> Dict[str, List[float]]:
+        """Values of each metric after the warm-up, for metrics present in all samples"""
+        samples = self.samples[self.warmup:]
+        names = [name for name in (samples[0] if samples else []) if all(name in s for s in samples)]
+        return OrderedDict((name, [s[name] for s in samples]) for name in names)
+
+    def leaks(self) -> List[str]:
+        problems = []
+        for name, values in self.series().items():
+            if is_growing(values, self.windows, self.tolerance):
+                problems.append('{} grew from {} to {} over {} rounds'.format(
+                    name, values[0], values[-1], len(values)))
+        return problems
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump({'warmup': self.warmup, 'samples': self.samples}, f, indent=2)
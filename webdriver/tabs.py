@@ -0,0 +1,198 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Several consoles in the tabs of one browser session
+
+A Tab stands in for the WebDriver session, but every command it sends, including
+commands of elements found through it, first switches the session to the tab's
+window handle, if it is not there already. Page objects take a Tab wherever they
+take a WebDriver, so each page object is bound to its tab.
+
+WebDriver runs one command at a time, but the browser loads and renders all tabs
+at once. TabScheduler makes use of that: tasks are generators that yield a Wait
+instead of blocking, and the scheduler polls the waits of all tasks in turns, so
+that one tab is worked on while the others are loading.
+
+    def task(tab):
+        page = yield from OverviewPage.open_in_tab(base_url, tab)
+        ...
+        return result
+
+    scheduler = TabScheduler()
+    for tab in tabs:
+        scheduler.add(task(tab))
+    results = scheduler.run()
+
+Chrome slows down timers in background tabs; local browsers are started with that
+turned off, see drivers.CHROME_ARGUMENTS.
+"""
+
+import time
+from typing import Any, Callable, Dict, Generator, List, Tuple
+
+from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+from selenium.webdriver.remote.command import Command
+
+# commands that do not depend on the current window
+SESSION_COMMANDS = {Command.NEW_SESSION, Command.QUIT, Command.GET_WINDOW_HANDLES, Command.W3C_GET_WINDOW_HANDLES,
+                    Command.GET_CURRENT_WINDOW_HANDLE, Command.W3C_GET_CURRENT_WINDOW_HANDLE,
+                    Command.SWITCH_TO_WINDOW}
+
+
+class TabGroup(object):
+    """The tabs of one browser session, starting with the one that is open"""
+    def __init__(self, driver: webdriver.Remote):
+        self.driver = driver
+        self.active = driver.current_window_handle
+        self.tabs = [Tab(self, self.active)]  # type: List[Tab]
+
+    def activate(self, handle: str):
+        if handle != self.active:
+            self.driver.switch_to.window(handle)
+            self.active = handle
+
+    def new_tab(self) -> 'Tab':
+        """Opens a blank tab"""
+        before = set(self.driver.window_handles)
+        self.driver.execute_script('window.open("about:blank", "_blank");')
+        handle = (set(self.driver.window_handles) - before).pop()
+        tab = Tab(self, handle)
+        self.tabs.append(tab)
+        return tab
+
+    def close(self):
+        """Closes all tabs but the first one, and switches back to it"""
+        for tab in self.tabs[1:]:
+            tab.close()
+        self.activate(self.tabs[0].handle)
+
+
+class Tab(object):
+    """WebDriver session bound to one window handle, see the module docstring
+
+    Do not switch windows through a tab; frames selected in a tab are forgotten when another tab is used.
+    """
+    def __init__(self, group: TabGroup, handle: str):
+        self.group = group
+        self.handle = handle
+
+    def __getattr__(self, name):
+        # methods and properties of the WebDriver run with the tab as self, so that their commands go through
+        # Tab.execute and the elements they return have the tab as their parent
+        descriptor = getattr(type(self.group.driver), name, None)
+        if hasattr(descriptor, '__get__'):
+            return descriptor.__get__(self, type(self.group.driver))
+        return getattr(self.group.driver, name)
+
+    def __repr__(self):
+        return 'Tab({})'.format(self.handle)
+
+    def activate(self):
+        self.group.activate(self.handle)
+
+    def execute(self, driver_command: str, params: dict = None) -> dict:
+        if driver_command not in SESSION_COMMANDS:
+            self.activate()
+        return type(self.group.driver).execute(self, driver_command, params)
+
+    @property
+    def switch_to(self):
+        self.activate()
+        return self.group.driver.switch_to
+
+    def navigate(self, url: str):
+        """Starts loading url, without waiting for the page to load like get does"""
+        self.execute_script('window.location.href = arguments[0];', url)
+
+    def close(self):
+        self.activate()
+        self.group.driver.close()
+        self.group.tabs.remove(self)
+        self.group.active = None
+
+
+class Wait(object):
+    """What a task waits for: until condition returns something truthy, which is then sent into the task"""
+    # exceptions that mean "not yet", as with WebDriverWait
+    IGNORED = (NoSuchElementException, StaleElementReferenceException)
+
+    def __init__(self, condition: Callable[[], Any], timeout: float = 10, message: str = ''):
+        self.condition = condition
+        self.timeout = timeout
+        self.message = message
+
+    def poll(self) -> Any:
+        try:
+            return self.condition()
+        except self.IGNORED:
+            return None
+
+
+class TabScheduler(object):
+    """Runs tasks, generators yielding Waits, until all of them return; see the module docstring"""
+    def __init__(self, poll_interval: float = 0.05):
+        self.poll_interval = poll_interval
+        self.tasks = []  # type: List[Generator]
+
+    def add(self, task: Generator):
+        self.tasks.append(task)
+
+    def run(self) -> List[Any]:
+        """Return values of the tasks, in the order they were added
+
+        A task that does not get what it waits for in time has a TimeoutException raised at its yield.
+        An exception coming out of a task stops the other tasks, and is raised from here.
+        """
+        results = [None] * len(self.tasks)  # type: List[Any]
+        waiting = {}  # type: Dict[int, Tuple[Wait, float]]
+        try:
+            for index in range(len(self.tasks)):
+                self._step(index, None, results, waiting)
+            while waiting:
+                progressed = False
+                for index, (wait, deadline) in list(waiting.items()):
+                    value = wait.poll()
+                    if value:
+                        del waiting[index]
+                        self._step(index, value, results, waiting)
+                        progressed = True
+                    elif time.monotonic() > deadline:
+                        del waiting[index]
+                        message = 'Waited {} s for {}'.format(wait.timeout, wait.message or wait.condition)
+                        self._step(index, TimeoutException(message), results, waiting, throw=True)
+                        progressed = True
+                if not progressed:
+                    time.sleep(self.poll_interval)
+        finally:
+            for task in self.tasks:
+                task.close()
+        return results
+
+    def _step(self, index: int, value: Any, results: List[Any], waiting: Dict[int, Tuple[Wait, float]],
+              throw: bool = False):
+        task = self.tasks[index]
+        try:
+            wait = task.throw(value) if throw else task.send(value)
+        except StopIteration as e:
+            results[index] = e.value
+            return
+        if not isinstance(wait, Wait):
+            raise TypeError('Tasks have to yield Wait, not {!r}'.format(wait))
+        waiting[index] = (wait, time.monotonic() + wait.timeout)
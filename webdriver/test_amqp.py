@@ -0,0 +1,49 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+from webdriver.amqp import Described, Message, decode_message, encode, encode_message, symbol
+
+
+def test_message_round_trip():
+    message = Message(body='hello', properties={'to': 'closest/examples', 'reply_to': 'reply', 'message_id': 7},
+                      application_properties={'operation': 'QUERY', 'count': 3},
+                      message_annotations={'x-opt-qd.trace': ['0/Router.A']})
+    decoded = decode_message(encode_message(message))
+    assert decoded.body == 'hello'
+    assert decoded.properties == message.properties
+    assert decoded.application_properties == message.application_properties
+    assert decoded.message_annotations == message.message_annotations
+
+
+def test_binary_body_round_trip():
+    assert decode_message(encode_message(Message(body=b'\x00\x01xyz'))).body == b'\x00\x01xyz'
+
+
+def test_symbolic_section_descriptors():
+    data = b''.join(encode(section) for section in [
+        Described(symbol('amqp:header:list'), [True]),
+        Described(symbol('amqp:properties:list'), [None, None, 'closest/examples']),
+        Described(symbol('amqp:application-properties:map'), {'operation': 'QUERY'}),
+        Described(symbol('amqp:amqp-value:*'), 'hello'),
+        Described(symbol('com.example:unknown:map'), {'ignored': True}),
+    ])
+    message = decode_message(data)
+    assert message.to == 'closest/examples'
+    assert message.application_properties == {'operation': 'QUERY'}
+    assert message.body == 'hello'
@@ -0,0 +1,111 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import pytest
+from selenium import webdriver
+
+from webdriver.benchmark import BenchmarkRecorder, navigation_timing, time_to_element, wait_measurement, watch_click
+from webdriver.page_objects import PageObjectContainer
+from .test_connect_page import TestCase
+
+
+class TestBenchmark(TestCase):
+    @pytest.fixture(autouse=True)
+    def setup(self, base_url: str, console_ip: str, console_port: int, pages: PageObjectContainer,
+              selenium: webdriver.Remote, benchmark: BenchmarkRecorder, request):
+        self.base_url = base_url
+        self.console_ip = console_ip
+        self.console_port = console_port
+        self.ConnectPage = pages.connect_page
+        self.OverviewPage = pages.overview_page
+        self.EntitiesPage = pages.entities_page
+        self.selenium = selenium
+        self.benchmark = benchmark
+        self.rounds = request.config.getoption('--benchmark-rounds')
+        self.test_name = None
+        return self
+
+    @pytest.mark.nondestructive
+    def test_time_to_connect(self):
+        for _ in range(self.rounds):
+            self.ConnectPage.clear_storage(self.selenium, self.base_url)
+            page = self.ConnectPage.open(self.base_url, self.selenium)
+            self.benchmark_page_load('connect')
+            page.connect_to(self.console_ip, self.console_port)
+            page.wait_for_frameworks()
+
+            watch_click(self.selenium, 'connect', [self.OverviewPage.shown_locator[1], self.OverviewPage.expander_css])
+            page.connect_button.click()
+            self.benchmark.record('connect', wait_measurement(self.selenium, 'connect'))
+            self.OverviewPage.wait(self.selenium)
+
+    @pytest.mark.nondestructive
+    def test_time_to_first_tree_node(self):
+        for _ in range(self.rounds):
+            self.given_connected()
+            self.selenium.get(self.OverviewPage.url(self.base_url))
+            self.benchmark.record('overview.first_tree_node',
+                                  time_to_element(self.selenium, self.OverviewPage.expander_css))
+            self.benchmark_page_load('overview')
+
+    @pytest.mark.nondestructive
+    def test_overview_tree_expansion(self):
+        for _ in range(self.rounds):
+            self.given_connected()
+            page = self.OverviewPage.open(self.base_url, self.selenium)
+            self.benchmark_tree_expansion('overview', page)
+
+    @pytest.mark.nondestructive
+    def test_entities_tree_expansion(self):
+        for _ in range(self.rounds):
+            self.given_connected()
+            self.OverviewPage.open(self.base_url, self.selenium).entities_tab.click()
+            self.EntitiesPage.wait(self.selenium)
+            page = self.EntitiesPage(self.selenium)
+            self.benchmark_tree_expansion('entities', page)
+
+    @pytest.mark.nondestructive
+    def test_tab_switch(self):
+        self.given_connected()
+        page = self.OverviewPage.open(self.base_url, self.selenium)
+        page.wait_for_frameworks()
+        for _ in range(self.rounds):
+            self.benchmark_tab_switch('tab_switch.entities', page.entities_tab, self.EntitiesPage)
+            self.benchmark_tab_switch('tab_switch.overview', page.overview_tab, self.OverviewPage)
+
+    def given_connected(self):
+        """Connection settings in a browser that forgot everything else, such as which tree nodes were expanded"""
+        self.ConnectPage.connect_directly(self.selenium, self.base_url, self.console_ip, self.console_port, clear=True)
+
+    def benchmark_page_load(self, name):
+        timing = navigation_timing(self.selenium)
+        for milestone in ['responseEnd', 'domContentLoaded', 'load', 'resourcesDone']:
+            self.benchmark.record('{}.page_load.{}'.format(name, milestone), timing[milestone])
+
+    def benchmark_tree_expansion(self, name, page):
+        """Times the in-page expansion only, without the waits and checks around it"""
+        page.wait_for_frameworks()
+        page.expand_tree(self.expected_node_count(page), strategy='script')
+        self.benchmark.record(name + '.tree_expansion', self.selenium.execute_script('return window.qdTreeExpansion;'))
+
+    def benchmark_tab_switch(self, name, tab, page_class):
+        watch_click(self.selenium, name, [page_class.shown_locator[1], page_class.expander_css])
+        tab.click()
+        self.benchmark.record(name, wait_measurement(self.selenium, name))
+        page_class.wait(self.selenium)
@@ -17,7 +17,8 @@
 # under the License.
 #
 
-import os.path
+from typing import Optional
+
 import pytest
 from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
@@ -26,7 +27,10 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
-from .page_objects import PLUGIN_NAME, PageObjectContainer
+from .page_objects import PLUGIN_NAME, PageObject, PageObjectContainer, PluginPage
+from .fake_router import FakeRouter
+from .screenshots import ScreenshotWriter
+from .topology import Topology
 
 
 class TestCase(object):
@@ -35,30 +39,73 @@ class TestCase(object):
         self.test_name
         self.selenium
     """
+    @pytest.fixture(autouse=True)
+    def use_artifacts_dir(self, artifacts_dir: str):
+        self.artifacts_dir = artifacts_dir
+
+    @pytest.fixture(autouse=True)
+    def use_screenshots(self, request, screenshots: ScreenshotWriter):
+        self.screenshots = screenshots
+        self.node_id = request.node.nodeid
+
+    @pytest.fixture(autouse=True)
+    def use_topology(self, topology: Topology, fake_router: FakeRouter):
+        self.topology = topology
+        self.fake_router = fake_router
+
+    def expected_node_count(self, page: PluginPage) -> Optional[int]:
+        """Tree node count the page should have, or None if the count has to be discovered
+
+        A synthesized topology served by the fake router has its schema, which gives the count. Real routers of
+        a --mesh do not, so there the count is discovered from the page.
+        """
+        if self.topology is None:
+            return page.node_count
+        if self.fake_router is not None:
+            return page.tree_node_count(self.fake_router.agent.schema)
+        return None
+
     def take_screenshot(self, name):
-        """Saves a screenshot into the current directory"""
+        """Takes a screenshot; it is saved into the artifacts directory in the background, see --screenshots"""
         if not self.test_name:
             raise RuntimeError('self.test_name is not set')
         filename = '{}__{}.png'.format(self.test_name, name)
-        self.selenium.get_screenshot_as_file(os.path.abspath(filename))
+        self.screenshots.capture(self.selenium, self.node_id, filename)
 
-    def then_no_js_error(self):
-        # fetching browser logs is not supported on IE
-        # http://stackoverflow.com/questions/27796950/how-to-get-the-browser-console-logs-of-internet-explorer-using-python-selenium
-        # neither on Firefox/geckodriver https://github.com/mozilla/geckodriver/issues/144
-        if self.selenium.capabilities['browserName'] in ["internet explorer", "firefox", "MicrosoftEdge"]:
+    @pytest.fixture(autouse=True)
+    def check_js_errors(self, request, selenium: webdriver.Remote):
+        """Fails a passing test that left JavaScript errors behind, unless it is marked allow_js_errors"""
+        yield
+        report = getattr(request.node, 'rep_call', None)
+        if report is None or not report.passed or hasattr(report, 'wasxfail') or 'allow_js_errors' in request.keywords:
             return
-        log = self.selenium.get_log('browser')
-        for entry in log:
-            message = entry['message']
-            assert 'Stack trace:' not in message
+        self.then_no_js_error(selenium)
+
+    def then_no_js_error(self, selenium: webdriver.Remote = None):
+        """Checks errors collected by PageObject.install_error_collector since the previous check
+
+        Uncaught errors and unhandled rejections count, console.error only when it logs an exception.
+        The Chrome browser log is checked as well, in case the collector could not be installed before the
+        page loaded, see PageObject.collect_errors_from_load; fetching it is not supported on IE, Firefox and Edge.
+        """
+        selenium = selenium or self.selenium
+        errors = ['{kind}: {message}\n{stack}'.format(**entry) for entry in PageObject.drain_errors(selenium)
+                  if entry['kind'] != 'console.error' or entry['stack']]
+        # http://stackoverflow.com/questions/27796950/how-to-get-the-browser-console-logs-of-internet-explorer-using-python-selenium
+        # https://github.com/mozilla/geckodriver/issues/144
+        if selenium.capabilities['browserName'] not in ["internet explorer", "firefox", "MicrosoftEdge"]:
+            errors += [entry['message'] for entry in selenium.get_log('browser')
+                       if 'Stack trace:' in entry['message']]
+        assert not errors, 'JavaScript errors in the console:\n' + '\n'.join(errors)
 
 
 class TestConnectPage(TestCase):
     @pytest.fixture(autouse=True)
-    def setup(self, base_url: str, console_ip: str, pages: PageObjectContainer, selenium: webdriver.Remote):
+    def setup(self, base_url: str, console_ip: str, console_port: int, pages: PageObjectContainer,
+              selenium: webdriver.Remote):
         self.base_url = base_url
         self.console_ip = console_ip
+        self.console_port = console_port
         self.ConnectPage = pages.connect_page
         self.OverviewPage = pages.overview_page
         self.selenium = selenium
@@ -163,7 +210,7 @@ class TestConnectPage(TestCase):
         return page
 
     def when_correct_details(self, page):
-        page.connect_to(self.console_ip, '5673')
+        page.connect_to(self.console_ip, str(self.console_port))
 
     def then_login_succeeds(self):
         try:
@@ -28,14 +28,15 @@ from .page_objects import EntitiesPage
 
 class TestEntitiesPage(TestCase):
     @pytest.fixture(autouse=True)
-    def setup(self, base_url: str, console_ip: str, pages: PageObjectContainer, selenium: webdriver.Remote):
+    def setup(self, base_url: str, console_ip: str, console_port: int, pages: PageObjectContainer,
+              connected: webdriver.Remote):
         self.base_url = base_url
         self.console_ip = console_ip
-        self.console_port = 5673
+        self.console_port = console_port
         self.ConnectPage = pages.connect_page
         self.OverviewPage = pages.overview_page
         self.EntitiesPage = pages.entities_page
-        self.selenium = selenium
+        self.selenium = connected
         self.test_name = None
         return self
 
@@ -49,23 +50,16 @@ class TestEntitiesPage(TestCase):
         self.test_name = 'test_expanding_tree'
         page = self.given_entities_page()
 
-        page.expand_tree(page.node_count)
+        page.expand_tree(self.expected_node_count(page))
+        node_count = self.expected_node_count(page) or page.discover_node_count()
         self.take_screenshot("10")
 
         page = self.when_navigate_to_overview_page_and_back(page)
-        assert len(page.expanded_nodes) == page.node_count
+        assert len(page.expanded_nodes) == node_count
         self.take_screenshot("20")
 
     def given_entities_page(self) -> EntitiesPage:
-        connect = self.ConnectPage.open(self.base_url, self.selenium)
-        connect.wait_for_frameworks()
-        self.ConnectPage.wait(self.selenium)
-        connect.wait_for_frameworks()
-
-        connect.connect_to(self.console_ip, self.console_port)
-        connect.connect_button.click()
-        self.OverviewPage.wait(self.selenium)
-        self.OverviewPage(self.selenium).entities_tab.click()
+        self.OverviewPage.open(self.base_url, self.selenium).entities_tab.click()
         self.EntitiesPage.wait(self.selenium)
         overview = self.EntitiesPage(self.selenium)
         overview.wait_for_frameworks()
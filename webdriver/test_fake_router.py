@@ -0,0 +1,80 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import socket
+
+import pytest
+
+from webdriver.amqp import (AMQP_HEADER, Message, Performative, decode_frame, decode_message, encode_frame,
+                            encode_message, uint)
+from webdriver.fake_router import ENTITY_PREFIX, FakeRouter, MANAGEMENT_ADDRESS
+
+
+@pytest.fixture
+def router() -> FakeRouter:
+    router = FakeRouter(port=0)
+    router.start()
+    yield router
+    router.stop()
+
+
+def receive_frames(stream, count: int):
+    """The next count performatives from the router, with their payloads, skipping heartbeats"""
+    received = []
+    while len(received) < count:
+        size = stream.read(4)
+        assert len(size) == 4, 'connection closed after {!r}'.format(received)
+        _, _, performative, payload = decode_frame(size + stream.read(int.from_bytes(size, 'big') - 4))
+        if performative is not None:
+            received.append((performative, payload))
+    return received
+
+
+def test_pipelined_management_request(router: FakeRouter):
+    """Like rhea, sends everything up to the first request at once, without waiting for answers"""
+    window = uint(2 ** 31 - 1)
+    request = Message(body={'attributeNames': ['id']},
+                      properties={'reply_to': 'replies', 'correlation_id': 1},
+                      application_properties={'operation': 'QUERY', 'entityType': ENTITY_PREFIX + 'router'})
+    frames = [
+        Performative('open', container_id='pipelined'),
+        Performative('begin', next_outgoing_id=uint(0), incoming_window=window, outgoing_window=window),
+        Performative('attach', name='replies', handle=uint(0), role=True,
+                     source=Performative('source', address='replies'), target=Performative('target')),
+        Performative('flow', next_incoming_id=uint(0), incoming_window=window, next_outgoing_id=uint(0),
+                     outgoing_window=window, handle=uint(0), delivery_count=uint(0), link_credit=uint(10)),
+        Performative('attach', name='requests', handle=uint(1), role=False, source=Performative('source'),
+                     target=Performative('target', address=MANAGEMENT_ADDRESS), initial_delivery_count=uint(0)),
+    ]
+    data = AMQP_HEADER + b''.join(encode_frame(f) for f in frames)
+    transfer = Performative('transfer', handle=uint(1), delivery_id=uint(0), delivery_tag=b'\x00',
+                            message_format=uint(0), settled=True)
+    data += encode_frame(transfer, payload=encode_message(request))
+    with socket.create_connection(('127.0.0.1', router.port), timeout=10) as connection:
+        connection.sendall(data)
+        stream = connection.makefile('rb')
+        assert stream.read(8) == AMQP_HEADER
+        # open, begin, attach of replies, attach and flow of requests, and the reply
+        received = receive_frames(stream, 6)
+    assert [p.kind for p, _ in received] == ['open', 'begin', 'attach', 'attach', 'flow', 'transfer']
+    reply = decode_message(received[-1][1])
+    assert reply.correlation_id == 1
+    assert reply.application_properties['statusCode'] == 200
+    assert reply.body['results'] == [['Router.A']]
+    assert router.deliveries[MANAGEMENT_ADDRESS] == 1
@@ -0,0 +1,74 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import uuid
+from typing import List, Tuple
+
+import pytest
+from selenium import webdriver
+
+from webdriver.amqp_client import Client
+from webdriver.latency import LatencyRecorder
+from webdriver.page_objects import PageObjectContainer
+from .test_connect_page import TestCase
+
+
+class TestLatency(TestCase):
+    @pytest.fixture(autouse=True)
+    def setup(self, latency: LatencyRecorder, amqp_endpoints: List[Tuple[str, int]], base_url: str,
+              pages: PageObjectContainer, connected: webdriver.Remote, request):
+        self.base_url = base_url
+        self.OverviewPage = pages.overview_page
+        self.EntitiesPage = pages.entities_page
+        self.selenium = connected
+        self.latency = latency
+        self.endpoint = amqp_endpoints[-1]  # in a mesh, the router farthest from the one the console is on
+        self.samples = request.config.getoption('--latency-samples')
+        self.test_name = None
+        return self
+
+    @pytest.mark.nondestructive
+    def test_new_address_on_overview_page(self):
+        page = self.OverviewPage.open(self.base_url, self.selenium)
+        page.wait_for_frameworks()
+        page.expand_tree(self.expected_node_count(page))
+        self.when_adding_addresses()
+
+    @pytest.mark.nondestructive
+    def test_new_address_on_entities_page(self):
+        page = self.OverviewPage.open(self.base_url, self.selenium)
+        page.wait_for_frameworks()
+        page.entities_tab.click()
+        self.EntitiesPage.wait(self.selenium)
+        page = self.EntitiesPage(self.selenium)
+        page.wait_for_frameworks()
+        page.expand_tree(self.expected_node_count(page))
+        self.when_adding_addresses()
+
+    def when_adding_addresses(self):
+        """Attaches receivers to new addresses one by one, and times until each address is shown"""
+        self.latency.install()
+        self.latency.sync_clock()
+        with Client(*self.endpoint) as client:
+            for _ in range(self.samples):
+                marker = 'latency-{}'.format(uuid.uuid4().hex[:12])
+                self.latency.expect(marker)
+                client.receiver('closest/{}'.format(marker))
+                self.latency.changed(marker)
+                self.latency.wait_seen([marker])
@@ -28,13 +28,14 @@ from .test_connect_page import TestCase
 
 class TestOverviewPage(TestCase):
     @pytest.fixture(autouse=True)
-    def setup(self, base_url: str, console_ip: str, pages: PageObjectContainer, selenium: webdriver.Remote):
+    def setup(self, base_url: str, console_ip: str, console_port: int, pages: PageObjectContainer,
+              connected: webdriver.Remote):
         self.base_url = base_url
         self.console_ip = console_ip
-        self.console_port = 5673
+        self.console_port = console_port
         self.ConnectPage = pages.connect_page
         self.OverviewPage = pages.overview_page
-        self.selenium = selenium
+        self.selenium = connected
         self.test_name = None
         return self
 
@@ -48,23 +49,16 @@ class TestOverviewPage(TestCase):
         self.test_name = 'test_expanding_tree'
         page = self.given_overview_page()
 
-        page.expand_tree(page.node_count)
+        page.expand_tree(self.expected_node_count(page))
+        node_count = self.expected_node_count(page) or page.discover_node_count()
         self.take_screenshot("10")
 
         page = self.when_navigate_to_entities_page_and_back(page)
-        assert len(page.expanded_nodes) == page.node_count
+        assert len(page.expanded_nodes) == node_count
         self.take_screenshot("20")
 
     def given_overview_page(self):
-        connect = self.ConnectPage.open(self.base_url, self.selenium)
-        connect.wait_for_frameworks()
-        self.ConnectPage.wait(self.selenium)
-        connect.wait_for_frameworks()
-
-        connect.connect_to(self.console_ip, self.console_port)
-        connect.connect_button.click()
-        self.OverviewPage.wait(self.selenium)
-        overview = self.OverviewPage(self.selenium)
+        overview = self.OverviewPage.open(self.base_url, self.selenium)
         overview.wait_for_frameworks()
         return overview
 
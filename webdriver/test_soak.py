@@ -0,0 +1,72 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import pytest
+from selenium import webdriver
+
+from webdriver.page_objects import PageObjectContainer
+from webdriver.soak import SoakMonitor
+from .test_connect_page import TestCase
+
+
+class TestSoak(TestCase):
+    @pytest.fixture(autouse=True)
+    def setup(self, soak: SoakMonitor, base_url: str, pages: PageObjectContainer, connected: webdriver.Remote):
+        self.base_url = base_url
+        self.OverviewPage = pages.overview_page
+        self.EntitiesPage = pages.entities_page
+        self.selenium = connected
+        self.soak = soak
+        self.test_name = None
+        return self
+
+    @pytest.mark.nondestructive
+    def test_switching_tabs_with_collapsed_tree(self):
+        page = self.given_overview_page()
+        self.when_switching_tabs(page)
+
+    @pytest.mark.nondestructive
+    def test_switching_tabs_with_expanded_trees(self):
+        page = self.given_overview_page()
+        page.expand_tree(self.expected_node_count(page))
+        page.entities_tab.click()
+        self.EntitiesPage.wait(self.selenium)
+        entities = self.EntitiesPage(self.selenium)
+        entities.wait_for_frameworks()
+        entities.expand_tree(self.expected_node_count(entities))
+        entities.overview_tab.click()
+        self.OverviewPage.wait(self.selenium)
+        page.wait_for_frameworks()
+        self.when_switching_tabs(page)
+
+    def given_overview_page(self):
+        overview = self.OverviewPage.open(self.base_url, self.selenium)
+        overview.wait_for_frameworks()
+        return overview
+
+    def when_switching_tabs(self, page):
+        """Goes to the entities page and back, sampling the footprint after every round"""
+        for _ in range(self.soak.iterations):
+            page.entities_tab.click()
+            self.EntitiesPage.wait(self.selenium)
+            page.wait_for_frameworks()
+            page.overview_tab.click()
+            self.OverviewPage.wait(self.selenium)
+            page.wait_for_frameworks()
+            self.soak.sample(self.selenium, page.angular_root)
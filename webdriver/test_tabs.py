@@ -0,0 +1,56 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import pytest
+from selenium import webdriver
+
+from webdriver.page_objects import PageObjectContainer
+from webdriver.tabs import Tab, TabGroup, TabScheduler
+from .test_connect_page import TestCase
+
+TAB_COUNT = 3
+
+
+class TestTabs(TestCase):
+    @pytest.fixture(autouse=True)
+    def setup(self, base_url: str, pages: PageObjectContainer, connected: webdriver.Remote, tabs: TabGroup):
+        self.base_url = base_url
+        self.OverviewPage = pages.overview_page
+        self.EntitiesPage = pages.entities_page
+        self.selenium = connected
+        self.tabs = tabs
+        self.test_name = None
+        return self
+
+    @pytest.mark.nondestructive
+    def test_expanding_trees_in_several_tabs(self):
+        tabs = self.given_tabs(TAB_COUNT)
+        scheduler = TabScheduler()
+        for i, tab in enumerate(tabs):
+            scheduler.add(self.expand_tree_in(tab, self.OverviewPage if i % 2 == 0 else self.EntitiesPage))
+        for page, node_count in scheduler.run():
+            assert len(page.expanded_nodes) == node_count
+
+    def given_tabs(self, count):
+        return self.tabs.tabs + [self.tabs.new_tab() for _ in range(count - len(self.tabs.tabs))]
+
+    def expand_tree_in(self, tab: Tab, page_class):
+        page = yield from page_class.open_in_tab(self.base_url, tab)
+        yield from page.expand_tree_in_tab(self.expected_node_count(page))
+        return page, self.expected_node_count(page) or len(page.tree_snapshot())
@@ -0,0 +1,96 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Timeouts learned from how long waits took in earlier runs
+
+Every wait in the page objects has a key, such as the locator it waits for, and a
+default timeout. Once enough successful waits for a key were seen in a browser,
+the timeout becomes their 99th percentile times a margin, clamped between a
+minimum and a maximum. Locally that makes a broken step fail in seconds; on a
+slow grid the history is slower, and so are the timeouts.
+"""
+
+import contextlib
+import glob
+import json
+import math
+import os
+import time
+from typing import Dict, List
+
+
+class TimeoutManager(object):
+    def __init__(self, browser: str = 'default', margin: float = 3.0, minimum: float = 2.0, maximum: float = 60.0,
+                 min_samples: int = 20, history: int = 200, learn: bool = False):
+        self.browser = browser
+        self.margin = margin
+        self.minimum = minimum
+        self.maximum = maximum
+        self.min_samples = min_samples
+        self.history = history
+        self.learn = learn  # without learning, defaults are used and nothing is recorded
+        self.samples = {}  # type: Dict[str, Dict[str, List[float]]]
+        # samples recorded in this run only
+        self.recorded = {}  # type: Dict[str, Dict[str, List[float]]]
+
+    def timeout(self, key: str, default: float) -> float:
+        samples = self.samples.get(self.browser, {}).get(key, [])
+        if not self.learn or len(samples) < self.min_samples:
+            return default
+        ordered = sorted(samples)
+        p99 = ordered[min(len(ordered) - 1, int(math.ceil(0.99 * len(ordered))) - 1)]
+        return min(self.maximum, max(self.minimum, p99 * self.margin))
+
+    def record(self, key: str, seconds: float):
+        if not self.learn:
+            return
+        self.recorded.setdefault(self.browser, {}).setdefault(key, []).append(round(seconds, 3))
+        samples = self.samples.setdefault(self.browser, {}).setdefault(key, [])
+        samples.append(round(seconds, 3))
+        del samples[:-self.history]
+
+    @contextlib.contextmanager
+    def timed(self, key: str, default: float):
+        """Provides the timeout for a wait, and records how long the wait took if it did not fail"""
+        thence = time.perf_counter()
+        yield self.timeout(key, default)
+        self.record(key, time.perf_counter() - thence)
+
+    def merge(self, samples: Dict[str, Dict[str, List[float]]]):
+        for browser, keys in samples.items():
+            for key, values in keys.items():
+                merged = self.samples.setdefault(browser, {}).setdefault(key, [])
+                merged.extend(values)
+                del merged[:-self.history]
+
+    def load(self, path: str):
+        if os.path.exists(path):
+            with open(path) as f:
+                self.merge(json.load(f))
+
+    def save(self, path: str, only_recorded: bool = False):
+        with open(path, 'w') as f:
+            json.dump(self.recorded if only_recorded else self.samples, f, indent=2, sort_keys=True)
+
+    def merge_partials(self, path: str):
+        """Merges samples written by pytest-xdist workers into path.gwN and deletes them"""
+        for partial in sorted(glob.glob(path + '.gw*')):
+            with open(partial) as f:
+                self.merge(json.load(f))
+            os.remove(partial)
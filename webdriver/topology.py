@@ -0,0 +1,154 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""Synthesized router meshes for the fake router
+
+Production meshes have hundreds of routers and thousands of links, which is where the
+console gets slow. synthesize() generates entity data for such a mesh, in the format
+webdriver.fake_router.FakeRouter serves.
+
+    python -m webdriver.topology --routers 200 --addresses 500 > mesh.json
+"""
+
+import argparse
+import json
+from typing import Dict, List
+
+from webdriver.fake_router import default_schema, management_node
+
+# address prefixes from docker/run/router/console.conf
+CONFIGURED_ADDRESSES = [('closest', 'closest'), ('multicast', 'multicast'), ('unicast', 'closest'),
+                        ('exclusive', 'closest'), ('broadcast', 'multicast')]
+
+
+class Topology(object):
+    """Sizes of a synthesized mesh"""
+    def __init__(self, routers: int, addresses: int = 100, links: int = 10, connections: int = 5, degree: int = 3):
+        if routers < 1:
+            raise ValueError('Topology needs at least one router')
+        self.routers = routers
+        self.addresses = addresses
+        self.links = links  # endpoint links per router
+        self.connections = connections  # client connections per router
+        self.degree = degree  # inter-router connections each router opens
+
+    def router_ids(self) -> List[str]:
+        return ['Router.{:04d}'.format(i) for i in range(self.routers)]
+
+    def neighbours(self) -> Dict[str, List[str]]:
+        """Ring with chords: router i connects to routers i + 1, i + 2, ... i + degree (mod routers)"""
+        ids = self.router_ids()
+        neighbours = {r: set() for r in ids}  # type: Dict[str, set]
+        for i, r in enumerate(ids):
+            for d in range(1, min(self.degree, self.routers - 1) + 1):
+                other = ids[(i + d) % self.routers]
+                neighbours[r].add(other)
+                neighbours[other].add(r)
+        return {r: sorted(n) for r, n in neighbours.items()}
+
+    def __repr__(self):
+        return 'Topology(routers={}, addresses={}, links={}, connections={}, degree={})'.format(
+            self.routers, self.addresses, self.links, self.connections, self.degree)
+
+
+def _entity(entity_type: str, name: str, **attributes) -> dict:
+    attributes.update(name=name, identity='{}/{}'.format(entity_type, name))
+    return attributes
+
+
+def _router_entities(topology: Topology, router_id: str, neighbours: Dict[str, List[str]]) -> Dict[str, List[dict]]:
+    ids = topology.router_ids()
+    peers = neighbours[router_id]
+    addresses = CONFIGURED_ADDRESSES + [('addr.{:05d}'.format(i), 'closest') for i in range(topology.addresses)]
+
+    connections = [_entity('connection', 'connection/{}'.format(peer), host='{}:55672'.format(peer),
+                           role='inter-router', dir='out' if peer > router_id else 'in', container=peer,
+                           sasl='ANONYMOUS', isAuthenticated=False, user='anonymous', isEncrypted=False,
+                           opened=True, properties={}) for peer in peers]
+    connections += [_entity('connection', 'connection/client-{}'.format(i),
+                            host='10.0.{}.{}:5672'.format(i // 250, i % 250), role='normal', dir='in',
+                            container='client-{}'.format(i), sasl='ANONYMOUS', isAuthenticated=False,
+                            user='anonymous', isEncrypted=False, opened=True, properties={})
+                    for i in range(topology.connections)]
+
+    links = []
+    for peer in peers:
+        for link_type in ['router-control', 'inter-router']:
+            for direction in ['in', 'out']:
+                links.append(('{}-{}-{}'.format(link_type, peer, direction), link_type, direction, None))
+    for i in range(topology.links):
+        links.append(('endpoint-{}'.format(i), 'endpoint', 'in' if i % 2 else 'out',
+                      'M0' + addresses[i % len(addresses)][0]))
+    router_links = [_entity('router.link', 'router.link/{}'.format(i), linkType=link_type, linkDir=direction,
+                            linkName=name, owningAddr=owning_address, capacity=250, peer=None,
+                            undeliveredCount=0, unsettledCount=0, deliveryCount=0, presettledCount=0,
+                            acceptedCount=0, rejectedCount=0, releasedCount=0, modifiedCount=0,
+                            adminStatus='enabled', operStatus='up', connectionId=1)
+                    for i, (name, link_type, direction, owning_address) in enumerate(links)]
+
+    return {
+        'router': [_entity('router', 'router/' + router_id, id=router_id, mode='interior', area='0',
+                           version='0.8.0', addrCount=len(addresses), linkCount=len(router_links),
+                           nodeCount=len(ids) - 1, connectionCount=len(connections), linkRouteCount=0,
+                           autoLinkCount=0, workerThreads=4)],
+        'listener': [_entity('listener', 'listener/0.0.0.0:amqp', host='0.0.0.0', port='amqp', role='normal',
+                             authenticatePeer=False, saslMechanisms=None, http=False),
+                     _entity('listener', 'listener/0.0.0.0:55672', host='0.0.0.0', port='55672',
+                             role='inter-router', authenticatePeer=False, saslMechanisms=None, http=False)],
+        'connector': [_entity('connector', 'connector/' + peer, host=peer, port='55672', role='inter-router',
+                              cost=1) for peer in peers if peer > router_id],
+        'address': [_entity('address', 'address/' + prefix, prefix=prefix, distribution=distribution,
+                            waypoint=False) for prefix, distribution in CONFIGURED_ADDRESSES],
+        'connection': connections,
+        'router.link': router_links,
+        'router.address': [_entity('router.address', 'router.address/' + address, distribution=distribution,
+                                   inProcess=0, subscriberCount=0, remoteCount=0, deliveriesIngress=0,
+                                   deliveriesEgress=0, deliveriesTransit=0, deliveriesToContainer=0,
+                                   deliveriesFromContainer=0) for address, distribution in addresses],
+        'router.node': [_entity('router.node', 'router.node/' + other, id=other, protocolVersion=1, instance=0,
+                                linkState=neighbours[other], nextHop=None if other in peers else peers[0],
+                                validOrigins=[], address=management_node(other)[:-len('$management')],
+                                routerLink=1 if other in peers else None, cost=1 if other in peers else 2)
+                        for other in ids if other != router_id],
+    }
+
+
+def synthesize(topology: Topology) -> dict:
+    """Entity data for every router in the mesh, for FakeRouter"""
+    neighbours = topology.neighbours()
+    return {
+        'schema': default_schema(),
+        'routers': {r: _router_entities(topology, r, neighbours) for r in topology.router_ids()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prints entity data of a synthesized mesh as JSON')
+    parser.add_argument('--routers', type=int, default=100)
+    parser.add_argument('--addresses', type=int, default=100)
+    parser.add_argument('--links', type=int, default=10, help='endpoint links per router')
+    parser.add_argument('--connections', type=int, default=5, help='client connections per router')
+    parser.add_argument('--degree', type=int, default=3, help='inter-router connections each router opens')
+    args = parser.parse_args()
+    topology = Topology(args.routers, args.addresses, args.links, args.connections, args.degree)
+    print(json.dumps(synthesize(topology)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+"""What the console sends over the network, from the Chrome performance log
+
+Chrome reports network events, WebSocket frames included, into the performance
+log when the session asks for it (see capabilities()). The recorder reads the
+log whenever a page object is created, and attributes what happened since the
+previous read to the page that was shown then. WebSocket frames are decoded as
+AMQP, so that management requests can be counted by operation.
+
+Only Chrome has the performance log; with other browsers, nothing is recorded.
+"""
+
+import base64
+import json
+import struct
+from collections import Counter, OrderedDict
+from typing import Dict, List, Tuple
+
+from selenium import webdriver
+
+from webdriver.amqp import FRAME_AMQP, DecodeError, decode_frame, decode_message
+
+# label of traffic before the test created its first page object
+NO_PAGE = '(no page)'
+
+
+def capabilities() -> dict:
+    """Capabilities that turn the performance log on; network events are in it by default, page events are not"""
+    return {
+        'loggingPrefs': {'performance': 'ALL'},
+        'goog:loggingPrefs': {'performance': 'ALL'},  # name used by chromedriver in W3C mode
+        'chromeOptions': {'perfLoggingPrefs': {'enableNetwork': True, 'enablePage': False}},
+    }
+
+
+def merge_capabilities(base: dict, extra: dict) -> dict:
+    """Copy of base with extra merged in; nested dictionaries, such as chromeOptions, are merged too"""
+    merged = dict(base or {})
+    for key, value in extra.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            value = merge_capabilities(merged[key], value)
+        merged[key] = value
+    return merged
+
+
+class PageTraffic(object):
+    def __init__(self):
+        self.http_requests = 0
+        self.http_bytes = 0
+        self.http_seconds = 0.0
+        self.ws_frames_sent = 0
+        self.ws_frames_received = 0
+        self.ws_bytes_sent = 0
+        self.ws_bytes_received = 0
+        self.management_requests = Counter()  # type: Counter
+        self.management_bytes = 0
+        self.management_responses = 0
+
+    def merge(self, other: 'PageTraffic'):
+        for name, value in vars(other).items():
+            if isinstance(value, Counter):
+                getattr(self, name).update(value)
+            else:
+                setattr(self, name, getattr(self, name) + value)
+
+    def to_dict(self) -> dict:
+        result = OrderedDict((name, value) for name, value in vars(self).items() if not isinstance(value, Counter))
+        result['http_seconds'] = round(self.http_seconds, 3)
+        result['management_requests'] = OrderedDict(self.management_requests.most_common())
+        return result
+
+
+class AmqpStream(object):
+    """Reassembles AMQP frames from WebSocket messages going one way"""
+    def __init__(self):
+        self.buffer = bytearray()
+        self.deliveries = {}  # type: Dict[Tuple[int, int], bytearray]
+        self.broken = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Returns payloads of the complete messages transferred in data"""
+        if self.broken:
+            return []
+        self.buffer.extend(data)
+        messages = []
+        try:
+            while len(self.buffer) >= 8:
+                if self.buffer[:4] == b'AMQP':
+                    del self.buffer[:8]  # protocol header, sent again after SASL
+                    continue
+                size = struct.unpack('>I', self.buffer[:4])[0]
+                if len(self.buffer) < size:
+                    break
+                frame = bytes(self.buffer[:size])
+                del self.buffer[:size]
+                frame_type, channel, performative, payload = decode_frame(frame)
+                if frame_type != FRAME_AMQP or performative is None or performative.kind != 'transfer':
+                    continue
+                key = (channel, performative.handle)
+                self.deliveries.setdefault(key, bytearray()).extend(payload)
+                if not performative.more:
+                    messages.append(bytes(self.deliveries.pop(key)))
+        except (DecodeError, ValueError, KeyError, struct.error):
+            self.broken = True  # not AMQP, or we joined in the middle of a frame
+        return messages
+
+
+class TrafficRecorder(object):
+    """Collects PageTraffic by test and page"""
+    def __init__(self):
+        self.tests = OrderedDict()  # type: Dict[str, Dict[str, PageTraffic]]
+        self.enabled = True
+        self._page = NO_PAGE
+        self._current = OrderedDict()  # type: Dict[str, PageTraffic]
+        self._requests = {}  # type: Dict[str, float]
+        self._sockets = {}  # type: Dict[Tuple[str, str], AmqpStream]
+
+    def checkpoint(self, selenium: webdriver.Remote, page: str):
+        """Attributes traffic since the previous call to the page shown until now, then switches to page"""
+        self._collect(selenium)
+        self._page = page
+
+    def finish_test(self, selenium: webdriver.Remote, test: str):
+        self._collect(selenium)
+        if self._current:
+            self.tests[test] = self._current
+        self._current = OrderedDict()
+        self._page = NO_PAGE
+        self._requests = {}
+        self._sockets = {}
+
+    def _collect(self, selenium: webdriver.Remote):
+        if not self.enabled:
+            return
+        if selenium.capabilities.get('browserName') != 'chrome':
+            self.enabled = False
+            return
+        traffic = self._current.setdefault(self._page, PageTraffic())
+        for entry in selenium.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            self._handle(traffic, message['method'], message.get('params', {}))
+
+    def _handle(self, traffic: PageTraffic, method: str, params: dict):
+        if method == 'Network.requestWillBeSent':
+            traffic.http_requests += 1
+            self._requests[params['requestId']] = params['timestamp']
+        elif method == 'Network.loadingFinished':
+            traffic.http_bytes += int(params.get('encodedDataLength', 0))
+            started = self._requests.pop(params['requestId'], None)
+            if started is not None:
+                traffic.http_seconds += params['timestamp'] - started
+        elif method in ('Network.webSocketFrameSent', 'Network.webSocketFrameReceived'):
+            sent = method == 'Network.webSocketFrameSent'
+            frame = params['response']
+            data = frame['payloadData']
+            data = base64.b64decode(data) if frame.get('opcode') == 2 else data.encode('utf-8')
+            if sent:
+                traffic.ws_frames_sent += 1
+                traffic.ws_bytes_sent += len(data)
+            else:
+                traffic.ws_frames_received += 1
+                traffic.ws_bytes_received += len(data)
+            stream = self._sockets.setdefault((params['requestId'], method), AmqpStream())
+            for payload in stream.feed(data):
+                self._count_management(traffic, payload, sent)
+
+    @staticmethod
+    def _count_management(traffic: PageTraffic, payload: bytes, sent: bool):
+        try:
+            message = decode_message(payload)
+        except (DecodeError, ValueError, KeyError):
+            return
+        properties = message.application_properties or {}
+        if sent and str(message.properties.get('to', '')).endswith('$management'):
+            operation = str(properties.get('operation', '?'))
+            if 'entityType' in properties:
+                operation = '{} {}'.format(operation, properties['entityType'])
+            traffic.management_requests[operation] += 1
+            traffic.management_bytes += len(payload)
+        elif not sent and 'statusCode' in properties:
+            traffic.management_responses += 1
+            traffic.management_bytes += len(payload)
+
+    def pages(self) -> Dict[str, PageTraffic]:
+        """Traffic of each page, summed over all tests"""
+        total = OrderedDict()  # type: Dict[str, PageTraffic]
+        for pages in self.tests.values():
+            for page, traffic in pages.items():
+                total.setdefault(page, PageTraffic()).merge(traffic)
+        return total
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(OrderedDict([
+                ('pages', OrderedDict((page, t.to_dict()) for page, t in self.pages().items())),
+                ('tests', OrderedDict((test, OrderedDict((page, t.to_dict()) for page, t in pages.items()))
+                                      for test, pages in self.tests.items())),
+            ]), f, indent=2)
+
+    def summary_lines(self) -> List[str]:
+        pages = self.pages()
+        width = max([len(page) for page in pages] + [len('page')])
+        lines = ['{:<{w}} {:>9} {:>10} {:>10} {:>10} {:>11}'.format(
+            'page', 'http reqs', 'http [kB]', 'ws frames', 'ws [kB]', 'mgmt reqs', w=width)]
+        for page, t in pages.items():
+            lines.append('{:<{w}} {:>9} {:>10.1f} {:>10} {:>10.1f} {:>11}'.format(
+                page, t.http_requests, t.http_bytes / 1024, t.ws_frames_sent + t.ws_frames_received,
+                (t.ws_bytes_sent + t.ws_bytes_received) / 1024, sum(t.management_requests.values()), w=width))
+        for page, t in pages.items():
+            if t.management_requests:
+                lines.append('{}: {}'.format(page, ', '.join(
+                    '{} x{}'.format(operation, count) for operation, count in t.management_requests.most_common(5))))
+        return lines